@@ -1,12 +1,28 @@
 from django.contrib import admin
 
-from .models import Article, Profile, Survey, Question, Response, ResponseAnswer
+from .models import Article, Category, Profile, Survey, Question, Response, ResponseAnswer, Tag
+from .search import search_articles
 
 
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
 	list_display = ('title', 'author', 'published_at')
 	search_fields = ('title', 'author')
+	# Order like the feed index and skip the unfiltered COUNT(*) on every page
+	ordering = ('-published_at', '-id')
+	show_full_result_count = False
+
+	def get_search_results(self, request, queryset, search_term):
+		# Use the full-text index instead of icontains scans
+		if not search_term:
+			return queryset, False
+		return queryset.filter(pk__in=search_articles(search_term).ids()), False
+
+
+@admin.register(Category, Tag)
+class TaxonomyAdmin(admin.ModelAdmin):
+	list_display = ('name', 'slug', 'article_count')
+	search_fields = ('name',)
 
 
 @admin.register(Profile)
@@ -24,6 +40,8 @@ class QuestionInline(admin.TabularInline):
 @admin.register(Survey)
 class SurveyAdmin(admin.ModelAdmin):
 	list_display = ('title', 'created_at')
+	ordering = ('-created_at', '-id')
+	show_full_result_count = False
 	inlines = [QuestionInline]
 
 
@@ -0,0 +1,154 @@
+"""Materialized survey result aggregates.
+
+``SurveyStats``, ``ScoreCount``, ``QuestionStats`` and ``ChoiceStats`` hold
+response counts, score distributions, answer counts and choice histograms.
+``apply_response`` adds (or, with ``sign=-1``, removes) one submission with a
+handful of ``F()`` updates inside the submitting transaction, so concurrent
+submissions never lose an increment. ``rebuild_survey_stats`` recomputes
+everything from the answer tables and is used after deletions and re-scoring
+and by the ``rebuild_survey_stats`` command.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import (
+	ChoiceStats, Question, QuestionChoice, QuestionStats, Response, ResponseAnswer, ScoreCount, Survey, SurveyStats,
+)
+from .scoring import AnswerRecord
+
+
+def _answered(record: AnswerRecord) -> bool:
+	return bool(record.answer_text) or bool(record.selected_choices)
+
+
+def apply_response(survey_id: int, score: int, records: Sequence[AnswerRecord], sign: int = 1) -> None:
+	"""Add one submission's answers and score to the aggregates (``sign=-1`` removes them)"""
+	question_ids = [record.question_id for record in records if _answered(record)]
+	text_ids = [record.question_id for record in records if record.answer_text]
+	choice_ids = [choice_id for record in records for choice_id in record.selected_choices]
+
+	if sign > 0:
+		# Make sure every row about to be incremented exists
+		SurveyStats.objects.bulk_create([SurveyStats(survey_id=survey_id)], ignore_conflicts=True)
+		ScoreCount.objects.bulk_create([ScoreCount(survey_id=survey_id, score=score)], ignore_conflicts=True)
+		if question_ids:
+			QuestionStats.objects.bulk_create(
+				[QuestionStats(question_id=pk) for pk in question_ids], ignore_conflicts=True
+			)
+		if choice_ids:
+			ChoiceStats.objects.bulk_create([ChoiceStats(choice_id=pk) for pk in choice_ids], ignore_conflicts=True)
+
+	SurveyStats.objects.filter(survey_id=survey_id).update(
+		response_count=F('response_count') + sign, score_total=F('score_total') + sign * score
+	)
+	ScoreCount.objects.filter(survey_id=survey_id, score=score).update(count=F('count') + sign)
+	if question_ids:
+		QuestionStats.objects.filter(question_id__in=question_ids).update(answer_count=F('answer_count') + sign)
+	if text_ids:
+		QuestionStats.objects.filter(question_id__in=text_ids).update(
+			text_answer_count=F('text_answer_count') + sign
+		)
+	if choice_ids:
+		ChoiceStats.objects.filter(choice_id__in=choice_ids).update(selected_count=F('selected_count') + sign)
+
+
+def rebuild_survey_stats(survey_ids: Optional[Iterable[int]] = None) -> int:
+	"""Recompute the aggregates of some (default: all) surveys and return how many were rebuilt"""
+	surveys = Survey.objects.all()
+	if survey_ids is not None:
+		surveys = surveys.filter(pk__in=list(survey_ids))
+	survey_ids = list(surveys.values_list('pk', flat=True))
+	if not survey_ids:
+		return 0
+
+	responses = Response.objects.filter(survey_id__in=survey_ids).order_by()
+	totals = {
+		row['survey_id']: row
+		for row in responses.values('survey_id').annotate(responses=Count('id'), scores=Sum('score'))
+	}
+	score_counts = responses.values_list('survey_id', 'score').annotate(total=Count('id'))
+
+	answers = ResponseAnswer.objects.filter(question__survey_id__in=survey_ids).order_by()
+	question_counts = answers.values('question_id').annotate(
+		answered=Count('id', filter=~Q(answer_text='') | Q(selected_choices__isnull=False), distinct=True),
+		texts=Count('id', filter=~Q(answer_text=''), distinct=True),
+	)
+	through = ResponseAnswer.selected_choices.through
+	choice_counts = (
+		through.objects.filter(questionchoice__question__survey_id__in=survey_ids).order_by()
+		.values_list('questionchoice_id').annotate(total=Count('id'))
+	)
+
+	with transaction.atomic():
+		SurveyStats.objects.filter(survey_id__in=survey_ids).delete()
+		ScoreCount.objects.filter(survey_id__in=survey_ids).delete()
+		QuestionStats.objects.filter(question__survey_id__in=survey_ids).delete()
+		ChoiceStats.objects.filter(choice__question__survey_id__in=survey_ids).delete()
+
+		SurveyStats.objects.bulk_create([
+			SurveyStats(
+				survey_id=pk,
+				response_count=totals.get(pk, {}).get('responses', 0),
+				score_total=totals.get(pk, {}).get('scores') or 0,
+			)
+			for pk in survey_ids
+		])
+		ScoreCount.objects.bulk_create([
+			ScoreCount(survey_id=survey_id, score=score, count=total) for survey_id, score, total in score_counts
+		], batch_size=1000)
+		QuestionStats.objects.bulk_create([
+			QuestionStats(question_id=row['question_id'], answer_count=row['answered'], text_answer_count=row['texts'])
+			for row in question_counts
+		], batch_size=1000)
+		ChoiceStats.objects.bulk_create([
+			ChoiceStats(choice_id=choice_id, selected_count=total) for choice_id, total in choice_counts
+		], batch_size=1000)
+	return len(survey_ids)
+
+
+def survey_summaries(surveys: Sequence[Survey]) -> List[Dict]:
+	"""Result summaries of a page of surveys, read from the aggregate tables only
+
+	Every summary holds the survey, its ``response_count``, ``average_score``,
+	``score_counts`` and ``questions``; choice questions carry a histogram of
+	``(choice, count, percent)`` tuples.
+	"""
+	survey_ids = [survey.pk for survey in surveys]
+	stats = SurveyStats.objects.in_bulk(survey_ids)
+	score_counts = {}
+	for row in ScoreCount.objects.filter(survey_id__in=survey_ids, count__gt=0):
+		score_counts.setdefault(row.survey_id, []).append(row)
+
+	questions = list(Question.objects.filter(survey_id__in=survey_ids).order_by('survey_id', 'order', 'id'))
+	question_stats = QuestionStats.objects.in_bulk([question.pk for question in questions])
+	choices = {}
+	for choice in QuestionChoice.objects.filter(question__in=questions).order_by('order', 'id'):
+		choices.setdefault(choice.question_id, []).append(choice)
+	choice_stats = ChoiceStats.objects.in_bulk([choice.pk for items in choices.values() for choice in items])
+
+	questions_by_survey = {}
+	for question in questions:
+		survey_total = stats[question.survey_id].response_count if question.survey_id in stats else 0
+		question_total = question_stats.get(question.pk)
+		question.answer_count = question_total.answer_count if question_total else 0
+		question.text_answer_count = question_total.text_answer_count if question_total else 0
+		question.histogram = []
+		for choice in choices.get(question.pk, []):
+			count = choice_stats[choice.pk].selected_count if choice.pk in choice_stats else 0
+			percent = round(100 * count / survey_total) if survey_total else 0
+			question.histogram.append((choice, count, percent))
+		questions_by_survey.setdefault(question.survey_id, []).append(question)
+
+	summaries = []
+	for survey in surveys:
+		survey_stats = stats.get(survey.pk)
+		summaries.append({
+			'survey': survey,
+			'response_count': survey_stats.response_count if survey_stats else 0,
+			'average_score': survey_stats.average_score if survey_stats else 0,
+			'score_counts': score_counts.get(survey.pk, []),
+			'questions': questions_by_survey.get(survey.pk, []),
+		})
+	return summaries
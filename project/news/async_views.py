@@ -0,0 +1,127 @@
+"""Async versions of the hottest read pages, used under ASGI.
+
+Under ASGI every sync view in ``news.views`` runs in a worker thread. These
+views stay on the event loop and use the async ORM. Their queries are
+awaited one after another: the async ORM runs every query on the one
+thread-sensitive executor thread, so gathering them only added task
+overhead. The user, the principal and every queryset are resolved before
+rendering, so templates never touch the database.
+
+``news.urls`` routes to them only when ``settings.NEWS_ASYNC_VIEWS`` is on.
+Leave it off unless ``manage.py benchmark_handlers`` shows ASGI ahead of
+WSGI on the deployment's hardware.
+"""
+import math
+
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import Count
+from django.http import Http404, HttpResponseForbidden
+from django.shortcuts import render
+
+from .cards import attach_card_versions
+from .conditional import (
+	MOST_VISITED_SHOWN, RELATED_SHOWN, SURVEYS_SHOWN, aarticle_state, add_validators, ahome_validators, not_modified,
+)
+from .models import Article, Survey
+from .pagination import InvalidCursor, KeysetPaginator
+from .principal import aload_principal
+from .view_counts import pending_views, record_view
+from .views import HomeView, SurveyListView
+
+
+async def _list(queryset) -> list:
+	return [obj async for obj in queryset]
+
+
+async def _authenticate(request):
+	request.principal = await aload_principal(request)
+	return request.principal
+
+
+async def _page(request, queryset, per_page, ordering, cursor_kwarg='cursor'):
+	paginator = KeysetPaginator(queryset, per_page, ordering)
+	try:
+		return paginator, await paginator.apage(request.GET.get(cursor_kwarg))
+	except InvalidCursor:
+		raise Http404('Invalid cursor.')
+
+
+def _list_context(name: str, paginator, page) -> dict:
+	return {
+		name: page.object_list,
+		'object_list': page.object_list,
+		'paginator': paginator,
+		'page_obj': page,
+		'is_paginated': page.has_next(),
+	}
+
+
+async def home(request):
+	principal = await _authenticate(request)
+	validators = await ahome_validators(request, HomeView.paginate_by, HomeView.cursor_ordering)
+	response = not_modified(request, validators)
+	if response is not None:
+		return response
+	show_surveys = principal.is_superuser or principal.is_vip
+	surveys = Survey.objects.annotate(question_count=Count('questions')).order_by('-created_at', '-id')[:SURVEYS_SHOWN]
+	most_visited = (
+		Article.objects.filter(views__gt=0).order_by('-views', '-published_at').defer('content')[:MOST_VISITED_SHOWN]
+	)
+
+	paginator, page = await _page(request, Article.objects.defer('content'), HomeView.paginate_by, HomeView.cursor_ordering)
+	surveys = await _list(surveys) if show_surveys else []
+	most_visited = [] if principal.is_authenticated else await _list(most_visited)
+	context = _list_context('articles', paginator, page)
+	attach_card_versions(page.object_list, 'article')
+	context['surveys'] = attach_card_versions(surveys, 'survey')
+	context['most_visited'] = attach_card_versions(most_visited, 'article')
+	return add_validators(request, render(request, 'home.html', context), validators)
+
+
+async def article_detail(request, slug):
+	await _authenticate(request)
+	state = await aarticle_state(request, slug)
+	if state is None:
+		raise Http404('No article found matching the query.')
+	# Count the visit whether the page is rendered or answered with a 304. Buffered instead
+	# of written; flushed in bulk by news.view_counts
+	record_view(state.pk)
+	response = not_modified(request, state.validators)
+	if response is not None:
+		return response
+	try:
+		article = await Article.objects.select_related('category_ref').aget(pk=state.pk)
+	except Article.DoesNotExist:
+		raise Http404('No article found matching the query.')
+	article.views += pending_views(article.pk)
+
+	tags = await _list(article.tag_refs.all())
+	related = await _list(
+		Article.objects.filter(neighbor_of__article=article).order_by('neighbor_of__rank').defer('content')[:RELATED_SHOWN]
+	)
+	if not related:
+		related = await _list(Article.objects.filter(author=article.author).exclude(id=article.id).defer('content')[:RELATED_SHOWN])
+
+	words = len((article.content or '').split())
+	context = {
+		'object': article,
+		'article': article,
+		'tags_list': tags,
+		'reading_time': max(1, math.ceil(words / 220)) if words else 1,
+		'word_count': words,
+		'related_articles': related,
+	}
+	return add_validators(request, render(request, 'article_detail.html', context), state.validators)
+
+
+async def survey_list(request):
+	principal = await _authenticate(request)
+	if not principal.is_authenticated:
+		return redirect_to_login(request.get_full_path(), '/login/')
+	if not principal.is_vip:
+		return HttpResponseForbidden('VIP access required.')
+
+	paginator, page = await _page(request, SurveyListView.queryset, SurveyListView.paginate_by, SurveyListView.cursor_ordering)
+	context = _list_context('surveys', paginator, page)
+	context['total_surveys'] = await Survey.objects.acount()
+	return render(request, 'survey_list.html', context)
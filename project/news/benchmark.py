@@ -0,0 +1,168 @@
+"""Closed-loop load generation against the WSGI and ASGI handlers.
+
+``run_wsgi`` calls Django's ``WSGIHandler`` from one thread per simulated
+client, as a threaded WSGI server would. ``run_asgi`` calls ``ASGIHandler``
+from one task per client on a single event loop, as an ASGI server would.
+No network server is involved, so the numbers compare the two request paths
+with each other rather than predicting production throughput.
+"""
+import asyncio
+import io
+import itertools
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Sequence
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client
+
+from .instrumentation import percentile
+
+HOST = 'localhost'
+
+
+class BenchmarkResult(NamedTuple):
+	handler: str
+	concurrency: int
+	requests: int
+	errors: int
+	seconds: float
+	throughput: float
+	p50_ms: float
+	p90_ms: float
+	p99_ms: float
+
+
+def session_cookie(user) -> str:
+	"""A ``Cookie`` header logging the requests in as ``user``"""
+	if user is None:
+		return ''
+	client = Client()
+	client.force_login(user)
+	return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def _result(handler: str, concurrency: int, latencies: List[float], errors: int, seconds: float) -> BenchmarkResult:
+	milliseconds = [latency * 1000 for latency in latencies]
+	return BenchmarkResult(
+		handler, concurrency, len(latencies), errors, round(seconds, 3),
+		round(len(latencies) / seconds, 1) if seconds else 0.0,
+		round(percentile(milliseconds, 50), 2),
+		round(percentile(milliseconds, 90), 2),
+		round(percentile(milliseconds, 99), 2),
+	)
+
+
+def _schedule(paths: Sequence[str], total: int) -> List[str]:
+	return list(itertools.islice(itertools.cycle(paths), total))
+
+
+def _wsgi_get(handler: WSGIHandler, url: str, cookie: str) -> int:
+	path, _, query = url.partition('?')
+	environ = {
+		'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': query,
+		'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+		'HTTP_HOST': HOST, 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+		'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+		'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+	}
+	status = []
+	body = handler(environ, lambda line, headers, exc_info=None: status.append(line))
+	try:
+		for _ in body:
+			pass
+	finally:
+		if hasattr(body, 'close'):
+			body.close()
+	return int(status[0].split()[0])
+
+
+async def _asgi_get(handler: ASGIHandler, url: str, cookie: str) -> int:
+	path, _, query = url.partition('?')
+	scope = {
+		'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+		'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+		'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode())],
+		'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+	}
+	done = asyncio.Event()
+	sent_body = False
+	status = []
+
+	async def receive():
+		nonlocal sent_body
+		if not sent_body:
+			sent_body = True
+			return {'type': 'http.request', 'body': b'', 'more_body': False}
+		# The handler listens for a disconnect while the view runs
+		await done.wait()
+		return {'type': 'http.disconnect'}
+
+	async def send(message):
+		if message['type'] == 'http.response.start':
+			status.append(message['status'])
+		elif message['type'] == 'http.response.body' and not message.get('more_body'):
+			done.set()
+
+	await handler(scope, receive, send)
+	done.set()
+	return status[0]
+
+
+def run_wsgi(paths: Sequence[str], total: int, concurrency: int, user=None, warmup: int = 0) -> BenchmarkResult:
+	handler = WSGIHandler()
+	cookie = session_cookie(user)
+	for url in _schedule(paths, warmup):
+		_wsgi_get(handler, url, cookie)
+
+	schedule = iter(_schedule(paths, total))
+	lock = threading.Lock()
+	latencies, failures = [], []
+
+	def client_loop():
+		while True:
+			with lock:
+				url = next(schedule, None)
+			if url is None:
+				return
+			start = time.perf_counter()
+			status = _wsgi_get(handler, url, cookie)
+			elapsed = time.perf_counter() - start
+			with lock:
+				(failures if status >= 400 else latencies).append(elapsed)
+
+	started = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=concurrency) as pool:
+		for future in [pool.submit(client_loop) for _ in range(concurrency)]:
+			future.result()
+	return _result('wsgi', concurrency, latencies, len(failures), time.perf_counter() - started)
+
+
+async def _run_asgi(paths: Sequence[str], total: int, concurrency: int, cookie: str, warmup: int) -> BenchmarkResult:
+	handler = ASGIHandler()
+	for url in _schedule(paths, warmup):
+		await _asgi_get(handler, url, cookie)
+
+	schedule = iter(_schedule(paths, total))
+	latencies, failures = [], []
+
+	async def client_loop():
+		for url in schedule:
+			start = time.perf_counter()
+			status = await _asgi_get(handler, url, cookie)
+			elapsed = time.perf_counter() - start
+			(failures if status >= 400 else latencies).append(elapsed)
+
+	started = time.perf_counter()
+	await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+	return _result('asgi', concurrency, latencies, len(failures), time.perf_counter() - started)
+
+
+def run_asgi(paths: Sequence[str], total: int, concurrency: int, user=None, warmup: int = 0) -> BenchmarkResult:
+	# Log in before the event loop starts: the session is created with the sync ORM
+	cookie = session_cookie(user)
+	return asyncio.run(_run_asgi(paths, total, concurrency, cookie, warmup))
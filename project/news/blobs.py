@@ -0,0 +1,141 @@
+"""Reference counts of stored article images.
+
+Every article image is a ``MediaBlob`` row whose ``ref_count`` is the number
+of articles pointing at the file. ``acquire``/``release`` are called from the
+``Article`` signals; a file is deleted from storage once its count drops to
+zero. ``deduplicate_media`` moves existing uploads to content-addressed names,
+drops byte-identical copies and recounts everything.
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, NamedTuple
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .cards import bump_card_version
+from .models import Article, MediaBlob
+from .storage import content_hash, content_name
+
+
+def _storage():
+	return Article._meta.get_field('image').storage
+
+
+def acquire(name: str) -> None:
+	"""Count one more article using the file"""
+	if not name:
+		return
+	storage = _storage()
+	size = storage.size(name) if storage.exists(name) else 0
+	MediaBlob.objects.bulk_create([MediaBlob(name=name, size=size)], ignore_conflicts=True)
+	MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def acquire_many(names: Iterable[str]) -> None:
+	"""``acquire`` for many new references at once, with one update per distinct count"""
+	counts = Counter(name for name in names if name)
+	if not counts:
+		return
+	storage = _storage()
+	MediaBlob.objects.bulk_create(
+		[MediaBlob(name=name, size=storage.size(name) if storage.exists(name) else 0) for name in counts],
+		ignore_conflicts=True,
+	)
+	by_count = defaultdict(list)
+	for name, count in counts.items():
+		by_count[count].append(name)
+	for count, group in by_count.items():
+		MediaBlob.objects.filter(name__in=group).update(ref_count=F('ref_count') + count)
+
+
+def release(name: str) -> None:
+	"""Count one article less using the file, deleting it after commit once unused"""
+	if not name:
+		return
+	MediaBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+	def collect():
+		deleted, _ = MediaBlob.objects.filter(name=name, ref_count=0).delete()
+		if deleted and not Article.objects.filter(image=name).exists():
+			_storage().delete(name)
+
+	transaction.on_commit(collect)
+
+
+def recount() -> int:
+	"""Rebuild every ``MediaBlob`` from the article table and return how many there are"""
+	storage = _storage()
+	counts = Article.objects.exclude(image='').exclude(image=None).order_by().values_list('image').annotate(Count('id'))
+	blobs = [
+		MediaBlob(name=name, size=storage.size(name) if storage.exists(name) else 0, ref_count=total)
+		for name, total in counts
+	]
+	with transaction.atomic():
+		MediaBlob.objects.all().delete()
+		MediaBlob.objects.bulk_create(blobs, batch_size=1000)
+	return len(blobs)
+
+
+class DedupeReport(NamedTuple):
+	files_scanned: int
+	files_removed: int
+	articles_updated: int
+	bytes_reclaimed: int
+
+
+def deduplicate_media(directory: str = 'articles', dry_run: bool = False) -> DedupeReport:
+	"""Move the files of ``directory`` to content-addressed names and delete duplicates
+
+	Files referenced by articles are renamed to their blob name (articles are
+	repointed with ``update()``, keeping their rendered variants). Unreferenced
+	files are only removed when they are byte-identical to a kept file.
+	Sub-directories (blob fan-out, variants) are left alone.
+	"""
+	storage = _storage()
+	_, filenames = storage.listdir(directory)
+	references = defaultdict(list)
+	articles = Article.objects.exclude(image='').exclude(image=None).values_list('pk', 'image', 'image_variants')
+	for pk, image, variants in articles:
+		references[image].append((pk, variants))
+
+	by_digest: Dict[str, list] = defaultdict(list)
+	for filename in sorted(filenames):
+		name = f'{directory}/{filename}' if directory else filename
+		with storage.open(name, 'rb') as handle:
+			by_digest[content_hash(handle)].append(name)
+
+	removed = updated = reclaimed = 0
+	for digest, names in by_digest.items():
+		target = content_name(names[0], digest)
+		if any(name in references for name in names):
+			keep = target
+			if not storage.exists(target):
+				# The blob copy is new disk use, offset against the files it replaces
+				reclaimed -= storage.size(names[0])
+				if not dry_run:
+					with storage.open(names[0], 'rb') as handle:
+						# Saving under the original name lets the storage pick the blob name
+						storage.save(names[0], handle)
+		else:
+			keep = target if storage.exists(target) else names[0]
+
+		for name in names:
+			if name == keep:
+				continue
+			for pk, variants in references.get(name, []):
+				if not dry_run:
+					if variants.get('source') == name:
+						# The variants were rendered from the same bytes and stay valid
+						variants = {**variants, 'source': keep}
+					Article.objects.filter(pk=pk).update(image=keep, image_variants=variants, updated_at=timezone.now())
+					bump_card_version('article', pk)
+				updated += 1
+			reclaimed += storage.size(name)
+			removed += 1
+			if not dry_run:
+				storage.delete(name)
+
+	if not dry_run:
+		recount()
+	return DedupeReport(sum(len(names) for names in by_digest.values()), removed, updated, reclaimed)
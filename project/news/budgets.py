@@ -0,0 +1,160 @@
+"""SQL query budgets per route.
+
+``QUERY_BUDGETS`` declares the most queries a warm request to each page may
+run for a given audience, session and user lookups included. A change that
+adds a query per row, like a missing ``select_related``, pushes a page over
+its budget. Tests call ``check_budget`` (or wrap any block in
+``assert_max_queries``); ``manage.py check_query_budgets`` checks every
+budget against the current database. At runtime ``InstrumentationMiddleware``
+logs a warning when a request goes over its budget by more than
+``RUNTIME_HEADROOM``, which covers cold caches.
+"""
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, NamedTuple, Optional
+
+from django.db import connections
+from django.urls import reverse
+
+ANONYMOUS = 'anonymous'
+VIP = 'vip'
+SUPERUSER = 'superuser'
+RUNTIME_HEADROOM = 5
+
+
+class QueryBudgetExceeded(AssertionError):
+	pass
+
+
+class Budget(NamedTuple):
+	url_name: str
+	audience: str
+	max_queries: int
+	query_string: str = ''
+
+
+QUERY_BUDGETS = (
+	# The home and article pages include the queries of their HTTP validators (news.conditional)
+	Budget('news:home', ANONYMOUS, 4),
+	Budget('news:home', VIP, 6),
+	Budget('news:home', SUPERUSER, 6),
+	Budget('news:article_feed', ANONYMOUS, 1),
+	Budget('news:search', ANONYMOUS, 3, 'q=news'),
+	Budget('news:tag_articles', ANONYMOUS, 3),
+	Budget('news:category_articles', ANONYMOUS, 3),
+	Budget('news:article_detail', ANONYMOUS, 7),
+	Budget('news:article_detail', VIP, 9),
+	Budget('news:profile', VIP, 3),
+	Budget('news:survey_list', VIP, 4),
+	Budget('news:survey_detail', VIP, 4),
+	Budget('news:survey_submitted', VIP, 4),
+	Budget('news:superuser_dashboard', SUPERUSER, 7),
+	Budget('news:user_management', SUPERUSER, 6),
+	Budget('news:user_responses', SUPERUSER, 7),
+	Budget('news:survey_results', SUPERUSER, 12),
+	Budget('news:survey_responses', SUPERUSER, 8),
+	Budget('news:survey_edit', SUPERUSER, 5),
+	Budget('news:survey_delete', SUPERUSER, 4),
+	Budget('news:article_delete', SUPERUSER, 3),
+)
+
+
+def _first(model_path: str, field: str, **filters) -> Callable[[], Optional[Dict]]:
+	def sample():
+		from django.apps import apps
+
+		model = apps.get_model(model_path)
+		value = model.objects.filter(**filters).order_by('pk').values_list(field, flat=True).first()
+		# The URL keyword arguments are named after the fields (slug, pk)
+		return None if value is None else {field: value}
+
+	return sample
+
+
+# URL arguments of parameterized routes, sampled from the database
+SAMPLE_ARGUMENTS = {
+	'news:tag_articles': _first('news.Tag', 'slug'),
+	'news:category_articles': _first('news.Category', 'slug'),
+	'news:article_detail': _first('news.Article', 'slug'),
+	'news:article_delete': _first('news.Article', 'slug'),
+	'news:survey_detail': _first('news.Survey', 'pk'),
+	'news:survey_submitted': _first('news.Survey', 'pk'),
+	'news:survey_edit': _first('news.Survey', 'pk'),
+	'news:survey_delete': _first('news.Survey', 'pk'),
+	'news:survey_responses': _first('news.Survey', 'pk'),
+	'news:user_responses': _first('auth.User', 'pk', survey_responses__isnull=False),
+}
+
+_runtime_budgets = {}
+for _budget in QUERY_BUDGETS:
+	_runtime_budgets[_budget.url_name] = max(_runtime_budgets.get(_budget.url_name, 0), _budget.max_queries)
+
+
+def budget_for(view_name: str) -> Optional[int]:
+	"""The most queries a live request to a view may run before a warning is logged"""
+	budget = _runtime_budgets.get(view_name)
+	return None if budget is None else budget + RUNTIME_HEADROOM
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = 'Block'):
+	"""Fail with the captured SQL when the block runs more than ``limit`` queries on all databases together
+
+	Yields the list the queries are captured in, as ``{'alias', 'sql'}`` dicts.
+	"""
+	captured = []
+
+	def capture(execute, sql, params, many, context):
+		captured.append({'alias': context['connection'].alias, 'sql': sql})
+		return execute(sql, params, many, context)
+
+	with ExitStack() as stack:
+		# Every alias, so reads routed to a replica count too; a test mirror may share its primary's connection
+		for wrapped in {id(connections[alias]): connections[alias] for alias in connections}.values():
+			stack.enter_context(wrapped.execute_wrapper(capture))
+		yield captured
+	if len(captured) > limit:
+		statements = '\n'.join(f'  [{query["alias"]}] {query["sql"]}' for query in captured)
+		raise QueryBudgetExceeded(f'{label} ran {len(captured)} queries, budget is {limit}:\n{statements}')
+
+
+def audience_users(vip: Optional[str] = None, superuser: Optional[str] = None) -> Dict[str, object]:
+	"""The user each audience is requested as: the named users, else the first VIP and superuser
+
+	An audience without a user maps to ``None``; raises ``User.DoesNotExist``
+	for an unknown username.
+	"""
+	from django.contrib.auth.models import User
+
+	def find(username, **filters):
+		if username:
+			user = User.objects.filter(username=username).first()
+			if user is None:
+				raise User.DoesNotExist(f'User {username} does not exist.')
+			return user
+		return User.objects.filter(**filters).order_by('pk').first()
+
+	return {
+		ANONYMOUS: None,
+		VIP: find(vip, profile__is_vip=True, is_superuser=False),
+		SUPERUSER: find(superuser, is_superuser=True),
+	}
+
+
+def budget_url(budget: Budget, kwargs: Optional[Dict] = None) -> str:
+	url = reverse(budget.url_name, kwargs=kwargs)
+	return f'{url}?{budget.query_string}' if budget.query_string else url
+
+
+def check_budget(client, budget: Budget, kwargs: Optional[Dict] = None) -> int:
+	"""Request a budgeted page twice, the first time to warm the caches, and check the second
+
+	``client`` must already be logged in as the budget's audience. Returns the
+	number of queries; raises ``QueryBudgetExceeded`` when over budget.
+	"""
+	url = budget_url(budget, kwargs)
+	client.get(url)
+	with assert_max_queries(budget.max_queries, f'{budget.url_name} ({budget.audience})') as captured:
+		response = client.get(url)
+	if response.status_code >= 400:
+		raise QueryBudgetExceeded(f'{budget.url_name} ({budget.audience}) answered {response.status_code}')
+	return len(captured)
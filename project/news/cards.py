@@ -0,0 +1,55 @@
+"""Version stamps for cached home page cards.
+
+Card fragments are cached with ``{% cache %}`` keyed by object id and a
+version stamp. The stamp lives in the cache and is replaced by the
+``post_save``/``post_delete`` receivers in ``news.signals`` whenever
+something shown on the card changes, so an edit is visible on the next
+request without waiting for the fragment to expire.
+
+Stamps are replaced once the change commits, and a card read from a replica
+within ``news.replicas.staleness()`` of its stamp gets a version of its own:
+the replica may not have the change yet, and the fragment it renders must
+not be cached under the stamp the current data belongs to.
+"""
+import time
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .replicas import replica_aliases, staleness
+
+CARD_TIMEOUT = 300
+VERSION_KEY = 'news:card-version:{}:{}'
+
+
+def _new_version() -> str:
+	return str(time.time_ns())
+
+
+def bump_card_version(kind: str, pk) -> None:
+	"""Invalidate the cached card of one object"""
+	if pk is not None:
+		# After the commit, so a request reading the old row cannot cache it under the new stamp
+		transaction.on_commit(lambda: cache.set(VERSION_KEY.format(kind, pk), _new_version(), timeout=None))
+
+
+def attach_card_versions(objects: Iterable, kind: str) -> list:
+	"""Set ``card_version`` on every object with one cache round trip"""
+	objects = list(objects)
+	keys = {obj.pk: VERSION_KEY.format(kind, obj.pk) for obj in objects}
+	versions = cache.get_many(keys.values())
+	missing = {}
+	replicas = replica_aliases()
+	window = time.time_ns() - int(staleness() * 1e9)
+	for obj in objects:
+		version = versions.get(keys[obj.pk])
+		if version is None:
+			# An unknown (or evicted) stamp gets a fresh one, so older fragments can never match it
+			version = missing[keys[obj.pk]] = _new_version()
+		if obj._state.db in replicas and int(version) > window:
+			version = f'{version}-{obj._state.db}'
+		obj.card_version = version
+	if missing:
+		cache.set_many(missing, timeout=None)
+	return objects
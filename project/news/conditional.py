@@ -0,0 +1,178 @@
+"""Conditional GET for the home and article pages.
+
+The validators are computed before the view loads or renders anything, from
+small indexed queries over exactly what the page shows: the ids and
+``updated_at`` of the article and its related articles (one query when
+related rows exist), of the home page's article page and most visited
+articles, and the card versions of the home page surveys. Whoever is looking
+is part of the ETag too, since the pages greet the user and show role-based
+links. A matching ``If-None-Match`` (or ``If-Modified-Since``) gets a 304 and
+the view never runs.
+
+View counts are left out: ``updated_at`` does not move when they are
+flushed, so a cached page shows the count it was rendered with. The article
+view still counts a visit answered with a 304. Pages are sent with
+``Cache-Control: no-cache`` so browsers and CDNs revalidate every time, and
+as ``private`` to signed-in users.
+
+``If-Modified-Since`` only counts when ``If-None-Match`` is absent, and the
+home page has no ``Last-Modified`` at all: a deleted article does not move
+the newest ``updated_at``, while it does change the ETag.
+"""
+import hashlib
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .cards import attach_card_versions
+from .models import Article, RelatedArticle, Survey
+from .pagination import InvalidCursor, KeysetPaginator
+from .principal import get_principal
+
+# Related articles shown on the article page
+RELATED_SHOWN = 3
+MOST_VISITED_SHOWN = 6
+SURVEYS_SHOWN = 5
+
+
+class Validators(NamedTuple):
+	etag: str
+	last_modified: Optional[datetime]
+
+
+class ArticleState(NamedTuple):
+	"""An article page's validators, and the article id so a 304 can still count the visit"""
+	pk: int
+	validators: Optional[Validators]
+
+
+def _viewer(request) -> Tuple:
+	user = request.user
+	if not user.is_authenticated:
+		return ('anonymous',)
+	# The logout form embeds a token made from the CSRF secret, which changes at every login
+	return (user.pk, user.get_username(), get_principal(request).role, request.META.get('CSRF_COOKIE', ''))
+
+
+def _validators(request, parts: Sequence, last_modified: Optional[datetime] = None) -> Optional[Validators]:
+	# A pending flash message is shown once; never answer that request from a cached page
+	if len(get_messages(request)):
+		return None
+	digest = hashlib.md5(repr((*parts, _viewer(request))).encode(), usedforsecurity=False).hexdigest()
+	return Validators(f'W/{quote_etag(digest)}', last_modified)
+
+
+def _newest(rows: Iterable[Tuple[int, datetime]], *moments: datetime) -> datetime:
+	return max([*moments, *(moment for _, moment in rows)])
+
+
+def _related(slug: str):
+	return (
+		RelatedArticle.objects.filter(article__slug=slug).order_by('rank')
+		.values_list('article_id', 'article__updated_at', 'related_id', 'related__updated_at')[:RELATED_SHOWN]
+	)
+
+
+def _by_author(pk: int, author: str):
+	# The article page's fallback when an article has no related rows
+	return Article.objects.filter(author=author).exclude(pk=pk).values_list('id', 'updated_at')[:RELATED_SHOWN]
+
+
+def _article_state(request, pk: int, updated_at: datetime, shown: List[Tuple[int, datetime]]) -> ArticleState:
+	return ArticleState(pk, _validators(request, ('article', pk, updated_at, shown), _newest(shown, updated_at)))
+
+
+def article_state(request, slug: str) -> Optional[ArticleState]:
+	"""Validators of an article page; ``None`` when there is no such article"""
+	rows = list(_related(slug))
+	if rows:
+		pk, updated_at = rows[0][:2]
+		return _article_state(request, pk, updated_at, [row[2:] for row in rows])
+	article = Article.objects.filter(slug=slug).values_list('pk', 'author', 'updated_at').first()
+	if article is None:
+		return None
+	pk, author, updated_at = article
+	return _article_state(request, pk, updated_at, list(_by_author(pk, author)))
+
+
+async def aarticle_state(request, slug: str) -> Optional[ArticleState]:
+	"""``article_state`` for async views, once ``request.user`` is resolved"""
+	rows = [row async for row in _related(slug)]
+	if rows:
+		pk, updated_at = rows[0][:2]
+		return _article_state(request, pk, updated_at, [row[2:] for row in rows])
+	article = await Article.objects.filter(slug=slug).values_list('pk', 'author', 'updated_at').afirst()
+	if article is None:
+		return None
+	pk, author, updated_at = article
+	return _article_state(request, pk, updated_at, [row async for row in _by_author(pk, author)])
+
+
+def _home_queries(request, per_page: int, ordering: Sequence[str]):
+	principal = get_principal(request)
+	rows = Article.objects.only('id', 'updated_at', *(name.lstrip('-') for name in ordering))
+	paginator = KeysetPaginator(rows, per_page, ordering)
+	if principal.is_superuser or principal.is_vip:
+		extra = Survey.objects.order_by('-created_at', '-id').only('id')[:SURVEYS_SHOWN]
+	elif not principal.is_authenticated:
+		extra = (
+			Article.objects.filter(views__gt=0).order_by('-views', '-published_at')
+			.values_list('id', 'updated_at')[:MOST_VISITED_SHOWN]
+		)
+	else:
+		extra = None
+	return paginator, extra
+
+
+def _home_validators(request, page, extra: Optional[list]) -> Optional[Validators]:
+	if extra and isinstance(extra[0], Survey):
+		# Survey cards change with their questions and responses; their card versions follow that
+		extra = [(survey.pk, survey.card_version) for survey in attach_card_versions(extra, 'survey')]
+	rows = [(article.pk, article.updated_at) for article in page.object_list]
+	return _validators(request, ('home', rows, page.has_next(), extra))
+
+
+def home_validators(request, per_page: int, ordering: Sequence[str]) -> Optional[Validators]:
+	"""Validators of a home page; ``None`` for an invalid cursor, which the view answers with a 404"""
+	paginator, extra = _home_queries(request, per_page, ordering)
+	try:
+		page = paginator.page(request.GET.get('cursor'))
+	except InvalidCursor:
+		return None
+	return _home_validators(request, page, None if extra is None else list(extra))
+
+
+async def ahome_validators(request, per_page: int, ordering: Sequence[str]) -> Optional[Validators]:
+	"""``home_validators`` for async views, once the principal is loaded"""
+	paginator, extra = _home_queries(request, per_page, ordering)
+	try:
+		page = await paginator.apage(request.GET.get('cursor'))
+	except InvalidCursor:
+		return None
+	return _home_validators(request, page, None if extra is None else [row async for row in extra])
+
+
+def not_modified(request, validators: Optional[Validators]):
+	"""The 304 (or 412) answer to a conditional request whose validators match, else ``None``"""
+	if validators is None:
+		return None
+	# HTTP dates have whole seconds
+	last_modified = int(validators.last_modified.timestamp()) if validators.last_modified else None
+	response = get_conditional_response(request, etag=validators.etag, last_modified=last_modified)
+	return response if response is None else add_validators(request, response, validators)
+
+
+def add_validators(request, response, validators: Optional[Validators]):
+	if validators is None or response.status_code not in (200, 304):
+		return response
+	response.headers['ETag'] = validators.etag
+	if validators.last_modified:
+		response.headers['Last-Modified'] = http_date(validators.last_modified.timestamp())
+	if request.user.is_authenticated:
+		patch_cache_control(response, no_cache=True, private=True)
+	else:
+		patch_cache_control(response, no_cache=True)
+	return response
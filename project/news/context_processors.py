@@ -0,0 +1,6 @@
+from .principal import get_principal
+
+
+def principal(request):
+	"""Expose ``principal`` so templates check roles without touching ``user.profile``"""
+	return {'principal': get_principal(request)}
@@ -0,0 +1,181 @@
+"""Superuser dashboard statistics.
+
+The counters are computed with one conditional aggregate per table and kept
+in the cache, one key per counter, for ``SNAPSHOT_TIMEOUT`` seconds. Model
+signals nudge the cached counters with ``cache.incr`` so they stay current
+between recomputations; a counter that is missing (expired, evicted or
+dropped because a change could not be applied incrementally) makes the next
+read recompute the whole snapshot.
+
+The charts read the ``ArticleDailyCount`` and ``ResponseHourlyCount`` rollup
+tables, which the same signals keep up to date and ``rebuild_rollups``
+recomputes.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest, TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import Article, ArticleDailyCount, Response, ResponseHourlyCount, Survey
+from .replicas import PRIMARY
+
+SNAPSHOT_TIMEOUT = 300
+COUNTER_KEY = 'news:dashboard:{}'
+COUNTERS = (
+	'total_users', 'vip_users', 'superusers', 'total_articles', 'total_surveys', 'active_surveys', 'inactive_surveys',
+	'total_responses',
+)
+CHART_DAYS = 30
+CHART_HOURS = 48
+
+
+def compute_snapshot() -> Dict[str, int]:
+	"""Count everything with one aggregate query per table"""
+	# On the primary: signals nudge the cached counters from here on, so a replica missing recent
+	# writes would leave them off until the snapshot expires
+	snapshot = {}
+	users = User.objects.using(PRIMARY).aggregate(
+		total=Count('id'),
+		vip=Count('id', filter=Q(profile__is_vip=True)),
+		superusers=Count('id', filter=Q(is_superuser=True)),
+	)
+	snapshot['total_users'] = users['total']
+	snapshot['vip_users'] = users['vip']
+	snapshot['superusers'] = users['superusers']
+	snapshot['total_articles'] = Article.objects.using(PRIMARY).count()
+	surveys = Survey.objects.using(PRIMARY).aggregate(
+		total_surveys=Count('id'),
+		active_surveys=Count('id', filter=Q(active=True)),
+		inactive_surveys=Count('id', filter=Q(active=False)),
+	)
+	snapshot.update(surveys)
+	snapshot['total_responses'] = Response.objects.using(PRIMARY).count()
+	return snapshot
+
+
+def get_snapshot() -> Dict[str, int]:
+	"""Return the cached counters, recomputing them when any is missing"""
+	keys = {name: COUNTER_KEY.format(name) for name in COUNTERS}
+	cached = cache.get_many(keys.values())
+	if len(cached) == len(keys):
+		return {name: cached[key] for name, key in keys.items()}
+	snapshot = compute_snapshot()
+	cache.set_many({keys[name]: value for name, value in snapshot.items()}, timeout=SNAPSHOT_TIMEOUT)
+	return snapshot
+
+
+def _apply(deltas: Dict[str, int]) -> None:
+	for name, delta in deltas.items():
+		if not delta:
+			continue
+		try:
+			cache.incr(COUNTER_KEY.format(name), delta)
+		except ValueError:
+			# Not cached: the next read recomputes it
+			pass
+
+
+def nudge(**deltas: int) -> None:
+	"""Adjust cached counters once the current transaction commits, e.g. ``nudge(total_users=1)``"""
+	transaction.on_commit(lambda: _apply(deltas))
+
+
+def invalidate(*names: str) -> None:
+	"""Drop counters that cannot be adjusted incrementally (all of them by default)"""
+	keys = [COUNTER_KEY.format(name) for name in names or COUNTERS]
+	transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _bump(model, field: str, value, delta: int) -> None:
+	rows = model.objects.filter(**{field: value})
+	if delta > 0:
+		model.objects.bulk_create([model(**{field: value})], ignore_conflicts=True)
+		rows.update(count=F('count') + delta)
+	else:
+		# A bucket may hold less than is taken out (rows inserted before the rollups existed): stop at
+		# zero. GREATEST comes first so the unsigned column never holds a negative intermediate value.
+		rows.update(count=Greatest(F('count'), -delta) + delta)
+
+
+def _day(moment: datetime) -> date:
+	return timezone.localdate(moment)
+
+
+def _hour(moment: datetime) -> datetime:
+	return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def record_article(published_at: datetime, delta: int = 1) -> None:
+	_bump(ArticleDailyCount, 'day', _day(published_at), delta)
+
+
+def record_articles(published_at: Iterable[datetime]) -> None:
+	"""``record_article`` for many new articles, with one update per day"""
+	for day, total in Counter(_day(moment) for moment in published_at).items():
+		_bump(ArticleDailyCount, 'day', day, total)
+
+
+def record_response(submitted_at: datetime, delta: int = 1) -> None:
+	_bump(ResponseHourlyCount, 'hour', _hour(submitted_at), delta)
+
+
+def record_responses(submitted_at: Iterable[datetime], delta: int = 1) -> None:
+	"""``record_response`` for many responses, with one update per hour"""
+	for hour, total in Counter(_hour(moment) for moment in submitted_at).items():
+		_bump(ResponseHourlyCount, 'hour', hour, total * delta)
+
+
+def rebuild_rollups() -> Tuple[int, int]:
+	"""Recompute both rollup tables and return how many rows each got"""
+	days = (
+		Article.objects.order_by().annotate(day=TruncDate('published_at'))
+		.values_list('day').annotate(total=Count('id'))
+	)
+	hours = (
+		Response.objects.order_by().annotate(hour=TruncHour('submitted_at'))
+		.values_list('hour').annotate(total=Count('id'))
+	)
+	with transaction.atomic():
+		ArticleDailyCount.objects.all().delete()
+		ResponseHourlyCount.objects.all().delete()
+		articles = ArticleDailyCount.objects.bulk_create(
+			[ArticleDailyCount(day=day, count=total) for day, total in days], batch_size=1000
+		)
+		responses = ResponseHourlyCount.objects.bulk_create(
+			[ResponseHourlyCount(hour=hour, count=total) for hour, total in hours], batch_size=1000
+		)
+	return len(articles), len(responses)
+
+
+def articles_per_day(days: int = CHART_DAYS) -> List[Tuple[date, int]]:
+	"""``(day, count)`` for the last ``days`` days, oldest first, zero-filled"""
+	today = timezone.localdate()
+	start = today - timedelta(days=days - 1)
+	counts = dict(ArticleDailyCount.objects.filter(day__gte=start).values_list('day', 'count'))
+	return [(start + timedelta(days=offset), counts.get(start + timedelta(days=offset), 0)) for offset in range(days)]
+
+
+def responses_per_hour(hours: int = CHART_HOURS) -> List[Tuple[datetime, int]]:
+	"""``(hour, count)`` for the last ``hours`` hours, oldest first, zero-filled"""
+	start = _hour(timezone.now()) - timedelta(hours=hours - 1)
+	counts = {
+		_hour(hour): count
+		for hour, count in ResponseHourlyCount.objects.filter(hour__gte=start).values_list('hour', 'count')
+	}
+	return [(start + timedelta(hours=offset), counts.get(start + timedelta(hours=offset), 0)) for offset in range(hours)]
+
+
+def chart(points: List[Tuple[object, int]]) -> Dict:
+	"""Bar heights in percent of the largest bucket, for the template"""
+	peak = max((count for _, count in points), default=0)
+	return {
+		'peak': peak,
+		'total': sum(count for _, count in points),
+		'bars': [(label, count, round(100 * count / peak) if peak else 0) for label, count in points],
+	}
@@ -0,0 +1,105 @@
+"""Streaming export of survey responses.
+
+Responses are walked in primary-key batches, each read with its own short
+query, and the answers and selected choices of a batch are fetched with two
+more queries. Only the current batch and the survey's questions and choices
+are held in memory, so an export runs in constant memory and never keeps one
+long query open against the database.
+"""
+import csv
+import json
+from collections import defaultdict
+from typing import Dict, Iterator
+
+from .models import Question, QuestionChoice, Response, ResponseAnswer
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 2000
+CSV_HEADER = (
+	'response_id', 'user', 'submitted_at', 'score', 'max_possible_score',
+	'question_id', 'question', 'question_type', 'answer_text', 'selected_choices',
+)
+
+
+class _Echo:
+	"""File-like object whose ``write`` returns the value, for ``csv.writer``"""
+
+	def write(self, value):
+		return value
+
+
+def iter_responses(survey, batch_size: int = BATCH_SIZE) -> Iterator[Dict]:
+	"""Yield every response of a survey as a dict with its answers"""
+	questions = {
+		pk: (text, question_type)
+		for pk, text, question_type in Question.objects.filter(survey=survey).values_list('id', 'text', 'question_type')
+	}
+	choices = dict(QuestionChoice.objects.filter(question__survey=survey).values_list('id', 'text'))
+	through = ResponseAnswer.selected_choices.through
+	responses = Response.objects.filter(survey=survey).order_by('pk').values_list(
+		'id', 'user__username', 'submitted_at', 'score', 'max_possible_score'
+	)
+
+	last_pk = 0
+	while True:
+		batch = list(responses.filter(pk__gt=last_pk)[:batch_size])
+		if not batch:
+			return
+		last_pk = batch[-1][0]
+		ids = [row[0] for row in batch]
+
+		selected = defaultdict(list)
+		links = through.objects.filter(responseanswer__response_id__in=ids).order_by('questionchoice_id').values_list(
+			'responseanswer_id', 'questionchoice_id'
+		)
+		for answer_id, choice_id in links.iterator(chunk_size=CHUNK_SIZE):
+			selected[answer_id].append(choices.get(choice_id, ''))
+
+		answers = defaultdict(list)
+		rows = ResponseAnswer.objects.filter(response_id__in=ids).order_by('response_id', 'id').values_list(
+			'id', 'response_id', 'question_id', 'answer_text'
+		)
+		for answer_id, response_id, question_id, answer_text in rows.iterator(chunk_size=CHUNK_SIZE):
+			answers[response_id].append({
+				'question_id': question_id,
+				'question': questions.get(question_id, ('', ''))[0],
+				'question_type': questions.get(question_id, ('', ''))[1],
+				'answer_text': answer_text,
+				'selected_choices': selected.pop(answer_id, []),
+			})
+
+		for response_id, username, submitted_at, score, max_possible_score in batch:
+			yield {
+				'response_id': response_id,
+				'user': username,
+				'submitted_at': submitted_at.isoformat(),
+				'score': score,
+				'max_possible_score': max_possible_score,
+				'answers': answers.pop(response_id, []),
+			}
+
+
+def csv_lines(survey) -> Iterator[str]:
+	"""CSV with one row per answer; selected choices are joined with "; " """
+	writer = csv.writer(_Echo())
+	yield writer.writerow(CSV_HEADER)
+	for response in iter_responses(survey):
+		head = [response[field] for field in CSV_HEADER[:5]]
+		for answer in response['answers']:
+			yield writer.writerow(head + [
+				answer['question_id'], answer['question'], answer['question_type'],
+				answer['answer_text'], '; '.join(answer['selected_choices']),
+			])
+
+
+def ndjson_lines(survey) -> Iterator[str]:
+	"""One JSON object per response, newline-delimited"""
+	for response in iter_responses(survey):
+		yield json.dumps(response, ensure_ascii=False) + '\n'
+
+
+# format name -> (content type, line generator)
+FORMATS = {
+	'csv': ('text/csv; charset=utf-8', csv_lines),
+	'ndjson': ('application/x-ndjson; charset=utf-8', ndjson_lines),
+}
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Survey, Question, Article, Profile, QuestionChoice
+from .schema import SurveySchema, get_schema
 
 
 class ProfileUpdateForm(forms.ModelForm):
@@ -51,9 +52,11 @@ class QuestionChoiceForm(forms.ModelForm):
 class SurveyResponseForm(forms.Form):
 	def __init__(self, *args, **kwargs):
 		survey: Survey = kwargs.pop('survey')
+		# Fields come from the compiled schema, so building the form runs no per-question queries
+		self.schema: SurveySchema = kwargs.pop('schema', None) or get_schema(survey.pk)
 		super().__init__(*args, **kwargs)
-		for question in survey.questions.all():
-			field_name = f"question_{question.id}"
+		for question in self.schema.questions:
+			field_name = question.field_name
 			if question.question_type == 'text':
 				self.fields[field_name] = forms.CharField(
 					label=question.text,
@@ -61,7 +64,7 @@ class SurveyResponseForm(forms.Form):
 					widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
 				)
 			elif question.question_type == 'radio':
-				choices = [(choice.id, choice.text) for choice in question.choices.all()]
+				choices = [(choice.id, choice.text) for choice in question.choices]
 				self.fields[field_name] = forms.ChoiceField(
 					label=question.text,
 					required=question.required,
@@ -69,7 +72,7 @@ class SurveyResponseForm(forms.Form):
 					widget=forms.RadioSelect(attrs={'class': 'form-check-input'}),
 				)
 			elif question.question_type == 'checkbox':
-				choices = [(choice.id, choice.text) for choice in question.choices.all()]
+				choices = [(choice.id, choice.text) for choice in question.choices]
 				self.fields[field_name] = forms.MultipleChoiceField(
 					label=question.text,
 					required=question.required,
@@ -0,0 +1,135 @@
+"""Responsive variants of article images.
+
+When an article's image changes, resized JPEG and WebP copies are rendered
+with Pillow on a small thread pool, off the request path, and their names and
+dimensions are stored in ``Article.image_variants``::
+
+	{"source": "articles/photo.jpg", "width": 4000, "height": 3000,
+	 "variants": [{"name": "articles/variants/photo_jpg-320.webp", "width": 320, "height": 240, "format": "webp"}, ...]}
+
+Templates read them through the ``article_images`` tags, which emit
+``srcset`` so card grids only download thumbnails.
+"""
+import atexit
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Article
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMATS = (
+	# (format, Pillow format, extension, save options)
+	('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+	('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+VARIANT_DIR = 'variants'
+
+_executor = None
+
+
+def _variant_name(source: str, width: int, extension: str) -> str:
+	directory, filename = os.path.split(source)
+	# Keep the original extension in the name so photo.jpg and photo.png do not share variants
+	stem = filename.replace('.', '_')
+	return os.path.join(directory, VARIANT_DIR, f'{stem}-{width}.{extension}').replace(os.sep, '/')
+
+
+def render_variants(source: str) -> Dict:
+	"""Write every variant of a stored image and return the ``image_variants`` description"""
+	with default_storage.open(source, 'rb') as handle:
+		original = ImageOps.exif_transpose(Image.open(handle))
+		original.load()
+	width, height = original.size
+	# Never upscale: widths past the original collapse to the original width
+	widths = sorted({min(target, width) for target in VARIANT_WIDTHS})
+
+	variants = []
+	for target in widths:
+		resized = original if target == width else original.resize(
+			(target, max(1, round(height * target / width))), Image.LANCZOS
+		)
+		for kind, pillow_format, extension, options in VARIANT_FORMATS:
+			image = resized.convert('RGB') if pillow_format == 'JPEG' or resized.mode not in ('RGB', 'RGBA') else resized
+			buffer = io.BytesIO()
+			image.save(buffer, pillow_format, **options)
+			name = _variant_name(source, target, extension)
+			if default_storage.exists(name):
+				default_storage.delete(name)
+			name = default_storage.save(name, ContentFile(buffer.getvalue()))
+			variants.append({'name': name, 'width': resized.width, 'height': resized.height, 'format': kind})
+	return {'source': source, 'width': width, 'height': height, 'variants': variants}
+
+
+def delete_variants(image_variants: Dict) -> None:
+	for variant in (image_variants or {}).get('variants', []):
+		if default_storage.exists(variant['name']):
+			default_storage.delete(variant['name'])
+
+
+def needs_variants(article: Article) -> bool:
+	return bool(article.image) and (article.image_variants or {}).get('source') != article.image.name
+
+
+def generate_variants(article_id: int) -> bool:
+	"""Render the variants of one article's image; returns whether anything was written"""
+	article = Article.objects.filter(pk=article_id).only('id', 'image', 'image_variants').first()
+	if article is None or not needs_variants(article):
+		return False
+	previous = article.image_variants
+	variants = render_variants(article.image.name)
+	# The image may have been replaced while rendering; only record variants of the current one
+	updated = Article.objects.filter(pk=article_id, image=variants['source']).update(image_variants=variants, updated_at=timezone.now())
+	# Other articles may still use the previous image (and its variants) through a shared blob
+	if updated and previous.get('variants') and not Article.objects.filter(image=previous.get('source')).exists():
+		stale = {variant['name'] for variant in previous['variants']} - {variant['name'] for variant in variants['variants']}
+		delete_variants({'variants': [{'name': name} for name in stale]})
+
+	from .cards import bump_card_version
+	bump_card_version('article', article_id)
+	return bool(updated)
+
+
+def _run(article_id: int) -> None:
+	try:
+		generate_variants(article_id)
+	except Exception:
+		logger.exception('Could not render image variants of article %s', article_id)
+	finally:
+		close_old_connections()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+	global _executor
+	if _executor is None:
+		workers = getattr(settings, 'NEWS_IMAGE_WORKERS', 2)
+		_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='news-images')
+		atexit.register(_executor.shutdown, wait=True)
+	return _executor
+
+
+def schedule_variants(article_id: int) -> None:
+	"""Render the variants in the background once the current transaction commits"""
+	transaction.on_commit(lambda: _get_executor().submit(_run, article_id))
+
+
+def pick(image_variants: Dict, kind: str, width: Optional[int] = None) -> List[Dict]:
+	"""Variants of one format, smallest first, optionally only those up to ``width``"""
+	variants = sorted(
+		(variant for variant in (image_variants or {}).get('variants', []) if variant['format'] == kind),
+		key=lambda variant: variant['width'],
+	)
+	if width is not None:
+		variants = [variant for variant in variants if variant['width'] <= width] or variants[:1]
+	return variants
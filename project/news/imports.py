@@ -0,0 +1,280 @@
+"""Bulk article import from JSONL or CSV.
+
+Rows are streamed from the input and imported in batches. A batch gets its
+slugs from one lookup of the existing slugs sharing their bases (see
+``news.slugs``) and its excerpts and categories in memory. It is then
+written with one ``bulk_create`` in a transaction, together with its tags,
+image reference counts, dashboard counters and search index rows. Images are
+copied into the article storage on a thread pool while rows are being read.
+
+``on_batch`` gets the progress after every committed batch. An import given
+a ``checkpoint`` name also records its last row in an ``ImportCheckpoint``
+row written in each batch's transaction, so the checkpoint an interrupted
+import resumes from (``start_after=read_checkpoint(name)``) always matches
+the batches that were committed.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import IO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Article, ImportCheckpoint, make_excerpt
+from .replicas import PRIMARY
+from .slugs import SAVE_ATTEMPTS, allocate_slugs
+
+BATCH_SIZE = 500
+IMAGE_WORKERS = 8
+FORMATS = ('jsonl', 'csv')
+REQUIRED_FIELDS = ('title', 'content', 'author')
+# Checked against the column lengths before inserting
+CHAR_FIELDS = ('title', 'author', 'category', 'tags')
+
+
+class ArticleRow(NamedTuple):
+	row: int
+	title: str
+	content: str
+	author: str
+	category: str
+	tags: str
+	published_at: datetime
+	slug: str
+	excerpt: str
+	image: str
+
+
+class RowError(NamedTuple):
+	row: int
+	message: str
+
+
+class ImportProgress(NamedTuple):
+	rows: int
+	imported: int
+	errors: Tuple[RowError, ...]
+	last_row: int
+	seconds: float
+
+	@property
+	def rows_per_second(self) -> float:
+		return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_records(handle: IO[str], fmt: str) -> Iterator[Tuple[int, Union[Dict, RowError]]]:
+	"""``(row number, record)`` per input row, numbered from 1; unreadable rows come as a ``RowError``"""
+	if fmt == 'csv':
+		yield from enumerate(csv.DictReader(handle), start=1)
+		return
+	number = 0
+	for line in handle:
+		if not line.strip():
+			continue
+		number += 1
+		try:
+			record = json.loads(line)
+		except ValueError as exc:
+			yield number, RowError(number, f'invalid JSON: {exc}')
+			continue
+		yield number, record if isinstance(record, dict) else RowError(number, 'not a JSON object')
+
+
+def _parse_published_at(value: str) -> datetime:
+	if not value:
+		return timezone.now()
+	moment = parse_datetime(value)
+	if moment is None:
+		day = parse_date(value)
+		if day is None:
+			raise ValueError(f'published_at {value!r} is not a date')
+		moment = datetime.combine(day, datetime.min.time())
+	return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def parse_row(number: int, record: Dict) -> ArticleRow:
+	"""Validate one input record; raises ``ValueError`` describing the first problem"""
+	values = {key: '' if value is None else str(value).strip() for key, value in record.items() if key}
+	missing = [field for field in REQUIRED_FIELDS if not values.get(field)]
+	if missing:
+		raise ValueError(f'missing {", ".join(missing)}')
+	values['category'] = values.get('category') or Article._meta.get_field('category').default
+	for field in CHAR_FIELDS:
+		max_length = Article._meta.get_field(field).max_length
+		if len(values.get(field, '')) > max_length:
+			raise ValueError(f'{field} is longer than {max_length} characters')
+
+	return ArticleRow(
+		row=number,
+		title=values['title'],
+		content=values['content'],
+		author=values['author'],
+		category=values['category'],
+		tags=values.get('tags', ''),
+		published_at=_parse_published_at(values.get('published_at', '')),
+		slug=values.get('slug', ''),
+		excerpt=values.get('excerpt') or make_excerpt(values['content']),
+		image=values.get('image', ''),
+	)
+
+
+def copy_image(source: str, image_root: Optional[str] = None) -> str:
+	"""Store an image file in the article image storage and return its storage name"""
+	field = Article._meta.get_field('image')
+	path = os.path.join(image_root, source) if image_root else source
+	with open(path, 'rb') as handle:
+		return field.storage.save(field.generate_filename(None, os.path.basename(path)), File(handle))
+
+
+def read_checkpoint(name: str) -> int:
+	"""The last row recorded by a checkpoint, ``0`` when there is none"""
+	# From the primary: a replica may not have the last batch's checkpoint yet
+	return ImportCheckpoint.objects.using(PRIMARY).filter(name=name).values_list('last_row', flat=True).first() or 0
+
+
+def write_checkpoint(name: str, last_row: int, imported: int) -> None:
+	ImportCheckpoint.objects.update_or_create(name=name, defaults={'last_row': last_row, 'imported': imported})
+
+
+def clear_checkpoint(name: str) -> None:
+	ImportCheckpoint.objects.filter(name=name).delete()
+
+
+def _insert(rows: List[ArticleRow], images: Dict[str, str], checkpoint: Optional[Tuple[str, int, int]] = None) -> List[Article]:
+	from . import blobs, dashboard
+	from .search import index_articles
+	from .taxonomy import link_tags, resolve_categories
+
+	for attempt in range(SAVE_ATTEMPTS):
+		# Source slugs are kept when free; slugify() leaves a valid slug unchanged
+		slugs = allocate_slugs({index: row.slug or row.title for index, row in enumerate(rows)})
+		articles = [
+			Article(
+				title=row.title, slug=slugs[index], content=row.content, author=row.author, category=row.category,
+				tags=row.tags, published_at=row.published_at, excerpt=row.excerpt, image=images.get(row.image, ''),
+			)
+			for index, row in enumerate(rows)
+		]
+		try:
+			with transaction.atomic():
+				resolve_categories(articles)
+				Article.objects.bulk_create(articles)
+				if articles[0].pk is None:
+					# Backends such as MySQL do not return primary keys from bulk inserts
+					ids = dict(Article.objects.filter(slug__in=slugs.values()).values_list('slug', 'id'))
+					for article in articles:
+						article.pk = ids[article.slug]
+				link_tags(articles)
+				blobs.acquire_many(article.image.name for article in articles)
+				dashboard.nudge(total_articles=len(articles))
+				dashboard.record_articles(article.published_at for article in articles)
+				index_articles(articles)
+				if checkpoint is not None:
+					write_checkpoint(*checkpoint)
+		except IntegrityError:
+			# Another writer may have taken one of the slugs between the lookup and the insert
+			taken = Article.objects.filter(slug__in=slugs.values()).exists()
+			if not taken or attempt == SAVE_ATTEMPTS - 1:
+				raise
+			continue
+		return articles
+
+
+def _refresh_related(article_ids: List[int]) -> None:
+	from .related import CANDIDATE_POOL, is_available, rebuild_related, refresh_related
+
+	if not article_ids or not is_available():
+		return
+	if len(article_ids) > CANDIDATE_POOL:
+		rebuild_related()
+	else:
+		refresh_related(article_ids)
+
+
+def import_articles(
+	handle: IO[str], fmt: str = 'jsonl', batch_size: int = BATCH_SIZE, image_root: Optional[str] = None,
+	image_workers: int = IMAGE_WORKERS, start_after: int = 0,
+	on_batch: Optional[Callable[[ImportProgress], None]] = None, checkpoint: Optional[str] = None,
+) -> ImportProgress:
+	"""Import the articles of a JSONL or CSV stream, skipping rows up to ``start_after``
+
+	Records need ``title``, ``content`` and ``author``; ``category``, ``tags``,
+	``published_at`` (ISO 8601), ``slug``, ``excerpt`` and ``image`` (a path,
+	relative to ``image_root``) are optional. Invalid rows are skipped and
+	reported in ``errors``; a row whose image cannot be copied is imported
+	without it. With a ``checkpoint`` name, every batch records its last row
+	under that name.
+	"""
+	from .images import schedule_variants
+
+	started = time.monotonic()
+	rows_read = imported = 0
+	last_row = start_after
+	errors: List[RowError] = []
+	batch: List[ArticleRow] = []
+	copies: Dict[str, Future] = {}
+	new_ids: List[int] = []
+	with_images: List[int] = []
+
+	def progress() -> ImportProgress:
+		return ImportProgress(rows_read, imported, tuple(errors), last_row, time.monotonic() - started)
+
+	def flush():
+		nonlocal imported
+		images = {}
+		for row in batch:
+			if not row.image or row.image in images:
+				continue
+			try:
+				images[row.image] = copies.pop(row.image).result()
+			except (OSError, ValueError) as exc:
+				images[row.image] = ''
+				errors.append(RowError(row.row, f'image {row.image} not copied: {exc}'))
+		if batch:
+			state = (checkpoint, last_row, imported + len(batch)) if checkpoint else None
+			articles = _insert(batch, images, state)
+		else:
+			articles = []
+			if checkpoint:
+				# Only invalid rows since the last batch
+				write_checkpoint(checkpoint, last_row, imported)
+		new_ids.extend(article.pk for article in articles)
+		with_images.extend(article.pk for article in articles if article.image)
+		imported += len(articles)
+		batch.clear()
+		if on_batch is not None:
+			on_batch(progress())
+
+	with ThreadPoolExecutor(max_workers=image_workers, thread_name_prefix='news-import') as pool:
+		for number, record in read_records(handle, fmt):
+			if number <= start_after:
+				continue
+			rows_read += 1
+			last_row = number
+			if isinstance(record, RowError):
+				errors.append(record)
+				continue
+			try:
+				row = parse_row(number, record)
+			except ValueError as exc:
+				errors.append(RowError(number, str(exc)))
+				continue
+			if row.image and row.image not in copies:
+				copies[row.image] = pool.submit(copy_image, row.image, image_root)
+			batch.append(row)
+			if len(batch) >= batch_size:
+				flush()
+		if batch or rows_read:
+			flush()
+
+	# Rendered once every batch is in, so the renderers' writes do not contend with the inserts
+	for article_id in with_images:
+		schedule_variants(article_id)
+	_refresh_related(new_ids)
+	return progress()
@@ -0,0 +1,111 @@
+"""EXPLAIN-based index advice.
+
+``advise`` requests every scenario of ``news.route_benchmark`` once, captures
+the ``SELECT`` statements the views run and asks the database for their
+plans: ``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN`` on MySQL. Plans that read
+a whole table or sort rows outside an index are reported, so a query added
+without a matching index shows up before it reaches production. Plans depend
+on the data; run it on a database of realistic size, e.g. one filled by
+``manage.py seed_benchmark_data``.
+"""
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.db import NotSupportedError, connection
+from django.test.utils import CaptureQueriesContext
+
+from .route_benchmark import prepare, requester, rolled_back, send
+
+FULL_SCAN = 'full scan'
+FILESORT = 'filesort'
+TEMPORARY = 'temporary table'
+
+_SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+_SQLITE_TABLE = re.compile(r'^(?:SCAN|SEARCH) (\w+)')
+
+
+class PlanIssue(NamedTuple):
+	kind: str
+	table: str
+	detail: str
+
+
+class QueryPlan(NamedTuple):
+	sql: str
+	views: Tuple[str, ...]
+	plan: Tuple[str, ...]
+	issues: Tuple[PlanIssue, ...]
+
+
+def _sqlite_plan(cursor, sql: str) -> Tuple[List[str], List[PlanIssue]]:
+	cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+	lines, issues = [], []
+	# Sorts and temporary tables apply to the whole result; charge them to the table the plan starts from
+	driving = ''
+	for row in cursor.fetchall():
+		detail = row[-1]
+		lines.append(detail)
+		table = _SQLITE_TABLE.match(detail)
+		if table and not driving:
+			driving = table.group(1)
+		scan = _SQLITE_SCAN.match(detail)
+		if scan:
+			issues.append(PlanIssue(FULL_SCAN, scan.group(1), detail))
+		elif detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+			issues.append(PlanIssue(FILESORT, driving, detail))
+		elif detail.startswith('USE TEMP B-TREE'):
+			issues.append(PlanIssue(TEMPORARY, driving, detail))
+	return lines, issues
+
+
+def _mysql_plan(cursor, sql: str) -> Tuple[List[str], List[PlanIssue]]:
+	cursor.execute(f'EXPLAIN {sql}')
+	columns = [column[0].lower() for column in cursor.description]
+	lines, issues = [], []
+	for values in cursor.fetchall():
+		row = dict(zip(columns, values))
+		table, extra = row.get('table') or '', row.get('extra') or ''
+		detail = f"{table}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')} {extra}".strip()
+		lines.append(detail)
+		if row.get('type') == 'ALL':
+			issues.append(PlanIssue(FULL_SCAN, table, detail))
+		if 'Using filesort' in extra:
+			issues.append(PlanIssue(FILESORT, table, detail))
+		if 'Using temporary' in extra:
+			issues.append(PlanIssue(TEMPORARY, table, detail))
+	return lines, issues
+
+
+def explain(sql: str, views: Iterable[str] = (), ignore: Iterable[str] = ()) -> QueryPlan:
+	"""The plan of one statement and its issues, leaving out those on the ``ignore`` tables"""
+	planners = {'sqlite': _sqlite_plan, 'mysql': _mysql_plan}
+	if connection.vendor not in planners:
+		raise NotSupportedError(f'Index advice needs SQLite or MySQL, not {connection.vendor}.')
+	with connection.cursor() as cursor:
+		lines, issues = planners[connection.vendor](cursor, sql)
+	ignore = set(ignore)
+	return QueryPlan(sql, tuple(views), tuple(lines), tuple(issue for issue in issues if issue.table not in ignore))
+
+
+def capture(users: Dict[str, object], only: Optional[str] = None) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+	"""``{select statement: scenario labels}`` of one cold request per scenario, and the skipped scenarios"""
+	runs, skipped = prepare(users, only)
+	statements: Dict[str, List[str]] = {}
+	for scenario, client, kwargs in runs:
+		with rolled_back():
+			with CaptureQueriesContext(connection) as captured:
+				send(requester(client, scenario, kwargs))
+		for query in captured.captured_queries:
+			if query['sql'].lstrip().upper().startswith('SELECT'):
+				views = statements.setdefault(query['sql'], [])
+				if scenario.label not in views:
+					views.append(scenario.label)
+	return statements, skipped
+
+
+def advise(users: Dict[str, object], only: Optional[str] = None, ignore: Iterable[str] = ()) -> Tuple[List[QueryPlan], Dict[str, str]]:
+	"""Plans of every statement the scenarios run, those with issues first"""
+	statements, skipped = capture(users, only)
+	plans = [explain(sql, views, ignore) for sql, views in statements.items()]
+	plans.sort(key=lambda plan: not plan.issues)
+	return plans, skipped
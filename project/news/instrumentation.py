@@ -0,0 +1,191 @@
+"""Per-request query and latency instrumentation.
+
+``InstrumentationMiddleware`` measures, for every request, the view name,
+the number of SQL queries, the time spent in the database, the time spent
+rendering templates and the total time. Each request is logged on the
+``news.instrumentation`` logger and added to an in-memory rolling window per
+view, whose percentiles the superuser dashboard shows. The window is per
+process. With ``DEBUG`` on, or for staff users, the figures are also sent in
+a ``Server-Timing`` header; other visitors do not get to see them.
+
+Queries are counted by an execute wrapper attached to every database
+connection and charged to the request stored in a context variable, so
+queries run by the async ORM in worker threads are counted as well.
+"""
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as BackendTemplate
+
+logger = logging.getLogger(__name__)
+
+ROLLING_WINDOW = getattr(settings, 'NEWS_INSTRUMENTATION_WINDOW', 500)
+
+_current: ContextVar[Optional['RequestStats']] = ContextVar('news_request_stats', default=None)
+_samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=ROLLING_WINDOW))
+_samples_lock = threading.Lock()
+_installed = False
+
+
+class RequestStats:
+	__slots__ = ('queries', 'db_time', 'render_time', 'rendering')
+
+	def __init__(self):
+		self.queries = 0
+		self.db_time = 0.0
+		self.render_time = 0.0
+		self.rendering = False
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+	"""Nearest-rank percentile, ``0`` for no values"""
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+	stats = _current.get()
+	if stats is None:
+		return execute(sql, params, many, context)
+	start = time.perf_counter()
+	try:
+		return execute(sql, params, many, context)
+	finally:
+		stats.queries += 1
+		stats.db_time += time.perf_counter() - start
+
+
+def _attach(connection, **kwargs):
+	if _execute_wrapper not in connection.execute_wrappers:
+		connection.execute_wrappers.append(_execute_wrapper)
+
+
+def _timed_render(render):
+	def wrapper(self, *args, **kwargs):
+		stats = _current.get()
+		# Templates rendered from inside another render (e.g. render_to_string in a tag) are already timed
+		if stats is None or stats.rendering:
+			return render(self, *args, **kwargs)
+		stats.rendering = True
+		start = time.perf_counter()
+		try:
+			return render(self, *args, **kwargs)
+		finally:
+			stats.rendering = False
+			stats.render_time += time.perf_counter() - start
+
+	return wrapper
+
+
+def install() -> None:
+	"""Hook the query counter into every connection and the render timer into the template backend"""
+	global _installed
+	if _installed:
+		return
+	_installed = True
+	connection_created.connect(_attach)
+	for connection in connections.all(initialized_only=True):
+		_attach(connection)
+	BackendTemplate.render = _timed_render(BackendTemplate.render)
+
+
+def record(view_name: str, total: float, stats: RequestStats) -> None:
+	with _samples_lock:
+		_samples[view_name].append((total, stats.queries, stats.db_time, stats.render_time))
+
+
+def summary() -> List[Dict]:
+	"""Rolling percentiles per view, slowest p95 first (times in milliseconds)"""
+	with _samples_lock:
+		windows = {name: list(samples) for name, samples in _samples.items()}
+	rows = []
+	for name, samples in windows.items():
+		totals = [sample[0] * 1000 for sample in samples]
+		queries = [sample[1] for sample in samples]
+		rows.append({
+			'view': name,
+			'requests': len(samples),
+			'p50_ms': round(percentile(totals, 50), 1),
+			'p95_ms': round(percentile(totals, 95), 1),
+			'p99_ms': round(percentile(totals, 99), 1),
+			'queries_p50': percentile(queries, 50),
+			'queries_max': max(queries),
+			'db_p95_ms': round(percentile([sample[2] * 1000 for sample in samples], 95), 1),
+			'render_p95_ms': round(percentile([sample[3] * 1000 for sample in samples], 95), 1),
+		})
+	return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+
+def reset() -> None:
+	with _samples_lock:
+		_samples.clear()
+
+
+class InstrumentationMiddleware:
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		install()
+		if iscoroutinefunction(get_response):
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if iscoroutinefunction(self):
+			return self.__acall__(request)
+		stats = RequestStats()
+		token = _current.set(stats)
+		start = time.perf_counter()
+		try:
+			response = self.get_response(request)
+		finally:
+			_current.reset(token)
+		total = time.perf_counter() - start
+		show_timing = settings.DEBUG or (hasattr(request, 'user') and request.user.is_staff)
+		return self._finish(request, response, stats, total, show_timing)
+
+	async def __acall__(self, request):
+		stats = RequestStats()
+		token = _current.set(stats)
+		start = time.perf_counter()
+		try:
+			response = await self.get_response(request)
+		finally:
+			_current.reset(token)
+		total = time.perf_counter() - start
+		show_timing = settings.DEBUG or (hasattr(request, 'auser') and (await request.auser()).is_staff)
+		return self._finish(request, response, stats, total, show_timing)
+
+	def _finish(self, request, response, stats: RequestStats, total: float, show_timing: bool):
+		match = getattr(request, 'resolver_match', None)
+		view_name = match.view_name if match else 'unresolved'
+		record(view_name, total, stats)
+		if show_timing:
+			response['Server-Timing'] = (
+				f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+				f'render;dur={stats.render_time * 1000:.1f}, total;dur={total * 1000:.1f}'
+			)
+		logger.debug(
+			'%s %s view=%s queries=%d db=%.1fms render=%.1fms total=%.1fms',
+			request.method, request.path, view_name, stats.queries,
+			stats.db_time * 1000, stats.render_time * 1000, total * 1000,
+		)
+
+		from .budgets import budget_for
+		# Budgets cover page loads; form submissions write and run more queries
+		budget = budget_for(view_name) if request.method in ('GET', 'HEAD') else None
+		if budget is not None and stats.queries > budget:
+			logger.warning('%s ran %d queries, over its budget of %d', view_name, stats.queries, budget)
+		return response
@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from news.benchmark import BenchmarkResult, run_asgi, run_wsgi
+from news.models import Article
+
+RUNNERS = {'wsgi': run_wsgi, 'asgi': run_asgi}
+
+
+class Command(BaseCommand):
+    help = 'Compare throughput and latency of the sync WSGI and async ASGI request paths at a fixed concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='URLs to request (default: home page, newest article, survey list with --user)')
+        parser.add_argument('--requests', type=int, default=500, help='Measured requests per handler')
+        parser.add_argument('--concurrency', type=int, default=16, help='Simultaneous clients')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests before timing starts')
+        parser.add_argument('--user', help='Username to send the requests as')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+        parser.add_argument('--handler', choices=sorted(RUNNERS), help='Run one handler in this process (used internally)')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} does not exist.")
+        paths = options['paths'] or self.default_paths(user)
+
+        if options['handler']:
+            result = RUNNERS[options['handler']](
+                paths, options['requests'], options['concurrency'], user=user, warmup=options['warmup'],
+            )
+            self.stdout.write(json.dumps(result._asdict()))
+            return
+
+        # Each handler runs in a fresh process: the URLconf picks sync or async views at import time
+        results = [self.run_handler(handler, paths, options) for handler in ('wsgi', 'asgi')]
+        if options['json']:
+            self.stdout.write(json.dumps({'paths': paths, 'results': [result._asdict() for result in results]}, indent=2))
+            return
+
+        self.stdout.write(f"{len(paths)} paths, {options['requests']} requests, concurrency {options['concurrency']}")
+        self.stdout.write(f"{'handler':<8}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for result in results:
+            self.stdout.write(
+                f'{result.handler:<8}{result.throughput:>10}{result.p50_ms:>10}{result.p90_ms:>10}'
+                f'{result.p99_ms:>10}{result.errors:>8}'
+            )
+        wsgi, asgi = results
+        if wsgi.throughput:
+            self.stdout.write(self.style.SUCCESS(f'ASGI/WSGI throughput: {asgi.throughput / wsgi.throughput:.2f}x'))
+
+    def default_paths(self, user):
+        paths = [reverse('news:home')]
+        article = Article.objects.exclude(slug='').only('slug').first()
+        if article is not None:
+            paths.append(reverse('news:article_detail', kwargs={'slug': article.slug}))
+        if user is not None:
+            paths.append(reverse('news:survey_list'))
+        return paths
+
+    def run_handler(self, handler, paths, options):
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_handlers', *paths,
+            '--handler', handler, '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']), '--warmup', str(options['warmup']),
+        ]
+        if options['user']:
+            command += ['--user', options['user']]
+        env = {**os.environ, 'NEWS_ASYNC_VIEWS': '1' if handler == 'asgi' else '0'}
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f'The {handler} run failed:\n{completed.stderr}')
+        return BenchmarkResult(**json.loads(completed.stdout.strip().splitlines()[-1]))
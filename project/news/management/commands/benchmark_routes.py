@@ -0,0 +1,50 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from news.budgets import audience_users
+from news.route_benchmark import run_suite
+
+
+class Command(BaseCommand):
+    help = 'Request every route through the test client and report latency, SQL queries and peak memory as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per route')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per route first')
+        parser.add_argument('--route', help='Only benchmark routes whose label contains this, e.g. news:home')
+        parser.add_argument('--vip', help='Username of the VIP to request VIP pages as (default: the first VIP)')
+        parser.add_argument('--superuser', help='Username of the superuser to request admin pages as (default: the first superuser)')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1.')
+        try:
+            users = audience_users(options['vip'], options['superuser'])
+        except User.DoesNotExist as exc:
+            raise CommandError(str(exc))
+
+        # The test client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            # Pages write sessions and counters; leave the database as it was
+            with transaction.atomic():
+                report = run_suite(users, options['iterations'], options['warmup'], options['route'])
+                transaction.set_rollback(True)
+
+        for label, reason in report['skipped'].items():
+            self.stderr.write(f'SKIP  {label}: {reason}')
+        for name in report['uncovered']:
+            self.stderr.write(self.style.WARNING(f'No benchmark scenario requests {name}'))
+
+        # Sorted keys and one value per line keep reports of different commits diffable
+        output = json.dumps(report, indent=2, sort_keys=True) + '\n'
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output)
+            self.stderr.write(self.style.SUCCESS(f'Benchmarked {len(report["routes"])} routes into {options["output"]}!'))
+        else:
+            self.stdout.write(output, ending='')
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from news.budgets import ANONYMOUS, QUERY_BUDGETS, SAMPLE_ARGUMENTS, QueryBudgetExceeded, audience_users, check_budget
+
+
+class Command(BaseCommand):
+    help = 'Request every page with a query budget and fail when one runs more SQL queries than allowed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vip', help='Username of the VIP to check VIP pages as (default: the first VIP)')
+        parser.add_argument('--superuser', help='Username of the superuser to check admin pages as (default: the first superuser)')
+
+    def handle(self, *args, **options):
+        try:
+            users = audience_users(options['vip'], options['superuser'])
+        except User.DoesNotExist as exc:
+            raise CommandError(str(exc))
+
+        failures = []
+        checked = 0
+        # The test client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            # Pages may write sessions and counters; leave the database as it was
+            with transaction.atomic():
+                clients = {}
+                for budget in QUERY_BUDGETS:
+                    label = f'{budget.url_name} ({budget.audience})'
+                    if budget.audience != ANONYMOUS and users[budget.audience] is None:
+                        self.stdout.write(f'SKIP  {label}: no {budget.audience} user')
+                        continue
+                    sample = SAMPLE_ARGUMENTS.get(budget.url_name)
+                    kwargs = sample() if sample else None
+                    if sample and kwargs is None:
+                        self.stdout.write(f'SKIP  {label}: nothing to request')
+                        continue
+
+                    if budget.audience not in clients:
+                        clients[budget.audience] = Client()
+                        if users[budget.audience] is not None:
+                            clients[budget.audience].force_login(users[budget.audience])
+                    try:
+                        queries = check_budget(clients[budget.audience], budget, kwargs)
+                    except QueryBudgetExceeded as exc:
+                        failures.append(str(exc))
+                        self.stdout.write(self.style.ERROR(f'OVER  {str(exc).splitlines()[0]}'))
+                    else:
+                        self.stdout.write(f'OK    {label}: {queries}/{budget.max_queries} queries')
+                    checked += 1
+                transaction.set_rollback(True)
+
+        if failures:
+            if options['verbosity'] > 1:
+                self.stderr.write('\n\n'.join(failures))
+            raise CommandError(f'{len(failures)} of {checked} pages are over their query budget.')
+        self.stdout.write(self.style.SUCCESS(f'All {checked} checked pages are within their query budgets!'))
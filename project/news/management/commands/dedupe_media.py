@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from news.blobs import deduplicate_media
+
+
+class Command(BaseCommand):
+    help = 'Move article images to content-addressed names, delete byte-identical copies and report the bytes reclaimed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='articles', help='Media directory to deduplicate')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+
+    def handle(self, *args, **options):
+        report = deduplicate_media(options['directory'], dry_run=options['dry_run'])
+        prefix = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {report.bytes_reclaimed} bytes: {report.files_removed} of {report.files_scanned} files removed, '
+            f'{report.articles_updated} articles repointed.'
+        ))
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from news.exports import FORMATS
+from news.models import Survey
+
+
+class Command(BaseCommand):
+    help = 'Stream the responses of a survey as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', type=int, help='ID of the survey to export')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv', help='Output format')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+
+    def handle(self, *args, **options):
+        survey = Survey.objects.filter(pk=options['survey_id']).first()
+        if survey is None:
+            raise CommandError(f"Survey {options['survey_id']} does not exist.")
+
+        _, lines = FORMATS[options['format']]
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for line in lines(survey):
+                output.write(line)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Successfully exported survey {survey.pk} to {options['output']}!"))
@@ -1,34 +1,39 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from news.cards import bump_card_version
 from news.models import Article
-from django.utils.text import slugify
+from news.slugs import allocate_slugs
 
 
 class Command(BaseCommand):
     help = 'Fix article slugs for existing articles'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per UPDATE statement')
+
     def handle(self, *args, **options):
-        articles = Article.objects.filter(slug__isnull=True) | Article.objects.filter(slug='')
-        
+        articles = list(Article.objects.filter(Q(slug__isnull=True) | Q(slug='')).only('id', 'title', 'slug'))
+
         if not articles:
             self.stdout.write(self.style.SUCCESS('All articles already have slugs!'))
             return
-        
-        self.stdout.write(f'Found {articles.count()} articles without slugs. Fixing...')
-        
+
+        self.stdout.write(f'Found {len(articles)} articles without slugs. Fixing...')
+
+        # One lookup per batch of titles instead of one query per candidate slug
+        slugs = allocate_slugs({article.id: article.title for article in articles})
+        now = timezone.now()
         for article in articles:
-            # Generate slug from title
-            base_slug = slugify(article.title)
-            slug = base_slug
-            
-            # Handle duplicate slugs
-            counter = 1
-            while Article.objects.filter(slug=slug).exclude(id=article.id).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            
-            article.slug = slug
-            article.save()
-            
-            self.stdout.write(f'Fixed: "{article.title}" -> slug: "{slug}"')
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully fixed {articles.count()} article slugs!')) 
\ No newline at end of file
+            article.slug = slugs[article.id]
+            article.updated_at = now
+            self.stdout.write(f'Fixed: "{article.title}" -> slug: "{article.slug}"')
+
+        with transaction.atomic():
+            Article.objects.bulk_update(articles, ['slug', 'updated_at'], batch_size=options['batch_size'])
+            # bulk_update sends no post_save, so the cards linking to the old slug are invalidated here
+            for article in articles:
+                bump_card_version('article', article.pk)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully fixed {len(articles)} article slugs!'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from news.view_counts import flush_views
+
+
+class Command(BaseCommand):
+    help = 'Write buffered article views to the database'
+
+    def handle(self, *args, **options):
+        flushed = flush_views()
+        self.stdout.write(self.style.SUCCESS(f'Successfully flushed {flushed} article views!'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from news.images import generate_variants
+from news.models import Article
+
+
+class Command(BaseCommand):
+    help = 'Render the resized and WebP variants of article images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-render variants that already exist')
+
+    def handle(self, *args, **options):
+        articles = Article.objects.exclude(image='').exclude(image=None)
+        if options['force']:
+            articles.update(image_variants={}, updated_at=timezone.now())
+
+        rendered = failed = 0
+        for pk in articles.order_by('pk').values_list('pk', flat=True).iterator():
+            try:
+                rendered += generate_variants(pk)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Article {pk}: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Successfully rendered variants for {rendered} articles ({failed} failed)!'))
@@ -0,0 +1,77 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from news.imports import BATCH_SIZE, FORMATS, IMAGE_WORKERS, clear_checkpoint, import_articles, read_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Import articles in bulk from a JSONL or CSV file, resumable from a checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='JSONL or CSV file, or - for JSONL on stdin')
+        parser.add_argument('--format', choices=FORMATS, help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Articles inserted per transaction')
+        parser.add_argument('--image-root', help='Directory image paths are relative to (default: the directory of the source)')
+        parser.add_argument('--image-workers', type=int, default=IMAGE_WORKERS, help='Threads copying images')
+        parser.add_argument('--checkpoint', help='Checkpoint name, stored in the database (default: the absolute path of the source)')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last row recorded in the checkpoint')
+        parser.add_argument('--restart', action='store_true', help='Forget the checkpoint and import from the first row')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if options['batch_size'] < 1 or options['image_workers'] < 1:
+            raise CommandError('--batch-size and --image-workers must be at least 1.')
+        if options['resume'] and options['restart']:
+            raise CommandError('Pass either --resume or --restart.')
+        fmt = options['format'] or ('csv' if source.lower().endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or (None if source == '-' else os.path.abspath(source))
+        image_root = options['image_root'] or (None if source == '-' else os.path.dirname(os.path.abspath(source)))
+
+        start_after = 0
+        if checkpoint and options['restart']:
+            clear_checkpoint(checkpoint)
+        elif checkpoint and options['resume']:
+            start_after = read_checkpoint(checkpoint)
+            self.stdout.write(f'Resuming after row {start_after}.')
+        elif checkpoint and read_checkpoint(checkpoint):
+            raise CommandError(
+                f'An import of {checkpoint} was interrupted: pass --resume to continue it, or --restart to start over.'
+            )
+
+        def on_batch(progress):
+            self.stdout.write(
+                f'Row {progress.last_row}: {progress.imported} imported, {len(progress.errors)} errors, '
+                f'{progress.rows_per_second:.0f} rows/s'
+            )
+
+        if source == '-':
+            progress = self.run(sys.stdin, fmt, options, image_root, start_after, on_batch, checkpoint)
+        else:
+            try:
+                # utf-8-sig drops the byte order mark spreadsheet exports start with
+                with open(source, encoding='utf-8-sig', newline='') as handle:
+                    progress = self.run(handle, fmt, options, image_root, start_after, on_batch, checkpoint)
+            except FileNotFoundError:
+                raise CommandError(f'{source} does not exist.')
+
+        for error in progress.errors:
+            self.stderr.write(f'Row {error.row}: {error.message}')
+        if checkpoint:
+            clear_checkpoint(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {progress.imported} of {progress.rows} rows in {progress.seconds:.1f}s '
+            f'({progress.rows_per_second:.0f} rows/s)!'
+        ))
+
+    def run(self, handle, fmt, options, image_root, start_after, on_batch, checkpoint):
+        return import_articles(
+            handle,
+            fmt=fmt,
+            batch_size=options['batch_size'],
+            image_root=image_root,
+            image_workers=options['image_workers'],
+            start_after=start_after,
+            on_batch=on_batch,
+            checkpoint=checkpoint,
+        )
@@ -0,0 +1,55 @@
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError, transaction
+from django.test.utils import override_settings
+from news.budgets import audience_users
+from news.index_advisor import advise
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the queries of every view and flag full table scans, filesorts and temporary tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', help='Only check routes whose label contains this, e.g. news:home')
+        parser.add_argument('--ignore', action='append', default=[], metavar='TABLE', help='Accept issues on this table (repeatable)')
+        parser.add_argument('--strict', action='store_true', help='Fail when any query has an issue')
+        parser.add_argument('--vip', help='Username of the VIP to request VIP pages as (default: the first VIP)')
+        parser.add_argument('--superuser', help='Username of the superuser to request admin pages as (default: the first superuser)')
+
+    def handle(self, *args, **options):
+        try:
+            users = audience_users(options['vip'], options['superuser'])
+        except User.DoesNotExist as exc:
+            raise CommandError(str(exc))
+
+        # The test client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            # Pages write sessions and counters; leave the database as it was
+            with transaction.atomic():
+                try:
+                    plans, skipped = advise(users, options['route'], options['ignore'])
+                except NotSupportedError as exc:
+                    raise CommandError(str(exc))
+                transaction.set_rollback(True)
+
+        for label, reason in skipped.items():
+            self.stdout.write(f'SKIP  {label}: {reason}')
+        flagged = [plan for plan in plans if plan.issues]
+        for plan in flagged:
+            kinds = Counter(issue.kind for issue in plan.issues)
+            tables = sorted({issue.table for issue in plan.issues if issue.table})
+            self.stdout.write(self.style.WARNING(
+                f'{", ".join(sorted(kinds))} on {", ".join(tables) or "?"} in {", ".join(plan.views)}'
+            ))
+            sql = plan.sql if options['verbosity'] > 1 else f'{plan.sql[:200]}…' if len(plan.sql) > 200 else plan.sql
+            self.stdout.write(f'  {sql}')
+            for line in plan.plan if options['verbosity'] > 1 else [issue.detail for issue in plan.issues]:
+                self.stdout.write(f'    {line}')
+
+        summary = f'{len(flagged)} of {len(plans)} distinct queries have plan issues.'
+        if flagged and options['strict']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary) if not flagged else summary)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from news.dashboard import invalidate, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the articles-per-day and responses-per-hour rollups and drop the cached dashboard counters'
+
+    def handle(self, *args, **options):
+        days, hours = rebuild_rollups()
+        invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {days} daily and {hours} hourly rollup rows!'))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from news.related import TOP_K, is_available, rebuild_related
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related-articles table for every article'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help='Neighbours stored per article')
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError('NumPy and SciPy are required: pip install numpy scipy')
+
+        started = time.monotonic()
+        rows = rebuild_related(k=options['top_k'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Successfully stored {rows} related-article rows in {elapsed:.1f}s!'))
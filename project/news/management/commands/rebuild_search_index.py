@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from news.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite full-text search index of articles (MySQL maintains its FULLTEXT index itself)'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f'Nothing to do: the {connection.vendor} full-text index is maintained by the database.')
+            return
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt the article search index!'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from news.aggregates import rebuild_survey_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the survey result aggregates (response counts, score distributions, choice histograms)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_ids', nargs='*', type=int, help='Surveys to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_survey_stats(options['survey_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt the results of {rebuilt} surveys!'))
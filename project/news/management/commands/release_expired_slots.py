@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from news.cards import bump_card_version
+from news.slots import recount_slots
+
+
+class Command(BaseCommand):
+    help = 'Give back the slots of expired survey responses, so new respondents can take them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_ids', nargs='*', type=int, help='Surveys to check (default: all)')
+
+    def handle(self, *args, **options):
+        changed = recount_slots(options['survey_ids'] or None)
+        for survey_id in changed:
+            bump_card_version('survey', survey_id)
+        self.stdout.write(self.style.SUCCESS(f'Successfully recounted the slots of {len(changed)} surveys!'))
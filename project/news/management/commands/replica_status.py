@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from news.replicas import is_healthy, replica_aliases, replica_lag
+
+
+class Command(BaseCommand):
+    help = 'Check the lag of every read replica; fails when reads would skip one'
+
+    def handle(self, *args, **options):
+        aliases = replica_aliases()
+        if not aliases:
+            self.stdout.write('No read replicas configured: all reads go to the primary.')
+            return
+
+        max_lag = getattr(settings, 'NEWS_REPLICA_MAX_LAG', 5)
+        skipped = []
+        for alias in aliases:
+            lag = replica_lag(alias)
+            if lag is None:
+                state = 'unreachable or not replicating'
+            else:
+                state = f'{lag:.0f}s behind'
+            if is_healthy(lag):
+                self.stdout.write(f'{alias}: {state}')
+            else:
+                skipped.append(alias)
+                self.stdout.write(self.style.WARNING(f'{alias}: {state}, skipped (max lag {max_lag}s)'))
+
+        if skipped:
+            raise CommandError(f'{len(skipped)} of {len(aliases)} replicas are skipped: {", ".join(skipped)}.')
+        self.stdout.write(self.style.SUCCESS(f'All {len(aliases)} replicas are in use!'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from news.models import Survey
+from news.scoring import rescore_survey
+
+
+class Command(BaseCommand):
+    help = 'Re-score every response of a survey in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_id', type=int, help='ID of the survey to re-score')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Responses scored and written per batch')
+
+    def handle(self, *args, **options):
+        survey_id = options['survey_id']
+        if not Survey.objects.filter(pk=survey_id).exists():
+            raise CommandError(f'Survey {survey_id} does not exist.')
+
+        updated = rescore_survey(survey_id, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully re-scored {updated} responses!'))
@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from news.models import Article, Survey
+from news.seeding import BATCH_SIZE, PASSWORD, USERNAME_PREFIX, seed
+
+
+class Command(BaseCommand):
+    help = 'Fill an empty database with deterministic benchmark data (articles, surveys, VIPs and responses)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1, help='Random seed; the same seed builds the same data')
+        parser.add_argument('--articles', type=int, default=2000)
+        parser.add_argument('--surveys', type=int, default=20)
+        parser.add_argument('--questions', type=int, default=10, help='Most questions per survey')
+        parser.add_argument('--choices', type=int, default=4, help='Most choices per choice question')
+        parser.add_argument('--vips', type=int, default=200, help='VIP users, besides one superuser')
+        parser.add_argument('--responses', type=int, default=50, help='Responses per survey')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--flush', action='store_true', help='Delete ALL existing data first')
+
+    def handle(self, *args, **options):
+        if options['questions'] < 1 or options['vips'] < 1:
+            raise CommandError('--questions and --vips must be at least 1.')
+
+        if options['flush']:
+            call_command('flush', interactive=False, verbosity=0)
+            # Cached counters, schemas and principals describe the old rows
+            cache.clear()
+        elif Article.objects.exists() or Survey.objects.exists() or User.objects.exists():
+            raise CommandError('The database is not empty; pass --flush to replace its data.')
+
+        started = time.monotonic()
+        with transaction.atomic():
+            dataset = seed(
+                seed=options['seed'],
+                articles=options['articles'],
+                surveys=options['surveys'],
+                questions=options['questions'],
+                choices=options['choices'],
+                vips=options['vips'],
+                responses=options['responses'],
+                batch_size=options['batch_size'],
+            )
+        elapsed = time.monotonic() - started
+
+        for name, count in dataset._asdict().items():
+            self.stdout.write(f'{name:>10}: {count}')
+        self.stdout.write(f'Users {USERNAME_PREFIX}admin and {USERNAME_PREFIX}vip-0001… log in with "{PASSWORD}".')
+        self.stdout.write(self.style.SUCCESS(f'Successfully seeded benchmark data (seed {options["seed"]}) in {elapsed:.1f}s!'))
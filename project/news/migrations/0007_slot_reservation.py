@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:51
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_slots(apps, schema_editor):
+    Survey = apps.get_model('news', 'Survey')
+    Response = apps.get_model('news', 'Response')
+    for survey in Survey.objects.all():
+        responses = list(Response.objects.filter(survey=survey).order_by('submitted_at', 'id'))
+        for number, response in enumerate(responses, start=1):
+            response.slot_number = number
+            response.slot_expires_at = response.submitted_at + timedelta(hours=survey.slot_duration_hours)
+        Response.objects.bulk_update(responses, ['slot_number', 'slot_expires_at'])
+        Survey.objects.filter(pk=survey.pk).update(used_slots=len(responses))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_article_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='slot_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the slot stops accepting changes', null=True),
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='used_slots',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of slots already reserved'),
+        ),
+        migrations.RunPython(backfill_slots, migrations.RunPython.noop),
+    ]
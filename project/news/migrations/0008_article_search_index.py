@@ -0,0 +1,35 @@
+from django.db import migrations
+
+FIELDS = 'title, excerpt, content, tags, category'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS news_article_fts USING fts5({FIELDS}, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO news_article_fts (rowid, {FIELDS}) SELECT id, {FIELDS} FROM news_article"
+        )
+    elif vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE news_article ADD FULLTEXT INDEX news_article_fulltext ({FIELDS})")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS news_article_fts')
+    elif vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE news_article DROP INDEX news_article_fulltext')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_slot_reservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,82 @@
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def name_slug(name):
+    # news.taxonomy.name_slug as of this migration
+    folded = re.sub(r'[-\s]+', '-', unicodedata.normalize('NFKC', name or '').lower()).strip('-_')
+    if not folded:
+        return ''
+    slug = slugify(name, allow_unicode=True)
+    if slug == folded and len(slug) <= 100:
+        return slug
+    digest = hashlib.md5(folded.encode(), usedforsecurity=False).hexdigest()[:8]
+    return '-'.join(filter(None, [slug[:91].strip('-_'), digest]))
+
+
+def split_tags(raw):
+    names = {}
+    for name in (raw or '').replace('#', '').replace(';', ',').split(','):
+        name = name.strip()
+        slug = name_slug(name)
+        if slug and slug not in names:
+            names[slug] = name[:100]
+    return names
+
+
+def backfill_taxonomy(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    Category = apps.get_model('news', 'Category')
+    Tag = apps.get_model('news', 'Tag')
+    Through = Article.tag_refs.through
+
+    rows = list(Article.objects.values_list('id', 'category', 'tags'))
+    categories = {}
+    tags = {}
+    for _, category, raw_tags in rows:
+        slug = name_slug(category)
+        if slug:
+            categories.setdefault(slug, (category or '')[:100])
+        for slug, name in split_tags(raw_tags).items():
+            tags.setdefault(slug, name)
+
+    Category.objects.bulk_create([Category(name=name, slug=slug) for slug, name in categories.items()], ignore_conflicts=True)
+    Tag.objects.bulk_create([Tag(name=name, slug=slug) for slug, name in tags.items()], ignore_conflicts=True)
+    category_ids = dict(Category.objects.values_list('slug', 'id'))
+    tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+
+    articles = []
+    links = []
+    category_counts = Counter()
+    tag_counts = Counter()
+    for pk, category, raw_tags in rows:
+        category_id = category_ids.get(name_slug(category))
+        articles.append(Article(pk=pk, category_ref_id=category_id))
+        category_counts[category_id] += 1
+        for slug in split_tags(raw_tags):
+            links.append(Through(article_id=pk, tag_id=tag_ids[slug]))
+            tag_counts[tag_ids[slug]] += 1
+
+    Article.objects.bulk_update(articles, ['category_ref'], batch_size=1000)
+    Through.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+    for category_id, total in category_counts.items():
+        if category_id is not None:
+            Category.objects.filter(pk=category_id).update(article_count=total)
+    for tag_id, total in tag_counts.items():
+        Tag.objects.filter(pk=tag_id).update(article_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_tag_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_taxonomy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0010_backfill_taxonomy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='news.article')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='news.article')),
+            ],
+            options={
+                'ordering': ['article', 'rank'],
+                'indexes': [models.Index(fields=['article', 'rank'], name='news_related_article_rank')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'related'), name='news_related_article_unique')],
+            },
+        ),
+    ]
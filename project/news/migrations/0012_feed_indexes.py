@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0011_related_article'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-published_at', '-id'], name='news_article_feed'),
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['-created_at', '-id'], name='news_survey_feed'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    Survey = apps.get_model('news', 'Survey')
+    Response = apps.get_model('news', 'Response')
+    ResponseAnswer = apps.get_model('news', 'ResponseAnswer')
+    SurveyStats = apps.get_model('news', 'SurveyStats')
+    ScoreCount = apps.get_model('news', 'ScoreCount')
+    QuestionStats = apps.get_model('news', 'QuestionStats')
+    ChoiceStats = apps.get_model('news', 'ChoiceStats')
+
+    totals = {
+        row['survey_id']: row
+        for row in Response.objects.order_by().values('survey_id').annotate(responses=Count('id'), scores=Sum('score'))
+    }
+    SurveyStats.objects.bulk_create([
+        SurveyStats(
+            survey_id=pk,
+            response_count=totals.get(pk, {}).get('responses', 0),
+            score_total=totals.get(pk, {}).get('scores') or 0,
+        )
+        for pk in Survey.objects.values_list('pk', flat=True)
+    ], batch_size=1000)
+    ScoreCount.objects.bulk_create([
+        ScoreCount(survey_id=survey_id, score=score, count=total)
+        for survey_id, score, total in Response.objects.order_by().values_list('survey_id', 'score').annotate(Count('id'))
+    ], batch_size=1000)
+    QuestionStats.objects.bulk_create([
+        QuestionStats(question_id=row['question_id'], answer_count=row['answered'], text_answer_count=row['texts'])
+        for row in ResponseAnswer.objects.order_by().values('question_id').annotate(
+            answered=Count('id', filter=~Q(answer_text='') | Q(selected_choices__isnull=False), distinct=True),
+            texts=Count('id', filter=~Q(answer_text=''), distinct=True),
+        )
+    ], batch_size=1000)
+    through = ResponseAnswer.selected_choices.through
+    ChoiceStats.objects.bulk_create([
+        ChoiceStats(choice_id=choice_id, selected_count=total)
+        for choice_id, total in through.objects.order_by().values_list('questionchoice_id').annotate(Count('id'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0012_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChoiceStats',
+            fields=[
+                ('choice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='news.questionchoice')),
+                ('selected_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='news.question')),
+                ('answer_count', models.PositiveIntegerField(default=0)),
+                ('text_answer_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SurveyStats',
+            fields=[
+                ('survey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='news.survey')),
+                ('response_count', models.PositiveIntegerField(default=0)),
+                ('score_total', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScoreCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_counts', to='news.survey')),
+            ],
+            options={
+                'ordering': ['survey', 'score'],
+                'constraints': [models.UniqueConstraint(fields=('survey', 'score'), name='news_score_count_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
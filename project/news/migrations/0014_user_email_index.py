@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+EMAIL_INDEX = models.Index(fields=['email'], name='news_auth_user_email')
+
+
+def add_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+    """Index auth_user.email for the user management search (auth.User cannot declare it itself)"""
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('news', '0013_survey_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
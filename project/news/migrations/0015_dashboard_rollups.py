@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:13
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    Response = apps.get_model('news', 'Response')
+    ArticleDailyCount = apps.get_model('news', 'ArticleDailyCount')
+    ResponseHourlyCount = apps.get_model('news', 'ResponseHourlyCount')
+    days = Article.objects.order_by().annotate(day=TruncDate('published_at')).values_list('day').annotate(Count('id'))
+    ArticleDailyCount.objects.bulk_create([ArticleDailyCount(day=day, count=total) for day, total in days], batch_size=1000)
+    hours = Response.objects.order_by().annotate(hour=TruncHour('submitted_at')).values_list('hour').annotate(Count('id'))
+    ResponseHourlyCount.objects.bulk_create([ResponseHourlyCount(hour=hour, count=total) for hour, total in hours], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0014_user_email_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResponseHourlyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['hour'],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
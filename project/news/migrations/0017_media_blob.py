@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:16
+
+import news.storage
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_blobs(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    MediaBlob = apps.get_model('news', 'MediaBlob')
+    counts = Article.objects.exclude(image='').exclude(image=None).order_by().values_list('image').annotate(Count('id'))
+    MediaBlob.objects.bulk_create([
+        MediaBlob(name=name, size=default_storage.size(name) if default_storage.exists(name) else 0, ref_count=total)
+        for name, total in counts
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0016_article_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=news.storage.ContentAddressedStorage(), upload_to='articles/'),
+        ),
+        migrations.RunPython(count_blobs, migrations.RunPython.noop),
+    ]
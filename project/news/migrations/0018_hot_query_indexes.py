@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0017_media_blob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-views', '-published_at'], name='news_article_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['category_ref', '-published_at'], name='news_article_category'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['author', '-published_at'], name='news_article_author'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['survey', 'order'], name='news_question_survey_order'),
+        ),
+        migrations.AddIndex(
+            model_name='questionchoice',
+            index=models.Index(fields=['question', 'order'], name='news_choice_question_order'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['-submitted_at'], name='news_response_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['survey', '-submitted_at', '-id'], name='news_response_survey'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['user', '-submitted_at'], name='news_response_user'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def backfill_updated_at(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    # The best known last change of existing articles is their publication
+    Article.objects.update(updated_at=F('published_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0018_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils.text import slugify
+
+
+def name_slug(name):
+    # news.taxonomy.name_slug as of this migration
+    folded = re.sub(r'[-\s]+', '-', unicodedata.normalize('NFKC', name or '').lower()).strip('-_')
+    if not folded:
+        return ''
+    slug = slugify(name, allow_unicode=True)
+    if slug == folded and len(slug) <= 100:
+        return slug
+    digest = hashlib.md5(folded.encode(), usedforsecurity=False).hexdigest()[:8]
+    return '-'.join(filter(None, [slug[:91].strip('-_'), digest]))
+
+
+def split_tags(raw):
+    names = {}
+    for name in (raw or '').replace('#', '').replace(';', ',').split(','):
+        name = name.strip()
+        slug = name_slug(name)
+        if slug and slug not in names:
+            names[slug] = name[:100]
+    return names
+
+
+def reslug(model):
+    rows = {pk: name_slug(name) for pk, name, slug in model.objects.values_list('pk', 'name', 'slug') if name_slug(name) != slug}
+    # Park the changing rows first, so a new slug never meets the old slug of another row
+    for pk in rows:
+        model.objects.filter(pk=pk).update(slug=f'tmp-{pk}')
+    taken = set(model.objects.values_list('slug', flat=True))
+    for pk, slug in rows.items():
+        if slug and slug not in taken:
+            model.objects.filter(pk=pk).update(slug=slug)
+            taken.add(slug)
+
+
+def relink_articles(apps, schema_editor):
+    """Give tags and categories the slugs they get now, and link the tags and categories that had none"""
+    Article = apps.get_model('news', 'Article')
+    Category = apps.get_model('news', 'Category')
+    Tag = apps.get_model('news', 'Tag')
+    Through = Article.tag_refs.through
+    reslug(Category)
+    reslug(Tag)
+
+    rows = list(Article.objects.values_list('id', 'category', 'tags'))
+    categories = {}
+    tags = {}
+    for _, category, raw_tags in rows:
+        slug = name_slug(category)
+        if slug:
+            categories.setdefault(slug, (category or '')[:100])
+        for slug, name in split_tags(raw_tags).items():
+            tags.setdefault(slug, name)
+    Category.objects.bulk_create([Category(name=name, slug=slug) for slug, name in categories.items()], ignore_conflicts=True)
+    Tag.objects.bulk_create([Tag(name=name, slug=slug) for slug, name in tags.items()], ignore_conflicts=True)
+    category_ids = dict(Category.objects.values_list('slug', 'id'))
+    tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+
+    articles = []
+    links = []
+    for pk, category, raw_tags in rows:
+        articles.append(Article(pk=pk, category_ref_id=category_ids.get(name_slug(category))))
+        links.extend(Through(article_id=pk, tag_id=tag_ids[slug]) for slug in split_tags(raw_tags) if slug in tag_ids)
+    Article.objects.bulk_update(articles, ['category_ref'], batch_size=1000)
+    Through.objects.all().delete()
+    Through.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+
+    tag_counts = Counter(link.tag_id for link in links)
+    category_counts = dict(Article.objects.order_by().values('category_ref').annotate(total=Count('id')).values_list('category_ref', 'total'))
+    for tag in Tag.objects.all():
+        Tag.objects.filter(pk=tag.pk).update(article_count=tag_counts.get(tag.pk, 0))
+    for category in Category.objects.all():
+        Category.objects.filter(pk=category.pk).update(article_count=category_counts.get(category.pk, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0020_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, max_length=100, unique=True),
+        ),
+        migrations.RunPython(relink_articles, migrations.RunPython.noop),
+    ]
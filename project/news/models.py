@@ -2,7 +2,40 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
 from django.utils import timezone
-from django.utils.text import slugify
+
+from .storage import ContentAddressedStorage
+
+EXCERPT_LENGTH = 300
+
+
+def make_excerpt(content: str) -> str:
+	"""The excerpt an article gets when none is provided"""
+	return content[:EXCERPT_LENGTH] + '...' if len(content) > EXCERPT_LENGTH else content
+
+
+class Category(models.Model):
+	name = models.CharField(max_length=100, unique=True)
+	slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+	article_count = models.PositiveIntegerField(default=0, editable=False)
+
+	class Meta:
+		ordering = ['name']
+		verbose_name_plural = 'categories'
+
+	def __str__(self) -> str:
+		return self.name
+
+
+class Tag(models.Model):
+	name = models.CharField(max_length=100, unique=True)
+	slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+	article_count = models.PositiveIntegerField(default=0, editable=False)
+
+	class Meta:
+		ordering = ['name']
+
+	def __str__(self) -> str:
+		return self.name
 
 
 class Article(models.Model):
@@ -12,40 +45,109 @@ class Article(models.Model):
 	author = models.CharField(max_length=255)
 	category = models.CharField(max_length=100, default='General')
 	tags = models.CharField(max_length=255, blank=True, default='')
-	image = models.ImageField(upload_to='articles/', blank=True, null=True)
+	# Normalized copies of `category` and `tags`, kept in sync on save
+	category_ref = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='articles')
+	tag_refs = models.ManyToManyField(Tag, blank=True, editable=False, related_name='articles')
+	image = models.ImageField(upload_to='articles/', storage=ContentAddressedStorage(), blank=True, null=True)
+	# Resized/WebP copies of `image` and their dimensions, written by news.images
+	image_variants = models.JSONField(default=dict, blank=True, editable=False)
 	published_at = models.DateTimeField(default=timezone.now)
 	excerpt = models.TextField(max_length=300, blank=True)
 	views = models.PositiveIntegerField(default=0)
+	# Last change to what the pages show (HTTP validators, see news.conditional); view counts are
+	# written with update() and do not move it
+	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		ordering = ['-published_at']
+		indexes = [
+			# Keyset pagination of the feed (news.pagination)
+			models.Index(fields=['-published_at', '-id'], name='news_article_feed'),
+			# Most visited articles on the home page
+			models.Index(fields=['-views', '-published_at'], name='news_article_popular'),
+			# Category pages and the same-author fallback for related articles
+			models.Index(fields=['category_ref', '-published_at'], name='news_article_category'),
+			models.Index(fields=['author', '-published_at'], name='news_article_author'),
+		]
+
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		# Remember the loaded taxonomy so save() can skip re-syncing unchanged tags
+		instance._loaded_taxonomy = (instance.__dict__.get('category'), instance.__dict__.get('tags'))
+		# ... and the publication date, so the dashboard rollups can move the article between days
+		instance._loaded_published_at = instance.__dict__.get('published_at')
+		# ... and the image, so the stored file's reference count can follow changes
+		instance._loaded_image = instance.__dict__.get('image')
+		return instance
 
 	def save(self, *args, **kwargs):
 		# Generate a unique slug based on the title
-		if not self.slug:
-			base_slug = slugify(self.title)
-			slug = base_slug or 'article'
-			counter = 1
-			# Ensure uniqueness (avoid IntegrityError on duplicate titles)
-			while Article.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-				slug = f"{base_slug}-{counter}"
-				counter += 1
-			self.slug = slug
+		generate_slug = not self.slug
 
 		# Auto-generate excerpt if not provided
 		if not self.excerpt:
-			self.excerpt = self.content[:300] + '...' if len(self.content) > 300 else self.content
+			self.excerpt = make_excerpt(self.content)
+
+		update_fields = kwargs.get('update_fields')
+		sync_taxonomy = (
+			getattr(self, '_loaded_taxonomy', None) != (self.category, self.tags)
+			and (update_fields is None or {'category', 'tags'} & set(update_fields))
+		)
+		if sync_taxonomy:
+			from .taxonomy import resolve_category
+			previous_category_id = self.category_ref_id
+			self.category_ref = resolve_category(self.category)
+			if update_fields is not None:
+				kwargs['update_fields'] = {*update_fields, 'category_ref'}
+
+		if generate_slug:
+			from .slugs import save_with_slug
+			save_with_slug(self, lambda: super(Article, self).save(*args, **kwargs))
+		else:
+			super().save(*args, **kwargs)
 
-		super().save(*args, **kwargs)
+		if sync_taxonomy:
+			from .taxonomy import sync_article_tags, refresh_category_counts
+			sync_article_tags(self)
+			refresh_category_counts({previous_category_id, self.category_ref_id})
+			self._loaded_taxonomy = (self.category, self.tags)
 
 	def __str__(self) -> str:
 		return self.title
 
 
+class RelatedArticle(models.Model):
+	"""Precomputed content-similarity neighbour of an article (see news.related)"""
+	article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='neighbors')
+	related = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='neighbor_of')
+	score = models.FloatField()
+	rank = models.PositiveSmallIntegerField()
+
+	class Meta:
+		ordering = ['article', 'rank']
+		constraints = [
+			models.UniqueConstraint(fields=['article', 'related'], name='news_related_article_unique'),
+		]
+		indexes = [
+			models.Index(fields=['article', 'rank'], name='news_related_article_rank'),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.article_id} -> {self.related_id} ({self.score:.2f})"
+
+
 class Profile(models.Model):
 	user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
 	is_vip = models.BooleanField(default=False)
 
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		# Remember the loaded VIP flag so the dashboard counters only move on real changes
+		instance._loaded_is_vip = instance.__dict__.get('is_vip')
+		return instance
+
 	def __str__(self) -> str:
 		status = 'VIP' if self.is_vip else 'Normal'
 		return f"{self.user.username} ({status})"
@@ -58,11 +160,16 @@ class Survey(models.Model):
 	active = models.BooleanField(default=True)
 	max_slots = models.PositiveIntegerField(default=10, help_text="Maximum number of VIP users who can answer")
 	slot_duration_hours = models.PositiveIntegerField(default=24, help_text="How long each slot is valid (in hours)")
+	used_slots = models.PositiveIntegerField(default=0, editable=False, help_text="Number of slots already reserved")
+	
+	class Meta:
+		indexes = [
+			models.Index(fields=['-created_at', '-id'], name='news_survey_feed'),
+		]
 	
 	def available_slots(self):
 		"""Calculate how many slots are still available"""
-		used_slots = self.responses.count()
-		return max(0, self.max_slots - used_slots)
+		return max(0, self.max_slots - self.used_slots)
 	
 	def has_available_slot(self):
 		"""Check if there are any available slots"""
@@ -97,6 +204,9 @@ class Question(models.Model):
 	
 	class Meta:
 		ordering = ['order']
+		indexes = [
+			models.Index(fields=['survey', 'order'], name='news_question_survey_order'),
+		]
 	
 	def __str__(self):
 		return f"{self.survey.title} - Q{self.order}: {self.text[:50]}"
@@ -110,6 +220,9 @@ class QuestionChoice(models.Model):
 	
 	class Meta:
 		ordering = ['order']
+		indexes = [
+			models.Index(fields=['question', 'order'], name='news_choice_question_order'),
+		]
 	
 	def __str__(self):
 		return f"{self.question.text[:30]} - {self.text}"
@@ -122,38 +235,30 @@ class Response(models.Model):
 	score = models.PositiveIntegerField(default=0, help_text="Total points earned")
 	max_possible_score = models.PositiveIntegerField(default=0, help_text="Maximum possible score")
 	slot_number = models.PositiveIntegerField(default=1, help_text="Which slot number this response used")
+	slot_expires_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="When the slot stops accepting changes")
 	
 	class Meta:
 		unique_together = ['survey', 'user']  # One response per user per survey
 		ordering = ['-submitted_at']
+		indexes = [
+			# Recent responses on the dashboard, a survey's responses and a user's responses
+			models.Index(fields=['-submitted_at'], name='news_response_recent'),
+			models.Index(fields=['survey', '-submitted_at', '-id'], name='news_response_survey'),
+			models.Index(fields=['user', '-submitted_at'], name='news_response_user'),
+		]
+	
+	@property
+	def slot_is_open(self):
+		"""Whether the answers can still be changed within the slot duration"""
+		return self.slot_expires_at is None or timezone.now() < self.slot_expires_at
 	
 	def calculate_score(self):
 		"""Calculate the score based on correct answers"""
-		total_score = 0
-		max_score = 0
-		
-		for answer in self.answers.all():
-			question = answer.question
-			max_score += question.points
-			
-			if question.question_type == 'text':
-				# For text questions, check if answer matches correct_answer
-				if answer.answer_text.strip().lower() == question.correct_answer.strip().lower():
-					total_score += question.points
-			else:
-				# For choice questions, check selected choices
-				correct_choices = question.choices.filter(is_correct=True)
-				selected_choices = answer.selected_choices.all()
-				
-				if correct_choices.count() == selected_choices.count():
-					all_correct = all(choice in correct_choices for choice in selected_choices)
-					if all_correct:
-						total_score += question.points
-		
-		self.score = total_score
-		self.max_possible_score = max_score
-		self.save()
-		return total_score
+		from .scoring import score_responses
+
+		score_responses([self])
+		self.save(update_fields=['score', 'max_possible_score'])
+		return self.score
 	
 	def __str__(self):
 		return f"{self.user.username} - {self.survey.title} (Slot {self.slot_number})"
@@ -169,4 +274,82 @@ class ResponseAnswer(models.Model):
 		if self.selected_choices.exists():
 			choices = ', '.join([choice.text for choice in self.selected_choices.all()])
 			return f"{self.question.text[:30]}... -> {choices}"
-		return f"{self.question.text[:30]}... -> {self.answer_text[:30]}..." 
\ No newline at end of file
+		return f"{self.question.text[:30]}... -> {self.answer_text[:30]}..."
+
+
+class SurveyStats(models.Model):
+	"""Response totals of a survey, maintained by ``news.aggregates``"""
+	survey = models.OneToOneField(Survey, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+	response_count = models.PositiveIntegerField(default=0)
+	score_total = models.PositiveBigIntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	@property
+	def average_score(self):
+		return self.score_total / self.response_count if self.response_count else 0
+
+
+class ScoreCount(models.Model):
+	"""How many responses of a survey reached a given score"""
+	survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name='score_counts')
+	score = models.PositiveIntegerField()
+	count = models.PositiveIntegerField(default=0)
+
+	class Meta:
+		ordering = ['survey', 'score']
+		constraints = [
+			models.UniqueConstraint(fields=['survey', 'score'], name='news_score_count_unique'),
+		]
+
+
+class QuestionStats(models.Model):
+	"""Answer totals of a question: answered at all, and non-empty text answers"""
+	question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+	answer_count = models.PositiveIntegerField(default=0)
+	text_answer_count = models.PositiveIntegerField(default=0)
+
+
+class ChoiceStats(models.Model):
+	"""How many responses selected a choice"""
+	choice = models.OneToOneField(QuestionChoice, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+	selected_count = models.PositiveIntegerField(default=0)
+
+
+class ArticleDailyCount(models.Model):
+	"""Articles published per day, for the dashboard chart"""
+	day = models.DateField(unique=True)
+	count = models.PositiveIntegerField(default=0)
+
+	class Meta:
+		ordering = ['day']
+
+
+class ResponseHourlyCount(models.Model):
+	"""Survey responses submitted per hour, for the dashboard chart"""
+	hour = models.DateTimeField(unique=True)
+	count = models.PositiveIntegerField(default=0)
+
+	class Meta:
+		ordering = ['hour']
+
+
+class MediaBlob(models.Model):
+	"""A stored article image file and how many articles reference it (see news.blobs)"""
+	name = models.CharField(max_length=255, unique=True)
+	size = models.PositiveBigIntegerField(default=0)
+	ref_count = models.PositiveIntegerField(default=0)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	def __str__(self) -> str:
+		return f'{self.name} ({self.ref_count} refs)'
+
+
+class ImportCheckpoint(models.Model):
+	"""How far a resumable article import got, saved with each batch (see news.imports)"""
+	name = models.CharField(max_length=255, unique=True)
+	last_row = models.PositiveIntegerField(default=0)
+	imported = models.PositiveIntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	def __str__(self) -> str:
+		return f'{self.name} (row {self.last_row})'
@@ -0,0 +1,100 @@
+"""Keyset (cursor) pagination.
+
+Pages are selected with a ``WHERE (published_at, id) < (…)`` condition on
+the ordering columns instead of ``OFFSET``, so every page costs the same
+index range scan no matter how deep the reader scrolls. Cursors are opaque
+url-safe tokens encoding the ordering values of the last row of a page.
+"""
+import base64
+import json
+from typing import List, Optional, Sequence
+
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+	pass
+
+
+class KeysetPage:
+	def __init__(self, object_list: List, next_cursor: Optional[str]):
+		self.object_list = object_list
+		self.next_cursor = next_cursor
+
+	def has_next(self) -> bool:
+		return self.next_cursor is not None
+
+	def __iter__(self):
+		return iter(self.object_list)
+
+	def __len__(self):
+		return len(self.object_list)
+
+
+class KeysetPaginator:
+	def __init__(self, queryset, per_page: int, ordering: Sequence[str] = ('-published_at', '-id')):
+		self.queryset = queryset.order_by(*ordering)
+		self.per_page = per_page
+		self.ordering = list(ordering)
+		self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in ordering]
+
+	def encode_cursor(self, obj) -> str:
+		values = [field.value_to_string(obj) for field in self.fields]
+		return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+	def decode_cursor(self, cursor: str) -> list:
+		try:
+			padded = cursor + '=' * (-len(cursor) % 4)
+			values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+			if not isinstance(values, list) or len(values) != len(self.fields):
+				raise ValueError(cursor)
+			return [field.to_python(value) for field, value in zip(self.fields, values)]
+		except Exception as exc:
+			raise InvalidCursor(cursor) from exc
+
+	def _after(self, values: list) -> Q:
+		# (a, b, c) after (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+		condition = Q()
+		equal = {}
+		for name, value in zip(self.ordering, values):
+			column = name.lstrip('-')
+			lookup = 'lt' if name.startswith('-') else 'gt'
+			condition |= Q(**equal, **{f'{column}__{lookup}': value})
+			equal[column] = value
+		# Redundant bound on the leading column gives the optimizer an index range to scan
+		first = self.ordering[0]
+		bound = 'lte' if first.startswith('-') else 'gte'
+		return condition & Q(**{f'{first.lstrip("-")}__{bound}': values[0]})
+
+	def _window(self, cursor: Optional[str]):
+		queryset = self.queryset
+		if cursor:
+			queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+		return queryset[:self.per_page + 1]
+
+	def _page(self, rows: list) -> KeysetPage:
+		has_next = len(rows) > self.per_page
+		rows = rows[:self.per_page]
+		return KeysetPage(rows, self.encode_cursor(rows[-1]) if has_next else None)
+
+	def page(self, cursor: Optional[str] = None) -> KeysetPage:
+		return self._page(list(self._window(cursor)))
+
+	async def apage(self, cursor: Optional[str] = None) -> KeysetPage:
+		return self._page([obj async for obj in self._window(cursor)])
+
+
+class KeysetPaginationMixin:
+	"""Cursor pagination for ``ListView``: ``page_obj.next_cursor`` links to the next page"""
+	paginate_by = 12
+	cursor_ordering = ('-published_at', '-id')
+	cursor_kwarg = 'cursor'
+
+	def paginate_queryset(self, queryset, page_size):
+		paginator = KeysetPaginator(queryset, page_size, self.cursor_ordering)
+		try:
+			page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+		except InvalidCursor:
+			raise Http404('Invalid cursor.')
+		return paginator, page, page.object_list, page.has_next()
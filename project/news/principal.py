@@ -0,0 +1,126 @@
+"""Request principal: the current user's role and VIP claim.
+
+``PrincipalMiddleware`` attaches a lazy ``request.principal``. The VIP claim
+is kept in the session next to a version token held in the cache; saving or
+deleting a ``Profile`` drops the token (see ``news.signals``), so the next
+request reloads the claim with one query instead of every request reading
+``user.profile``.
+
+The token is only dropped in the cache of the process that saved the
+profile; with a per-process cache such as the default ``LocMemCache`` other
+workers never see that. A claim therefore also expires after
+``NEWS_PRINCIPAL_CLAIM_SECONDS``, which bounds how long a revoked VIP keeps
+access anywhere.
+"""
+import time
+from typing import NamedTuple, Optional
+from uuid import uuid4
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+from .models import Profile
+from .replicas import PRIMARY
+
+SESSION_KEY = '_news_principal'
+VERSION_KEY = 'news:principal:{}'
+VERSION_TIMEOUT = 30 * 24 * 60 * 60
+
+
+class Principal(NamedTuple):
+	user_id: Optional[int]
+	is_authenticated: bool
+	is_superuser: bool
+	is_vip: bool
+
+	@property
+	def role(self) -> str:
+		if self.is_vip:
+			return 'VIP'
+		return 'Admin' if self.is_superuser else 'Standard'
+
+
+ANONYMOUS = Principal(None, False, False, False)
+
+
+def _version(user_id: int) -> Optional[str]:
+	key = VERSION_KEY.format(user_id)
+	token = cache.get(key)
+	if token is None:
+		# Taken before the claim is read, so an invalidation in between is not lost
+		cache.add(key, uuid4().hex, VERSION_TIMEOUT)
+		token = cache.get(key)
+	return token
+
+
+def _is_current(claims, user_id: int, version: Optional[str]) -> bool:
+	return (
+		version is not None and bool(claims) and claims.get('user') == user_id and claims.get('version') == version
+		and claims.get('expires', 0) > time.time()
+	)
+
+
+def _claims(user_id: int, version: str, is_vip: Optional[bool]) -> dict:
+	expires = time.time() + getattr(settings, 'NEWS_PRINCIPAL_CLAIM_SECONDS', 60)
+	return {'user': user_id, 'version': version, 'expires': expires, 'is_vip': is_vip or False}
+
+
+def _vip_claim(user_id: int):
+	# Reloaded right after a change; a lagging replica would cache the old claim under the new version
+	return Profile.objects.using(PRIMARY).filter(user_id=user_id).values_list('is_vip', flat=True)
+
+
+def load_principal(request) -> Principal:
+	user = request.user
+	if not user.is_authenticated:
+		return ANONYMOUS
+	version = _version(user.pk)
+	claims = request.session.get(SESSION_KEY)
+	if not _is_current(claims, user.pk, version):
+		claims = _claims(user.pk, version, _vip_claim(user.pk).first())
+		request.session[SESSION_KEY] = claims
+	return Principal(user.pk, True, user.is_superuser, claims['is_vip'])
+
+
+async def aload_principal(request) -> Principal:
+	"""``load_principal`` for async views; also resolves ``request.user``"""
+	user = request.user = await request.auser()
+	if not user.is_authenticated:
+		return ANONYMOUS
+	version = _version(user.pk)
+	claims = await request.session.aget(SESSION_KEY)
+	if not _is_current(claims, user.pk, version):
+		claims = _claims(user.pk, version, await _vip_claim(user.pk).afirst())
+		await request.session.aset(SESSION_KEY, claims)
+	return Principal(user.pk, True, user.is_superuser, claims['is_vip'])
+
+
+def get_principal(request) -> Principal:
+	"""The principal of a request, also when the middleware is not installed"""
+	principal = getattr(request, 'principal', None)
+	if principal is None:
+		principal = request.principal = load_principal(request)
+	return principal
+
+
+def invalidate(user_id: int) -> None:
+	"""Make every session of a user reload its claims once the transaction commits"""
+	transaction.on_commit(lambda: cache.delete(VERSION_KEY.format(user_id)))
+
+
+class PrincipalMiddleware:
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		if iscoroutinefunction(get_response):
+			# Stay on the event loop under ASGI; async views replace the lazy principal with aload_principal
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		request.principal = SimpleLazyObject(lambda: load_principal(request))
+		return self.get_response(request)
@@ -0,0 +1,267 @@
+"""Precomputed related articles.
+
+Articles are vectorized with TF-IDF over their title, tags and content
+(title and tag terms weighted up) using SciPy sparse matrices, and the top-k
+cosine neighbours of every article are stored in ``RelatedArticle`` so the
+detail page reads them with one indexed query.
+
+``rebuild_related`` recomputes the whole table; ``refresh_related`` only
+rewrites the rows of some articles and of the candidates they may now rank
+for. ``schedule_refresh`` runs it in a background thread once an article
+save commits, so the request does not wait for it.
+"""
+import atexit
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+
+from .models import Article, RelatedArticle
+from .replicas import primary_reads
+
+logger = logging.getLogger(__name__)
+
+try:
+	import numpy as np
+	from scipy import sparse
+except ImportError:  # pragma: no cover - optional dependency
+	np = sparse = None
+
+TOP_K = 5
+MIN_SCORE = 0.1
+MAX_DF = 0.5
+MAX_TERMS = 16
+TITLE_WEIGHT = 3
+TAG_WEIGHT = 3
+CHUNK_SIZE = 512
+CANDIDATE_POOL = 2000
+INSERT_BATCH_SIZE = 5000
+
+_executor = None
+# Articles waiting for the next background refresh
+_pending = set()
+_pending_lock = threading.Lock()
+
+_TOKEN_RE = re.compile(r'[^\W\d_]{3,}', re.UNICODE)
+STOP_WORDS = frozenset(
+	'the and for are but not you all any can had her was one our out has him his how its may new now old see '
+	'two way who did get let say she too use that with have this will your from they know want been good much '
+	'some time very when come here just like long make many over such take than them well were what into more '
+	'also only other their there these which would about after again could every first those where while being '
+	'should through'.split()
+)
+
+
+def is_available() -> bool:
+	return np is not None
+
+
+def _terms(title: str, tags: str, content: str) -> Counter:
+	counts = Counter(_TOKEN_RE.findall((content or '').lower()))
+	for token in _TOKEN_RE.findall((title or '').lower()):
+		counts[token] += TITLE_WEIGHT
+	for token in STOP_WORDS & counts.keys():
+		del counts[token]
+	for tag in (tags or '').replace('#', '').replace(';', ',').split(','):
+		tag = tag.strip().lower()
+		if tag:
+			counts[f'tag:{tag}'] += TAG_WEIGHT
+	return counts
+
+
+def _vectorize(documents: Sequence[Counter]):
+	"""Return an L2-normalized TF-IDF CSR matrix, one row per document
+
+	Each row keeps only its ``MAX_TERMS`` heaviest terms, which preserves the
+	distinctive vocabulary while keeping the similarity product sparse.
+	"""
+	n_docs = len(documents)
+	document_frequency = Counter()
+	for counts in documents:
+		document_frequency.update(counts.keys())
+
+	max_df = max(2, int(MAX_DF * n_docs))
+	vocabulary = {}
+	idf = []
+	for term, df in document_frequency.items():
+		# Terms in a single document cannot link two articles; very common ones only add noise
+		if 2 <= df <= max_df:
+			vocabulary[term] = len(vocabulary)
+			idf.append(math.log((1 + n_docs) / (1 + df)) + 1)
+
+	rows, columns, counts = [], [], []
+	for row, document in enumerate(documents):
+		for term, count in document.items():
+			column = vocabulary.get(term)
+			if column is not None:
+				rows.append(row)
+				columns.append(column)
+				counts.append(count)
+	rows = np.asarray(rows, dtype=np.int64)
+	columns = np.asarray(columns, dtype=np.int32)
+	weights = ((1 + np.log(np.asarray(counts, dtype=np.float32))) * np.asarray(idf, dtype=np.float32)[columns])
+
+	# Keep the MAX_TERMS heaviest terms of each row
+	order = np.lexsort((-weights, rows))
+	rows, columns, weights = rows[order], columns[order], weights[order]
+	rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+	keep = rank < MAX_TERMS
+	matrix = sparse.csr_matrix((weights[keep], (rows[keep], columns[keep])), shape=(n_docs, len(vocabulary)))
+	norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+	norms[norms == 0] = 1
+	return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+def _top_neighbors(matrix, ids: Sequence[int], rows: Iterable[int], k: int) -> Dict[int, List[Tuple[int, float]]]:
+	"""Top-k cosine neighbours of the given matrix rows, as ``{article_id: [(id, score), ...]}``"""
+	rows = np.asarray(list(rows), dtype=np.int64)
+	neighbors = {}
+	transposed = matrix.T.tocsr()
+	for start in range(0, len(rows), CHUNK_SIZE):
+		chunk = rows[start:start + CHUNK_SIZE]
+		scores = (matrix[chunk] @ transposed).tocoo()
+		keep = (scores.col != chunk[scores.row]) & (scores.data >= MIN_SCORE)
+		offsets, columns, data = scores.row[keep], scores.col[keep], scores.data[keep]
+
+		# Sort by (row, -score) and keep the first k entries of each row
+		order = np.lexsort((-data, offsets))
+		offsets, columns, data = offsets[order], columns[order], data[order]
+		rank = np.arange(len(offsets)) - np.searchsorted(offsets, offsets)
+		best = rank < k
+		offsets, columns, data = offsets[best], columns[best], data[best].tolist()
+		bounds = np.searchsorted(offsets, np.arange(len(chunk) + 1)).tolist()
+		columns = columns.tolist()
+
+		for offset, row in enumerate(chunk.tolist()):
+			neighbors[ids[row]] = [
+				(ids[columns[i]], data[i]) for i in range(bounds[offset], bounds[offset + 1])
+			]
+	return neighbors
+
+
+def _insert_rows(neighbors: Dict[int, List[Tuple[int, float]]]) -> int:
+	"""Insert neighbour lists with raw batched INSERTs (much cheaper than model instances)"""
+	quote = connection.ops.quote_name
+	sql = 'INSERT INTO {} ({}, {}, {}, {}) VALUES (%s, %s, %s, %s)'.format(
+		quote(RelatedArticle._meta.db_table), quote('article_id'), quote('related_id'), quote('score'), quote('rank'),
+	)
+	params = [
+		(article_id, related_id, score, rank)
+		for article_id, items in neighbors.items()
+		for rank, (related_id, score) in enumerate(items, start=1)
+	]
+	with connection.cursor() as cursor:
+		for start in range(0, len(params), INSERT_BATCH_SIZE):
+			cursor.executemany(sql, params[start:start + INSERT_BATCH_SIZE])
+	return len(params)
+
+
+def _load(queryset) -> Tuple[List[int], List[Counter]]:
+	ids, documents = [], []
+	for pk, title, tags, content in queryset.values_list('id', 'title', 'tags', 'content').iterator(chunk_size=2000):
+		ids.append(pk)
+		documents.append(_terms(title, tags, content))
+	return ids, documents
+
+
+def rebuild_related(k: int = TOP_K) -> int:
+	"""Recompute the neighbours of every article and return how many rows were written"""
+	ids, documents = _load(Article.objects.order_by('pk'))
+	neighbors = _top_neighbors(_vectorize(documents), ids, range(len(ids)), k) if ids else {}
+	with transaction.atomic():
+		RelatedArticle.objects.all().delete()
+		return _insert_rows(neighbors)
+
+
+def refresh_related(article_ids: Iterable[int], k: int = TOP_K) -> None:
+	"""Recompute the neighbours of some articles against a pool of likely candidates
+
+	The pool is the articles sharing a tag or category with the targets plus
+	the most recent ones; candidates whose stored lists the targets now enter
+	(or drop out of) are rewritten as well.
+	"""
+	article_ids = set(article_ids)
+	targets = Article.objects.filter(pk__in=article_ids)
+	tag_ids = Article.tag_refs.through.objects.filter(article_id__in=article_ids).values('tag_id')
+	category_ids = targets.exclude(category_ref=None).values('category_ref_id')
+	pool = set(
+		Article.objects.filter(Q(tag_refs__in=tag_ids) | Q(category_ref__in=category_ids))
+		.values_list('pk', flat=True).distinct()[:CANDIDATE_POOL]
+	)
+	pool.update(Article.objects.order_by('-published_at').values_list('pk', flat=True)[:CANDIDATE_POOL])
+	pool.update(RelatedArticle.objects.filter(related_id__in=article_ids).values_list('article_id', flat=True))
+	pool.update(targets.values_list('pk', flat=True))
+
+	ids, documents = _load(Article.objects.filter(pk__in=pool).order_by('pk'))
+	if not ids:
+		return
+	matrix = _vectorize(documents)
+	position = {pk: row for row, pk in enumerate(ids)}
+	target_rows = [position[pk] for pk in article_ids if pk in position]
+	neighbors = _top_neighbors(matrix, ids, target_rows, k)
+
+	# Merge the targets into the stored lists of every other pool member
+	similarity = (matrix[target_rows] @ matrix.T).toarray()
+	stored = {}
+	for row in RelatedArticle.objects.filter(article_id__in=pool).exclude(article_id__in=article_ids).order_by('rank'):
+		stored.setdefault(row.article_id, []).append((row.related_id, row.score))
+	for pk in ids:
+		if pk in article_ids:
+			continue
+		current = stored.get(pk, [])
+		merged = [(related_id, score) for related_id, score in current if related_id not in article_ids]
+		for offset, target_row in enumerate(target_rows):
+			score = float(similarity[offset, position[pk]])
+			if score >= MIN_SCORE:
+				merged.append((ids[target_row], score))
+		merged = sorted(merged, key=lambda item: -item[1])[:k]
+		if merged != current:
+			neighbors[pk] = merged
+
+	with transaction.atomic():
+		RelatedArticle.objects.filter(article_id__in=neighbors.keys()).delete()
+		_insert_rows(neighbors)
+
+
+def _run_pending() -> None:
+	with _pending_lock:
+		article_ids = set(_pending)
+		_pending.clear()
+	try:
+		# The saved articles may not have reached a replica yet
+		with primary_reads():
+			refresh_related(article_ids)
+	except Exception:
+		logger.exception('Could not refresh the related articles of articles %s', sorted(article_ids))
+	finally:
+		close_old_connections()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+	global _executor
+	if _executor is None:
+		# One worker: refreshes rewrite overlapping rows, so they must not run concurrently
+		_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='news-related')
+		atexit.register(_executor.shutdown, wait=True)
+	return _executor
+
+
+def _submit(article_ids: List[int]) -> None:
+	with _pending_lock:
+		queued = bool(_pending)
+		_pending.update(article_ids)
+	# Saves arriving while a refresh is queued join it instead of queueing another
+	if not queued:
+		_get_executor().submit(_run_pending)
+
+
+def schedule_refresh(article_ids: Iterable[int]) -> None:
+	"""Refresh the related articles in the background once the current transaction commits"""
+	article_ids = list(article_ids)
+	transaction.on_commit(lambda: _submit(article_ids))
@@ -0,0 +1,215 @@
+"""Read replicas with read-your-writes stickiness.
+
+``ReplicaRouter`` sends writes to the primary (``default``) and reads to one
+of the ``NEWS_READ_REPLICAS`` aliases. A replica is checked at most every
+``NEWS_REPLICA_CHECK_INTERVAL`` seconds and skipped while it is unreachable
+or more than ``NEWS_REPLICA_MAX_LAG`` seconds behind; with no usable replica
+reads go to the primary.
+
+``ReplicaPinningMiddleware`` keeps a request on one replica. Once the request
+writes, its later reads go to the primary. After a POST (or other unsafe
+method) that wrote, so do those of the session's next requests for
+``NEWS_REPLICA_PIN_SECONDS``, so a user sees an article they created, their
+survey answers or a VIP change they made straight away.
+Reads inside a transaction on the primary and session reads always use the
+primary. Other users may see a write up to ``staleness()`` seconds later, so
+caches keyed by a version or filled as counters must not be filled from
+replica reads in that window (see ``news.cards``, ``news.dashboard`` and
+``news.schema``).
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = DEFAULT_DB_ALIAS
+PIN_KEY = '_news_primary_until'
+# Read from the primary whatever the pinning: a session must not vanish after login
+PRIMARY_APPS = {'sessions'}
+# Writes made while serving these (lazy rebuilds of derived data) do not pin the session
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_aliases() -> List[str]:
+	return list(getattr(settings, 'NEWS_READ_REPLICAS', []))
+
+
+class RoutingState:
+	__slots__ = ('pinned', 'wrote', 'replica')
+
+	def __init__(self, pinned: bool):
+		self.pinned = pinned
+		self.wrote = False
+		self.replica: Optional[str] = None
+
+
+_current: ContextVar[Optional[RoutingState]] = ContextVar('news_routing_state', default=None)
+_checks: Dict[str, Tuple[float, bool]] = {}
+_checks_lock = threading.Lock()
+
+
+def _mysql_lag(cursor) -> Optional[float]:
+	# SHOW REPLICA STATUS needs MySQL 8.0.22; older servers only know the SLAVE spelling
+	for statement, column in (('SHOW REPLICA STATUS', 'seconds_behind_source'), ('SHOW SLAVE STATUS', 'seconds_behind_master')):
+		try:
+			cursor.execute(statement)
+		except DatabaseError:
+			continue
+		row = cursor.fetchone()
+		if row is None:
+			return None
+		status = dict(zip((field[0].lower() for field in cursor.description), row))
+		# NULL while replication is stopped
+		return None if status.get(column) is None else float(status[column])
+	return None
+
+
+def replica_lag(alias: str) -> Optional[float]:
+	"""Seconds a replica is behind the primary, ``None`` when it is unreachable or not replicating
+
+	Only MySQL reports lag; other backends count as current while they answer.
+	"""
+	connection = connections[alias]
+	try:
+		with connection.cursor() as cursor:
+			if connection.vendor == 'mysql':
+				return _mysql_lag(cursor)
+			cursor.execute('SELECT 1')
+			return 0.0
+	except DatabaseError:
+		# Reconnect on the next check
+		connection.close()
+		return None
+
+
+def is_healthy(lag: Optional[float]) -> bool:
+	return lag is not None and lag <= getattr(settings, 'NEWS_REPLICA_MAX_LAG', 5)
+
+
+def _usable(alias: str) -> bool:
+	now = time.monotonic()
+	with _checks_lock:
+		checked = _checks.get(alias)
+		if checked and now - checked[0] < getattr(settings, 'NEWS_REPLICA_CHECK_INTERVAL', 5):
+			return checked[1]
+		# Claim this round so concurrent readers keep the previous answer instead of checking too
+		_checks[alias] = (now, checked[1] if checked else False)
+	lag = replica_lag(alias)
+	healthy = is_healthy(lag)
+	with _checks_lock:
+		_checks[alias] = (now, healthy)
+	if checked and checked[1] != healthy:
+		if healthy:
+			logger.info('Replica %s is back in use', alias)
+		else:
+			logger.warning('Skipping replica %s: %s', alias, 'unreachable or not replicating' if lag is None else f'{lag:.0f}s behind')
+	return healthy
+
+
+def staleness() -> float:
+	"""Seconds after a commit that a replica read may still miss it
+
+	The lag a replica may have when it is checked, plus the time until the
+	next check could notice it has fallen further behind.
+	"""
+	return getattr(settings, 'NEWS_REPLICA_MAX_LAG', 5) + getattr(settings, 'NEWS_REPLICA_CHECK_INTERVAL', 5)
+
+
+def reset_checks() -> None:
+	"""Forget the health checks so every replica is checked on its next read"""
+	with _checks_lock:
+		_checks.clear()
+
+
+@contextmanager
+def primary_reads():
+	"""Read from the primary inside the block, e.g. in background jobs following a commit"""
+	token = _current.set(RoutingState(pinned=True))
+	try:
+		yield
+	finally:
+		_current.reset(token)
+
+
+def _pick_replica() -> str:
+	healthy = [alias for alias in replica_aliases() if _usable(alias)]
+	return random.choice(healthy) if healthy else PRIMARY
+
+
+class ReplicaRouter:
+	def db_for_read(self, model, **hints):
+		state = _current.get()
+		if model._meta.app_label in PRIMARY_APPS or connections[PRIMARY].in_atomic_block:
+			return PRIMARY
+		if state is None:
+			return _pick_replica()
+		if state.pinned or state.wrote:
+			return PRIMARY
+		if state.replica is None:
+			# One replica per request, so its reads agree with each other
+			state.replica = _pick_replica()
+		return state.replica
+
+	def db_for_write(self, model, **hints):
+		state = _current.get()
+		if state is not None:
+			state.wrote = True
+		return PRIMARY
+
+	def allow_relation(self, obj1, obj2, **hints):
+		pool = {PRIMARY, *replica_aliases()}
+		if obj1._state.db in pool and obj2._state.db in pool:
+			return True
+		return None
+
+	def allow_migrate(self, db, app_label, model_name=None, **hints):
+		# Replicas get the schema through replication
+		return False if db in replica_aliases() else None
+
+
+class ReplicaPinningMiddleware:
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		if not replica_aliases():
+			raise MiddlewareNotUsed
+		self.get_response = get_response
+		self.is_async = iscoroutinefunction(get_response)
+		if self.is_async:
+			markcoroutinefunction(self)
+
+	def _pin_seconds(self) -> float:
+		return getattr(settings, 'NEWS_REPLICA_PIN_SECONDS', 10)
+
+	def __call__(self, request):
+		if self.is_async:
+			return self.__acall__(request)
+		token = _current.set(RoutingState(request.session.get(PIN_KEY, 0) > time.time()))
+		try:
+			response = self.get_response(request)
+			if _current.get().wrote and request.method not in SAFE_METHODS:
+				request.session[PIN_KEY] = time.time() + self._pin_seconds()
+			return response
+		finally:
+			_current.reset(token)
+
+	async def __acall__(self, request):
+		token = _current.set(RoutingState(await request.session.aget(PIN_KEY, 0) > time.time()))
+		try:
+			response = await self.get_response(request)
+			if _current.get().wrote and request.method not in SAFE_METHODS:
+				await request.session.aset(PIN_KEY, time.time() + self._pin_seconds())
+			return response
+		finally:
+			_current.reset(token)
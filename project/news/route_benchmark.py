@@ -0,0 +1,199 @@
+"""Per-route benchmark suite.
+
+``run_suite`` requests every route of ``news.urls`` through the Django test
+client, as the audience the page is built for, and reports per route the
+p50/p99 latency, the SQL queries and the peak memory Python allocated while
+handling one request. The report is JSON with sorted keys and rounded
+numbers, so the reports of two commits can be compared with ``diff``. Run it
+on the data of ``manage.py seed_benchmark_data`` to get comparable numbers.
+"""
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .budgets import ANONYMOUS, QUERY_BUDGETS, SAMPLE_ARGUMENTS, SUPERUSER, VIP
+from .instrumentation import percentile
+from .models import Article, Question, QuestionChoice, Response, Survey
+
+
+class Scenario(NamedTuple):
+	url_name: str
+	audience: str
+	method: str = 'GET'
+	query_string: str = ''
+
+	@property
+	def label(self) -> str:
+		return f'{self.method} {self.url_name} [{self.audience}]'
+
+
+# Every budgeted page, plus the forms, the export and the survey submission
+SCENARIOS = tuple(
+	Scenario(budget.url_name, budget.audience, 'GET', budget.query_string) for budget in QUERY_BUDGETS
+) + (
+	Scenario('news:article_create', SUPERUSER),
+	Scenario('news:survey_create', SUPERUSER),
+	Scenario('news:survey_export', SUPERUSER),
+	Scenario('news:survey_detail', VIP, 'POST'),
+)
+
+
+def _export_arguments() -> Optional[Dict]:
+	kwargs = SAMPLE_ARGUMENTS['news:survey_detail']()
+	return None if kwargs is None else {**kwargs, 'fmt': 'csv'}
+
+
+ARGUMENTS = {**SAMPLE_ARGUMENTS, 'news:survey_export': _export_arguments}
+
+
+def uncovered_routes() -> List[str]:
+	"""Names in ``news.urls`` that no scenario requests"""
+	from .urls import app_name, urlpatterns
+
+	covered = {scenario.url_name for scenario in SCENARIOS}
+	return sorted({f'{app_name}:{pattern.name}' for pattern in urlpatterns} - covered)
+
+
+def survey_answers(survey_id: int) -> Dict:
+	"""Form data answering every question of a survey with its first choice or correct answer"""
+	from .schema import get_schema
+
+	data = {}
+	for question in get_schema(survey_id).questions:
+		if question.question_type == Question.TEXT:
+			data[question.field_name] = question.correct_answer or 'answer'
+		elif question.choices:
+			choice = str(question.choices[0].id)
+			data[question.field_name] = choice if question.question_type == Question.RADIO else [choice]
+	return data
+
+
+def dataset() -> Dict[str, int]:
+	from django.contrib.auth.models import User
+
+	return {
+		'articles': Article.objects.count(),
+		'surveys': Survey.objects.count(),
+		'questions': Question.objects.count(),
+		'choices': QuestionChoice.objects.count(),
+		'responses': Response.objects.count(),
+		'users': User.objects.count(),
+	}
+
+
+def requester(client: Client, scenario: Scenario, kwargs: Optional[Dict]) -> Callable:
+	"""A function sending the scenario's request with ``client``"""
+	url = reverse(scenario.url_name, kwargs=kwargs)
+	if scenario.query_string:
+		url = f'{url}?{scenario.query_string}'
+	if scenario.method == 'POST':
+		data = survey_answers(kwargs['pk'])
+		return lambda: client.post(url, data)
+	return lambda: client.get(url)
+
+
+def send(request: Callable) -> int:
+	"""Send a request, read a streamed body to the end and return the status code"""
+	response = request()
+	if response.streaming:
+		# Exports are generated while the body is read
+		for _ in response.streaming_content:
+			pass
+	return response.status_code
+
+
+@contextmanager
+def rolled_back():
+	with transaction.atomic():
+		yield
+		transaction.set_rollback(True)
+
+
+def measure(client: Client, scenario: Scenario, kwargs: Optional[Dict], iterations: int, warmup: int = 1) -> Dict:
+	"""Request one scenario ``warmup + iterations`` times, then once more under ``tracemalloc``"""
+	request = requester(client, scenario, kwargs)
+	# A submission would change what the next one sees; each runs in a savepoint that is rolled back
+	isolated = rolled_back if scenario.method == 'POST' else nullcontext
+
+	for _ in range(warmup):
+		with isolated():
+			send(request)
+
+	latencies, queries, statuses = [], [], set()
+	for _ in range(iterations):
+		with isolated():
+			with CaptureQueriesContext(connection) as captured:
+				start = time.perf_counter()
+				statuses.add(send(request))
+				latencies.append((time.perf_counter() - start) * 1000)
+			queries.append(len(captured))
+
+	with isolated():
+		tracemalloc.start()
+		try:
+			send(request)
+			peak = tracemalloc.get_traced_memory()[1]
+		finally:
+			tracemalloc.stop()
+
+	return {
+		'status': sorted(statuses),
+		'p50_ms': round(percentile(latencies, 50), 2),
+		'p99_ms': round(percentile(latencies, 99), 2),
+		'queries': percentile(queries, 50),
+		'queries_max': max(queries),
+		'peak_kib': round(peak / 1024),
+	}
+
+
+def prepare(users: Dict[str, object], only: Optional[str] = None) -> Tuple[List[Tuple[Scenario, Client, Optional[Dict]]], Dict[str, str]]:
+	"""``(scenario, client, URL arguments)`` of every runnable scenario, and the skipped ones with the reason
+
+	``users`` maps each audience to a user (see ``budgets.audience_users``);
+	``only`` keeps the scenarios whose label contains it.
+	"""
+	clients = {}
+	runs, skipped = [], {}
+	for scenario in SCENARIOS:
+		if only and only not in scenario.label:
+			continue
+		if scenario.audience != ANONYMOUS and users.get(scenario.audience) is None:
+			skipped[scenario.label] = f'no {scenario.audience} user'
+			continue
+		sample = ARGUMENTS.get(scenario.url_name)
+		kwargs = sample() if sample else None
+		if sample and kwargs is None:
+			skipped[scenario.label] = 'nothing to request'
+			continue
+
+		if scenario.audience not in clients:
+			clients[scenario.audience] = Client()
+			if users.get(scenario.audience) is not None:
+				clients[scenario.audience].force_login(users[scenario.audience])
+		runs.append((scenario, clients[scenario.audience], kwargs))
+	return runs, skipped
+
+
+def run_suite(users: Dict[str, object], iterations: int = 50, warmup: int = 1, only: Optional[str] = None) -> Dict:
+	"""Benchmark every scenario ``prepare`` finds runnable"""
+	from django.conf import settings
+
+	runs, skipped = prepare(users, only)
+	routes = {
+		scenario.label: measure(client, scenario, kwargs, iterations, warmup) for scenario, client, kwargs in runs
+	}
+	return {
+		'database': connection.vendor,
+		'async_views': settings.NEWS_ASYNC_VIEWS,
+		'iterations': iterations,
+		'dataset': dataset(),
+		'routes': routes,
+		'skipped': skipped,
+		'uncovered': uncovered_routes(),
+	}
@@ -0,0 +1,123 @@
+"""Compiled survey schemas.
+
+A ``SurveySchema`` is an immutable snapshot of a survey's questions, their
+choices and the answer key. It is compiled with two queries and cached both
+in this process and in the shared cache under the survey's version, which is
+derived from the questions' ``modified_at`` (choice changes touch their
+question, see ``news.signals``). Building the response form, validating it
+and scoring a submission all read the same schema, so a survey costs one
+version lookup per request however many questions it has.
+"""
+from collections import OrderedDict, defaultdict
+from threading import Lock
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Question, QuestionChoice
+from .replicas import PRIMARY
+
+SCHEMA_KEY = 'news:survey-schema:{}:{}'
+SCHEMA_TIMEOUT = 24 * 60 * 60
+LOCAL_SCHEMAS = 256
+
+_local: 'OrderedDict[int, SurveySchema]' = OrderedDict()
+_lock = Lock()
+
+
+class ChoiceSchema(NamedTuple):
+	id: int
+	text: str
+	is_correct: bool
+
+
+class QuestionSchema(NamedTuple):
+	id: int
+	text: str
+	question_type: str
+	order: int
+	required: bool
+	points: int
+	correct_answer: str
+	choices: Tuple[ChoiceSchema, ...]
+
+	@property
+	def field_name(self) -> str:
+		return f'question_{self.id}'
+
+	@property
+	def type_label(self) -> str:
+		return dict(Question.QUESTION_TYPES).get(self.question_type, 'Question')
+
+	@property
+	def correct_choices(self) -> FrozenSet[int]:
+		return frozenset(choice.id for choice in self.choices if choice.is_correct)
+
+
+class SurveySchema(NamedTuple):
+	survey_id: int
+	version: str
+	questions: Tuple[QuestionSchema, ...]
+
+	def answer_key(self):
+		from .scoring import AnswerKey, QuestionKey
+
+		return AnswerKey({
+			question.id: QuestionKey(
+				question.question_type, question.points,
+				question.correct_answer.strip().lower(), question.correct_choices,
+			)
+			for question in self.questions
+		})
+
+
+def schema_version(survey_id: int) -> str:
+	"""Version of a survey's questions: their count and latest modification"""
+	state = Question.objects.filter(survey_id=survey_id).aggregate(count=Count('id'), modified=Max('modified_at'))
+	modified = state['modified'].timestamp() if state['modified'] else 0
+	return f"{state['count']}-{modified:.6f}"
+
+
+def compile_schema(survey_id: int, version: str) -> SurveySchema:
+	"""Load the questions and choices of a survey with two queries"""
+	# From the primary, which is never behind the version (possibly read from a replica) it is cached under
+	choices = defaultdict(list)
+	rows = QuestionChoice.objects.using(PRIMARY).filter(question__survey_id=survey_id).order_by('order', 'id')
+	for question_id, pk, text, is_correct in rows.values_list('question_id', 'id', 'text', 'is_correct'):
+		choices[question_id].append(ChoiceSchema(pk, text, is_correct))
+
+	rows = Question.objects.using(PRIMARY).filter(survey_id=survey_id).order_by('order', 'id').values_list(
+		'id', 'text', 'question_type', 'order', 'required', 'points', 'correct_answer'
+	)
+	questions = tuple(
+		QuestionSchema(pk, text, question_type, order, required, points, correct_answer or '', tuple(choices[pk]))
+		for pk, text, question_type, order, required, points, correct_answer in rows
+	)
+	return SurveySchema(survey_id, version, questions)
+
+
+def _remember(schema: SurveySchema) -> None:
+	with _lock:
+		_local[schema.survey_id] = schema
+		_local.move_to_end(schema.survey_id)
+		while len(_local) > LOCAL_SCHEMAS:
+			_local.popitem(last=False)
+
+
+def get_schema(survey_id: int, version: Optional[str] = None) -> SurveySchema:
+	"""The current schema of a survey, from this process, the shared cache or the database"""
+	if version is None:
+		version = schema_version(survey_id)
+	schema = _local.get(survey_id)
+	if schema is not None and schema.version == version:
+		return schema
+
+	key = SCHEMA_KEY.format(survey_id, version)
+	schema = cache.get(key)
+	if schema is None:
+		schema = compile_schema(survey_id, version)
+		cache.set(key, schema, SCHEMA_TIMEOUT)
+	_remember(schema)
+	return schema
+
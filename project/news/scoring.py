@@ -0,0 +1,113 @@
+"""Set-based scoring for survey responses.
+
+The answer key of a survey comes from its compiled schema (``news.schema``)
+and responses are scored in memory, so scoring one response or thousands
+costs a constant number of queries.
+"""
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from .models import Question, Response, ResponseAnswer
+
+
+class QuestionKey(NamedTuple):
+	question_type: str
+	points: int
+	correct_answer: str
+	correct_choices: FrozenSet[int]
+
+
+class AnswerRecord(NamedTuple):
+	question_id: int
+	answer_text: str
+	selected_choices: FrozenSet[int]
+
+
+class AnswerKey:
+	"""Correct answers of a survey, indexed by question id"""
+
+	def __init__(self, questions: Dict[int, QuestionKey]):
+		self.questions = questions
+
+	@classmethod
+	def for_survey(cls, survey_id: int) -> 'AnswerKey':
+		"""The key of a survey's current compiled schema (see ``news.schema``)"""
+		from .schema import get_schema
+
+		return get_schema(survey_id).answer_key()
+
+	def score(self, answers: Iterable[AnswerRecord]) -> Tuple[int, int]:
+		"""Return ``(score, max_possible_score)`` for the answers of one response"""
+		total_score = 0
+		max_score = 0
+		for answer in answers:
+			question = self.questions.get(answer.question_id)
+			if question is None:
+				continue
+			max_score += question.points
+
+			if question.question_type == Question.TEXT:
+				# For text questions, check if answer matches correct_answer
+				if (answer.answer_text or '').strip().lower() == question.correct_answer:
+					total_score += question.points
+			elif answer.selected_choices == question.correct_choices:
+				# For choice questions, the selection must match the correct choices exactly
+				total_score += question.points
+		return total_score, max_score
+
+
+def load_answers(response_ids: Iterable[int]) -> Dict[int, List[AnswerRecord]]:
+	"""Load the answers of many responses with two queries, grouped by response id"""
+	response_ids = list(response_ids)
+	if not response_ids:
+		return {}
+
+	through = ResponseAnswer.selected_choices.through
+	selected = defaultdict(set)
+	links = through.objects.filter(responseanswer__response_id__in=response_ids)
+	for answer_id, choice_id in links.values_list('responseanswer_id', 'questionchoice_id'):
+		selected[answer_id].add(choice_id)
+
+	answers = defaultdict(list)
+	rows = ResponseAnswer.objects.filter(response_id__in=response_ids).values_list(
+		'id', 'response_id', 'question_id', 'answer_text'
+	)
+	for pk, response_id, question_id, answer_text in rows:
+		answers[response_id].append(AnswerRecord(question_id, answer_text, frozenset(selected[pk])))
+	return answers
+
+
+def score_responses(responses: List[Response], key: Optional[AnswerKey] = None) -> List[Response]:
+	"""Set ``score`` and ``max_possible_score`` on responses of one survey without saving them"""
+	if not responses:
+		return responses
+	if key is None:
+		key = AnswerKey.for_survey(responses[0].survey_id)
+
+	answers = load_answers(response.pk for response in responses)
+	for response in responses:
+		response.score, response.max_possible_score = key.score(answers.get(response.pk, []))
+	return responses
+
+
+def rescore_survey(survey_id: int, batch_size: int = 1000) -> int:
+	"""Re-score every response of a survey in batches and return how many were updated"""
+	key = AnswerKey.for_survey(survey_id)
+	queryset = Response.objects.filter(survey_id=survey_id).only('id', 'survey_id', 'score', 'max_possible_score')
+
+	updated = 0
+	last_pk = 0
+	while True:
+		batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+		if not batch:
+			break
+		score_responses(batch, key)
+		Response.objects.bulk_update(batch, ['score', 'max_possible_score'])
+		updated += len(batch)
+		last_pk = batch[-1].pk
+
+	from .aggregates import rebuild_survey_stats
+
+	# Scores moved, so the score distribution has to be recounted
+	rebuild_survey_stats([survey_id])
+	return updated
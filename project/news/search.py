@@ -0,0 +1,165 @@
+"""Full-text article search.
+
+Production (MySQL) uses an InnoDB ``FULLTEXT`` index, which MySQL maintains
+itself. SQLite uses an FTS5 table keyed by article id that is kept in sync
+from the ``Article`` save and delete signals. Other backends fall back to
+``icontains`` filtering.
+"""
+import re
+from typing import Iterable, List
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Article
+
+FTS_TABLE = 'news_article_fts'
+SEARCH_FIELDS = ('title', 'excerpt', 'content', 'tags', 'category')
+# bm25() column weights, in SEARCH_FIELDS order
+SQLITE_WEIGHTS = (10.0, 4.0, 1.0, 6.0, 3.0)
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def index_articles(articles: Iterable[Article]) -> None:
+	"""Add or refresh articles in the SQLite FTS table"""
+	if connection.vendor != 'sqlite':
+		return
+	rows = [(article.pk, *(getattr(article, field) or '' for field in SEARCH_FIELDS)) for article in articles]
+	if not rows:
+		return
+	with connection.cursor() as cursor:
+		unindex_articles([row[0] for row in rows])
+		placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+		cursor.executemany(
+			f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES ({placeholders})",
+			rows,
+		)
+
+
+def unindex_articles(article_ids: Iterable[int]) -> None:
+	"""Remove articles from the SQLite FTS table"""
+	if connection.vendor != 'sqlite':
+		return
+	article_ids = list(article_ids)
+	if not article_ids:
+		return
+	with connection.cursor() as cursor:
+		cursor.execute(
+			f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(article_ids))})",
+			article_ids,
+		)
+
+
+def rebuild_search_index() -> None:
+	"""Re-populate the SQLite FTS table from the article table"""
+	if connection.vendor != 'sqlite':
+		return
+	with connection.cursor() as cursor:
+		cursor.execute(f'DELETE FROM {FTS_TABLE}')
+		cursor.execute(
+			f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) "
+			f"SELECT id, {', '.join(SEARCH_FIELDS)} FROM news_article"
+		)
+
+
+def _sqlite_match(terms: List[str]) -> str:
+	# Quote every term so user input cannot inject FTS5 syntax; prefix-match the last one
+	quoted = [f'"{term}"' for term in terms]
+	quoted[-1] += '*'
+	return ' '.join(quoted)
+
+
+class SearchResults:
+	"""Lazily evaluated, relevance-ranked search results usable with ``Paginator``"""
+
+	def __init__(self, query: str):
+		self.query = query
+		self.terms = _TERM_RE.findall(query.lower())
+		self._count = None
+
+	def _ranked_ids(self, limit: int, offset: int) -> List[tuple]:
+		vendor = connection.vendor
+		with connection.cursor() as cursor:
+			if vendor == 'sqlite':
+				weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+				cursor.execute(
+					f"SELECT rowid, -bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} "
+					f"WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s",
+					[_sqlite_match(self.terms), limit, offset],
+				)
+			else:
+				match = f"MATCH ({', '.join(SEARCH_FIELDS)}) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+				cursor.execute(
+					f"SELECT id, {match} AS score FROM news_article WHERE {match} "
+					f"ORDER BY score DESC LIMIT %s OFFSET %s",
+					[self.query, self.query, limit, offset],
+				)
+			return cursor.fetchall()
+
+	def _fallback_queryset(self):
+		condition = Q()
+		for term in self.terms:
+			term_condition = Q()
+			for field in SEARCH_FIELDS:
+				term_condition |= Q(**{f'{field}__icontains': term})
+			condition &= term_condition
+		return Article.objects.filter(condition)
+
+	def count(self) -> int:
+		if self._count is None:
+			if not self.terms:
+				self._count = 0
+			elif connection.vendor == 'sqlite':
+				with connection.cursor() as cursor:
+					cursor.execute(
+						f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_sqlite_match(self.terms)]
+					)
+					self._count = cursor.fetchone()[0]
+			elif connection.vendor == 'mysql':
+				with connection.cursor() as cursor:
+					cursor.execute(
+						f"SELECT COUNT(*) FROM news_article WHERE MATCH ({', '.join(SEARCH_FIELDS)}) "
+						f"AGAINST (%s IN NATURAL LANGUAGE MODE)",
+						[self.query],
+					)
+					self._count = cursor.fetchone()[0]
+			else:
+				self._count = self._fallback_queryset().count()
+		return self._count
+
+	def ids(self) -> List[int]:
+		"""Ids of every matching article, best match first"""
+		if not self.terms:
+			return []
+		if connection.vendor not in ('sqlite', 'mysql'):
+			return list(self._fallback_queryset().values_list('pk', flat=True))
+		return [pk for pk, _ in self._ranked_ids(self.count(), 0)]
+
+	def __len__(self):
+		return self.count()
+
+	def __getitem__(self, index):
+		if not isinstance(index, slice):
+			return self[index:index + 1][0]
+		offset = index.start or 0
+		limit = (index.stop if index.stop is not None else self.count()) - offset
+		if not self.terms or limit <= 0:
+			return []
+
+		if connection.vendor not in ('sqlite', 'mysql'):
+			return list(self._fallback_queryset()[offset:offset + limit])
+
+		ranked = self._ranked_ids(limit, offset)
+		articles = Article.objects.defer('content').in_bulk([pk for pk, _ in ranked])
+		results = []
+		for pk, score in ranked:
+			article = articles.get(pk)
+			if article is not None:
+				article.search_rank = score
+				results.append(article)
+		return results
+
+
+def search_articles(query: str) -> SearchResults:
+	return SearchResults(query)
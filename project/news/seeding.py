@@ -0,0 +1,283 @@
+"""Deterministic benchmark data.
+
+``seed`` fills an empty database with articles, surveys with questions and
+choices, VIP users and their scored responses, all written with
+``bulk_create``. Every value comes from a ``random.Random`` seeded by the
+caller and every timestamp is an offset from ``EPOCH``, so the same seed
+builds the same dataset on every run and benchmark results of different
+commits stay comparable. Bulk inserts skip ``save()`` and the model signals,
+so the derived tables (tags, categories, search index, related articles,
+survey aggregates, dashboard rollups) are rebuilt at the end.
+"""
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, NamedTuple, Sequence
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+
+from .models import Article, Profile, Question, QuestionChoice, Response, ResponseAnswer, Survey, make_excerpt
+from .schema import get_schema
+from .scoring import AnswerRecord
+from .slugs import base_slug
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+USERNAME_PREFIX = 'bench-'
+PASSWORD = 'benchmark'
+BATCH_SIZE = 500
+
+WORDS = (
+	'news', 'market', 'city', 'council', 'energy', 'climate', 'report', 'season', 'league', 'vote',
+	'health', 'school', 'science', 'space', 'budget', 'bank', 'river', 'storm', 'festival', 'museum',
+	'startup', 'software', 'network', 'data', 'privacy', 'court', 'ruling', 'election', 'harvest', 'rail',
+	'airport', 'housing', 'rent', 'wages', 'strike', 'trade', 'export', 'summit', 'treaty', 'border',
+	'team', 'coach', 'final', 'record', 'album', 'film', 'award', 'study', 'vaccine', 'hospital',
+	'ocean', 'forest', 'wildlife', 'solar', 'battery', 'robot', 'chip', 'launch', 'update', 'review',
+)
+CATEGORIES = ('General', 'Technology', 'Science', 'Politics', 'Sports', 'Culture', 'Business', 'Health')
+TAGS = (
+	'AI', 'Python', 'Climate', 'Elections', 'Football', 'Space', 'Economy', 'Startups', 'Privacy', 'Music',
+	'Film', 'Travel', 'Education', 'Housing', 'Energy', 'Transport', 'Medicine', 'Security', 'Cities', 'Food',
+)
+AUTHORS = (
+	'Alex Morgan', 'Sam Rivera', 'Jordan Lee', 'Casey Kim', 'Taylor Brooks', 'Robin Patel',
+	'Jamie Chen', 'Avery Quinn', 'Riley Novak', 'Drew Okafor', 'Morgan Silva', 'Quinn Larsen',
+)
+QUESTION_TYPES = (Question.TEXT, Question.RADIO, Question.CHECKBOX)
+
+
+class Dataset(NamedTuple):
+	articles: int
+	surveys: int
+	questions: int
+	choices: int
+	users: int
+	responses: int
+
+
+def _words(rng: random.Random, low: int, high: int) -> str:
+	return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _sentence(rng: random.Random, low: int = 6, high: int = 16) -> str:
+	return _words(rng, low, high).capitalize() + '.'
+
+
+def _moment(rng: random.Random, days: int) -> datetime:
+	"""A moment within ``days`` days before ``EPOCH``"""
+	return EPOCH - timedelta(seconds=rng.randrange(days * 86400))
+
+
+def _fill_pks(model, objects: Sequence, key_fields: Sequence[str]) -> None:
+	"""Set the primary keys of bulk-created rows on backends that do not return them (MySQL)"""
+	if not objects or objects[0].pk is not None:
+		return
+	pks = {tuple(row[1:]): row[0] for row in model.objects.values_list('pk', *key_fields)}
+	for obj in objects:
+		obj.pk = pks[tuple(getattr(obj, field) for field in key_fields)]
+
+
+def _create(model, objects: List, key_fields: Sequence[str], batch_size: int) -> List:
+	model.objects.bulk_create(objects, batch_size=batch_size)
+	_fill_pks(model, objects, key_fields)
+	return objects
+
+
+def seed_articles(rng: random.Random, count: int, batch_size: int = BATCH_SIZE) -> List[Article]:
+	from .taxonomy import link_tags, resolve_categories
+
+	articles = []
+	for number in range(1, count + 1):
+		title = _words(rng, 3, 9).title()
+		content = '\n\n'.join(
+			' '.join(_sentence(rng) for _ in range(rng.randint(3, 7))) for _ in range(rng.randint(2, 6))
+		)
+		articles.append(Article(
+			title=title,
+			# The database starts empty, so the sequence number alone keeps slugs unique
+			slug=f'{base_slug(title)}-{number}',
+			content=content,
+			author=rng.choice(AUTHORS),
+			category=rng.choice(CATEGORIES),
+			tags=', '.join(rng.sample(TAGS, rng.randint(0, 4))),
+			published_at=_moment(rng, 365),
+			excerpt=make_excerpt(content),
+			views=int(rng.paretovariate(1.2) * 10),
+		))
+	resolve_categories(articles)
+	_create(Article, articles, ['slug'], batch_size)
+	# updated_at is auto_now, which bulk_create fills in with the current time
+	for article in articles:
+		article.updated_at = article.published_at
+	Article.objects.bulk_update(articles, ['updated_at'], batch_size=batch_size)
+	link_tags(articles)
+	return articles
+
+
+def seed_users(rng: random.Random, count: int, batch_size: int = BATCH_SIZE) -> List[User]:
+	"""A superuser and ``count`` VIPs, all with the password ``PASSWORD``"""
+	# One fixed salt: hashing is slow, and a random salt would make the rows differ between runs
+	password = make_password(PASSWORD, salt='benchmarkseed')
+	users = [User(
+		username=f'{USERNAME_PREFIX}admin', email=f'{USERNAME_PREFIX}admin@example.com', password=password,
+		is_staff=True, is_superuser=True, date_joined=_moment(rng, 730),
+	)]
+	users += [
+		User(
+			username=f'{USERNAME_PREFIX}vip-{number:04d}', email=f'{USERNAME_PREFIX}vip-{number:04d}@example.com',
+			password=password, date_joined=_moment(rng, 730),
+		)
+		for number in range(1, count + 1)
+	]
+	_create(User, users, ['username'], batch_size)
+	Profile.objects.bulk_create(
+		[Profile(user_id=user.pk, is_vip=not user.is_superuser) for user in users], batch_size=batch_size
+	)
+	return users
+
+
+def seed_surveys(
+	rng: random.Random, count: int, questions: int, choices: int, respondents: int, batch_size: int = BATCH_SIZE,
+) -> List[Survey]:
+	surveys = [
+		Survey(
+			title=_words(rng, 2, 6).title() + ' Survey',
+			description=_sentence(rng, 10, 30),
+			active=rng.random() < 0.8,
+			# Leave free slots so benchmarks can submit new responses
+			max_slots=respondents + 10,
+			used_slots=0,
+			slot_duration_hours=rng.choice((24, 48, 168)),
+		)
+		for _ in range(count)
+	]
+	_create(Survey, surveys, ['title', 'description'], batch_size)
+	# created_at is auto_now_add, which bulk_create fills in with the current time
+	for survey in surveys:
+		survey.created_at = _moment(rng, 180)
+	Survey.objects.bulk_update(surveys, ['created_at'], batch_size=batch_size)
+
+	rows = []
+	for survey in surveys:
+		for order in range(1, rng.randint(max(1, questions // 2), questions) + 1):
+			question_type = rng.choice(QUESTION_TYPES)
+			rows.append(Question(
+				survey_id=survey.pk,
+				text=_words(rng, 5, 12).capitalize() + '?',
+				question_type=question_type,
+				order=order,
+				required=rng.random() < 0.7,
+				points=rng.randint(1, 3),
+				correct_answer=rng.choice(WORDS) if question_type == Question.TEXT else '',
+			))
+	_create(Question, rows, ['survey_id', 'order'], batch_size)
+
+	options = []
+	for question in rows:
+		if question.question_type == Question.TEXT:
+			continue
+		count_choices = rng.randint(2, max(2, choices))
+		correct = set(rng.sample(range(count_choices), 1 if question.question_type == Question.RADIO else rng.randint(1, 2)))
+		options += [
+			QuestionChoice(question_id=question.pk, text=_words(rng, 1, 4).capitalize(), order=order, is_correct=order in correct)
+			for order in range(count_choices)
+		]
+	_create(QuestionChoice, options, ['question_id', 'order'], batch_size)
+	return surveys
+
+
+def _answer(rng: random.Random, question) -> AnswerRecord:
+	if question.question_type == Question.TEXT:
+		text = question.correct_answer if rng.random() < 0.5 else rng.choice(WORDS)
+		return AnswerRecord(question.id, text, frozenset())
+	ids = [choice.id for choice in question.choices]
+	picked = 1 if question.question_type == Question.RADIO else rng.randint(1, len(ids))
+	return AnswerRecord(question.id, '', frozenset(rng.sample(ids, picked)))
+
+
+def seed_responses(
+	rng: random.Random, surveys: Sequence[Survey], vips: Sequence[User], per_survey: int, batch_size: int = BATCH_SIZE,
+) -> int:
+	"""Scored responses from ``per_survey`` VIPs per survey; the first VIP answers none"""
+	responses = []
+	records: Dict[tuple, List[AnswerRecord]] = {}
+	for survey in surveys:
+		schema = get_schema(survey.pk)
+		key = schema.answer_key()
+		respondents = rng.sample(list(vips[1:]), min(per_survey, len(vips) - 1))
+		for slot, user in enumerate(respondents, start=1):
+			answers = [_answer(rng, question) for question in schema.questions]
+			submitted_at = survey.created_at + timedelta(seconds=rng.randrange(30 * 86400))
+			score, max_score = key.score(answers)
+			responses.append(Response(
+				survey_id=survey.pk, user_id=user.pk, score=score, max_possible_score=max_score, slot_number=slot,
+				submitted_at=submitted_at, slot_expires_at=submitted_at + timedelta(hours=survey.slot_duration_hours),
+			))
+			records[survey.pk, user.pk] = answers
+		survey.used_slots = len(respondents)
+	Survey.objects.bulk_update(surveys, ['used_slots'], batch_size=batch_size)
+
+	# submitted_at is auto_now_add: keep the generated times and put them back after the insert
+	submitted = {(response.survey_id, response.user_id): response.submitted_at for response in responses}
+	_create(Response, responses, ['survey_id', 'user_id'], batch_size)
+	for response in responses:
+		response.submitted_at = submitted[response.survey_id, response.user_id]
+	Response.objects.bulk_update(responses, ['submitted_at'], batch_size=batch_size)
+
+	answers = [
+		ResponseAnswer(response_id=response.pk, question_id=record.question_id, answer_text=record.answer_text)
+		for response in responses
+		for record in records[response.survey_id, response.user_id]
+	]
+	_create(ResponseAnswer, answers, ['response_id', 'question_id'], batch_size)
+	selected = {
+		(response.pk, record.question_id): record.selected_choices
+		for response in responses
+		for record in records[response.survey_id, response.user_id]
+	}
+	through = ResponseAnswer.selected_choices.through
+	through.objects.bulk_create([
+		through(responseanswer_id=answer.pk, questionchoice_id=choice_id)
+		for answer in answers
+		for choice_id in sorted(selected[answer.response_id, answer.question_id])
+	], batch_size=batch_size)
+	return len(responses)
+
+
+def rebuild_derived() -> None:
+	"""Recompute everything the model signals would have maintained"""
+	from . import dashboard
+	from .aggregates import rebuild_survey_stats
+	from .related import is_available, rebuild_related
+	from .search import rebuild_search_index
+
+	rebuild_survey_stats()
+	dashboard.rebuild_rollups()
+	dashboard.invalidate()
+	if connection.vendor == 'sqlite':
+		# MySQL maintains its FULLTEXT index itself
+		rebuild_search_index()
+	if is_available():
+		rebuild_related()
+
+
+def seed(
+	seed: int = 1, articles: int = 2000, surveys: int = 20, questions: int = 10, choices: int = 4,
+	vips: int = 200, responses: int = 50, batch_size: int = BATCH_SIZE,
+) -> Dataset:
+	"""Fill an empty database; the same arguments always build the same data"""
+	rng = random.Random(seed)
+	users = seed_users(rng, vips, batch_size)
+	created_articles = seed_articles(rng, articles, batch_size)
+	created_surveys = seed_surveys(rng, surveys, questions, choices, responses, batch_size)
+	created_responses = seed_responses(rng, created_surveys, users[1:], responses, batch_size)
+	rebuild_derived()
+	return Dataset(
+		articles=len(created_articles),
+		surveys=len(created_surveys),
+		questions=Question.objects.count(),
+		choices=QuestionChoice.objects.count(),
+		users=len(users),
+		responses=created_responses,
+	)
@@ -1,8 +1,18 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .models import Profile
+from .aggregates import rebuild_survey_stats
+from . import blobs, dashboard, principal
+from .cards import bump_card_version
+from .images import delete_variants, needs_variants, schedule_variants
+from .models import Article, Profile, Question, QuestionChoice, Response, Survey
+from .related import is_available as related_available, schedule_refresh
+from .search import SEARCH_FIELDS, index_articles, unindex_articles
+from .slots import recount_slots
+from .taxonomy import refresh_category_counts, refresh_tag_counts
 
 
 @receiver(post_save, sender=User)
@@ -11,6 +21,211 @@ def create_user_profile(sender, instance, created, **kwargs):
 		Profile.objects.create(user=instance)
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-	instance.profile.save() 
\ No newline at end of file
+class ResponseDeletions:
+	"""The responses deleted in one transaction, accounted for once it commits
+
+	Deleting a survey or a user deletes responses one row at a time; the
+	slots, result aggregates, cards and counters of each survey are updated
+	once for all of them, and not at all for surveys deleted as well.
+	"""
+	def __init__(self):
+		self.survey_ids = set()
+		self.submitted_at = []
+		self.deleted_surveys = set()
+
+	def apply(self):
+		survey_ids = self.survey_ids - self.deleted_surveys
+		if survey_ids:
+			# Only open slots count, so the deleted responses' slots are recounted rather than subtracted
+			recount_slots(survey_ids)
+			# The answers are gone by now, so the aggregates are recounted too
+			rebuild_survey_stats(survey_ids)
+		for survey_id in survey_ids:
+			bump_card_version('survey', survey_id)
+		if self.submitted_at:
+			dashboard.nudge(total_responses=-len(self.submitted_at))
+			dashboard.record_responses(self.submitted_at, -1)
+
+
+def response_deletions() -> ResponseDeletions:
+	"""The ``ResponseDeletions`` of the current transaction"""
+	connection = transaction.get_connection()
+	deletions = getattr(connection, '_news_response_deletions', None)
+	# A commit runs the callback and a rollback drops it; either way the next deletion starts afresh
+	if deletions is None or not any(entry[1] == deletions.apply for entry in connection.run_on_commit):
+		deletions = connection._news_response_deletions = ResponseDeletions()
+		transaction.on_commit(deletions.apply)
+	return deletions
+
+
+@receiver(pre_delete, sender=Survey)
+def remember_deleted_survey(sender, instance, **kwargs):
+	# Sent before the survey's responses are collected and deleted
+	response_deletions().deleted_surveys.add(instance.pk)
+
+
+@receiver(post_delete, sender=Response)
+def account_deleted_response(sender, instance, **kwargs):
+	deletions = response_deletions()
+	deletions.survey_ids.add(instance.survey_id)
+	deletions.submitted_at.append(instance.submitted_at)
+
+
+@receiver(post_save, sender=Article)
+def index_article(sender, instance, update_fields=None, **kwargs):
+	if update_fields is not None and not set(SEARCH_FIELDS) & set(update_fields):
+		return
+	index_articles([instance])
+
+
+@receiver(post_delete, sender=Article)
+def unindex_article(sender, instance, **kwargs):
+	unindex_articles([instance.pk])
+
+
+@receiver(pre_delete, sender=Article)
+def remember_article_tags(sender, instance, **kwargs):
+	instance._deleted_tag_ids = list(instance.tag_refs.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Article)
+def refresh_taxonomy_counts(sender, instance, **kwargs):
+	refresh_tag_counts(getattr(instance, '_deleted_tag_ids', []))
+	refresh_category_counts([instance.category_ref_id])
+
+
+@receiver(post_save, sender=Article)
+def refresh_related_articles(sender, instance, update_fields=None, **kwargs):
+	if not related_available():
+		return
+	if update_fields is not None and not {'title', 'tags', 'content'} & set(update_fields):
+		return
+	# Run after commit so the neighbours see the saved row and its tags
+	schedule_refresh([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Article)
+def invalidate_article_card(sender, instance, **kwargs):
+	bump_card_version('article', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Survey)
+def invalidate_survey_card(sender, instance, **kwargs):
+	bump_card_version('survey', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver(post_save, sender=Response)
+def invalidate_parent_survey_card(sender, instance, **kwargs):
+	# Question counts and free slots are shown on the survey card
+	bump_card_version('survey', instance.survey_id)
+
+
+@receiver([post_save, post_delete], sender=QuestionChoice)
+def touch_choice_question(sender, instance, **kwargs):
+	# Compiled survey schemas are versioned by the questions' modified_at
+	Question.objects.filter(pk=instance.question_id).update(modified_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=User)
+def count_users(sender, instance, created=False, update_fields=None, **kwargs):
+	if created:
+		dashboard.nudge(total_users=1, superusers=int(instance.is_superuser))
+	elif kwargs['signal'] is post_delete:
+		dashboard.nudge(total_users=-1, superusers=-int(instance.is_superuser))
+	elif update_fields is None or 'is_superuser' in update_fields:
+		# The previous flag is unknown; logins only save last_login and keep the counter
+		dashboard.invalidate('superusers')
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_principal(sender, instance, **kwargs):
+	principal.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Profile)
+def count_vip_users(sender, instance, created, **kwargs):
+	if created:
+		dashboard.nudge(vip_users=int(instance.is_vip))
+	elif not hasattr(instance, '_loaded_is_vip'):
+		dashboard.invalidate('vip_users')
+	elif instance._loaded_is_vip != instance.is_vip:
+		dashboard.nudge(vip_users=1 if instance.is_vip else -1)
+	instance._loaded_is_vip = instance.is_vip
+
+
+@receiver(post_delete, sender=Profile)
+def uncount_vip_user(sender, instance, **kwargs):
+	if instance.is_vip:
+		dashboard.nudge(vip_users=-1)
+
+
+@receiver(post_save, sender=Article)
+def count_article(sender, instance, created, **kwargs):
+	if created:
+		dashboard.nudge(total_articles=1)
+		dashboard.record_article(instance.published_at)
+	elif getattr(instance, '_loaded_published_at', instance.published_at) != instance.published_at:
+		dashboard.record_article(instance._loaded_published_at, -1)
+		dashboard.record_article(instance.published_at)
+	instance._loaded_published_at = instance.published_at
+
+
+@receiver(post_delete, sender=Article)
+def uncount_article(sender, instance, **kwargs):
+	dashboard.nudge(total_articles=-1)
+	dashboard.record_article(instance.published_at, -1)
+
+
+@receiver(post_save, sender=Survey)
+def count_survey(sender, instance, created, **kwargs):
+	if created:
+		dashboard.nudge(total_surveys=1, active_surveys=int(instance.active), inactive_surveys=int(not instance.active))
+	else:
+		# The active flag may have flipped
+		dashboard.invalidate('active_surveys', 'inactive_surveys')
+
+
+@receiver(post_delete, sender=Survey)
+def uncount_survey(sender, instance, **kwargs):
+	dashboard.nudge(total_surveys=-1, active_surveys=-int(instance.active), inactive_surveys=-int(not instance.active))
+
+
+@receiver(post_save, sender=Response)
+def count_response(sender, instance, created, **kwargs):
+	if created:
+		dashboard.nudge(total_responses=1)
+		dashboard.record_response(instance.submitted_at)
+
+
+@receiver(post_save, sender=Article)
+def render_image_variants(sender, instance, **kwargs):
+	if needs_variants(instance):
+		schedule_variants(instance.pk)
+
+
+@receiver(post_delete, sender=Article)
+def delete_image_variants(sender, instance, **kwargs):
+	variants = instance.image_variants
+
+	def delete():
+		# Articles sharing the same stored image share its variants
+		if not Article.objects.filter(image=variants.get('source')).exists():
+			delete_variants(variants)
+
+	transaction.on_commit(delete)
+
+
+@receiver(post_save, sender=Article)
+def count_image_reference(sender, instance, created, **kwargs):
+	image = instance.image.name or ''
+	previous = '' if created else getattr(instance, '_loaded_image', image) or ''
+	if image != previous:
+		blobs.acquire(image)
+		blobs.release(previous)
+	instance._loaded_image = image
+
+
+@receiver(post_delete, sender=Article)
+def release_image_reference(sender, instance, **kwargs):
+	blobs.release(instance.image.name or '')
@@ -0,0 +1,78 @@
+"""Survey slot reservation.
+
+``Survey.used_slots`` is a stored counter of the slots still open, so
+reading availability costs no queries. Reserving a slot increments it with a
+conditional ``F()`` update, which only succeeds while slots remain and locks
+the survey row until the surrounding transaction commits, so concurrent
+submits cannot over-book.
+
+A slot is given back when its response expires or is deleted. Expiry does
+not write anything, so the counter is recounted from the responses by a
+reservation that finds the survey full, after deletions, and by
+``manage.py release_expired_slots`` for the availability shown on pages.
+"""
+from datetime import timedelta
+from itertools import count
+from typing import Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Response, Survey
+
+
+class SlotUnavailable(Exception):
+	"""Raised when every slot of a survey is taken"""
+
+
+class SlotExpired(Exception):
+	"""Raised when a response is changed after its slot has expired"""
+
+
+def _open_responses(now):
+	return Response.objects.filter(Q(slot_expires_at=None) | Q(slot_expires_at__gt=now))
+
+
+def recount_slots(survey_ids: Optional[Iterable[int]] = None) -> List[int]:
+	"""Set ``used_slots`` to the open responses of some surveys (default: all); returns the surveys that changed"""
+	surveys = Survey.objects.all() if survey_ids is None else Survey.objects.filter(pk__in=list(survey_ids))
+	open_slots = Coalesce(Subquery(
+		_open_responses(timezone.now()).filter(survey=OuterRef('pk')).order_by()
+		.values('survey').annotate(total=Count('pk')).values('total')
+	), 0)
+	changed = list(surveys.annotate(open_slots=open_slots).exclude(used_slots=F('open_slots')).values_list('pk', flat=True))
+	if changed:
+		Survey.objects.filter(pk__in=changed).update(used_slots=open_slots)
+	return changed
+
+
+def _take_slot(survey: Survey) -> bool:
+	return bool(Survey.objects.filter(pk=survey.pk, used_slots__lt=F('max_slots')).update(used_slots=F('used_slots') + 1))
+
+
+def reserve_slot(survey: Survey, user) -> Response:
+	"""Take the lowest free slot of a survey and create the user's response in it"""
+	with transaction.atomic():
+		reserved = _take_slot(survey)
+		if not reserved and recount_slots([survey.pk]):
+			# Some slots had expired
+			reserved = _take_slot(survey)
+		if not reserved:
+			raise SlotUnavailable(f'No slots left for "{survey.title}".')
+
+		# Locking read: sees slots committed by concurrent reservations; expired slots can be reused
+		now = timezone.now()
+		taken = set(
+			_open_responses(now).select_for_update().filter(survey=survey).values_list('slot_number', flat=True)
+		)
+		slot_number = next(number for number in count(1) if number not in taken)
+		response = Response.objects.create(
+			survey=survey,
+			user=user,
+			slot_number=slot_number,
+			slot_expires_at=now + timedelta(hours=survey.slot_duration_hours),
+		)
+	survey.refresh_from_db(fields=['used_slots'])
+	return response
@@ -0,0 +1,94 @@
+"""Unique article slug allocation.
+
+All slugs sharing a base are fetched with one ``slug__startswith`` query and
+the lowest free ``-<n>`` suffix is picked in memory, instead of probing
+``base-1``, ``base-2``, … one query at a time. A concurrent save can still
+take the same slug between the read and the insert, so ``save_with_slug``
+retries on the unique-constraint error.
+"""
+import re
+from typing import Callable, Dict, Iterable, List, Set
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Article
+
+FALLBACK_SLUG = 'article'
+SAVE_ATTEMPTS = 3
+# Leave room for a "-<n>" suffix within the column
+MAX_BASE_LENGTH = Article._meta.get_field('slug').max_length - 10
+BASES_PER_QUERY = 100
+
+
+def base_slug(title: str) -> str:
+	return slugify(title or '')[:MAX_BASE_LENGTH].strip('-') or FALLBACK_SLUG
+
+
+def _suffixes(base: str, slugs: Iterable[str]) -> Set[int]:
+	"""Suffix numbers in use for a base; the bare base counts as 0"""
+	pattern = re.compile(rf'^{re.escape(base)}(?:-(\d+))?$')
+	used = set()
+	for slug in slugs:
+		match = pattern.match(slug)
+		if match:
+			used.add(int(match.group(1) or 0))
+	return used
+
+
+def _pick(base: str, used: Set[int]) -> str:
+	if 0 not in used:
+		return base
+	counter = 1
+	while counter in used:
+		counter += 1
+	return f'{base}-{counter}'
+
+
+def _existing(bases: Iterable[str], exclude_pk=None) -> List[str]:
+	condition = Q()
+	for base in bases:
+		condition |= Q(slug__startswith=base)
+	queryset = Article.objects.filter(condition)
+	if exclude_pk is not None:
+		queryset = queryset.exclude(pk=exclude_pk)
+	return list(queryset.values_list('slug', flat=True))
+
+
+def allocate_slug(title: str, exclude_pk=None) -> str:
+	"""A currently free slug for a title, with one query"""
+	base = base_slug(title)
+	return _pick(base, _suffixes(base, _existing([base], exclude_pk)))
+
+
+def allocate_slugs(titles: Dict[int, str]) -> Dict[int, str]:
+	"""Free, mutually distinct slugs for many ``{pk: title}`` at once"""
+	bases = {pk: base_slug(title) for pk, title in titles.items()}
+	distinct = sorted(set(bases.values()))
+	existing = []
+	for start in range(0, len(distinct), BASES_PER_QUERY):
+		existing.extend(_existing(distinct[start:start + BASES_PER_QUERY]))
+
+	used = {base: _suffixes(base, existing) for base in distinct}
+	slugs = {}
+	for pk in sorted(bases):
+		base = bases[pk]
+		slug = _pick(base, used[base])
+		used[base] |= _suffixes(base, [slug])
+		slugs[pk] = slug
+	return slugs
+
+
+def save_with_slug(article: Article, save: Callable[[], None], attempts: int = SAVE_ATTEMPTS) -> None:
+	"""Allocate ``article.slug`` and run ``save``, retrying if another save took the slug first"""
+	for attempt in range(attempts):
+		article.slug = allocate_slug(article.title, exclude_pk=article.pk)
+		try:
+			with transaction.atomic():
+				save()
+			return
+		except IntegrityError:
+			taken = Article.objects.filter(slug=article.slug).exclude(pk=article.pk).exists()
+			if not taken or attempt == attempts - 1:
+				raise
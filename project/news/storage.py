@@ -0,0 +1,44 @@
+"""Content-addressed storage for article images.
+
+Files are named after the SHA-256 of their bytes
+(``articles/3f/3fa4…c2.jpg``), so uploading the same picture again reuses
+the stored file instead of writing ``photo_AbC123.jpg``. Because several
+articles can point at one file, ``news.blobs`` reference-counts them and only
+deletes a file once nothing uses it.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content) -> str:
+	"""SHA-256 hex digest of a Django ``File``, leaving it rewound"""
+	digest = hashlib.sha256()
+	if hasattr(content, 'seek'):
+		content.seek(0)
+	for chunk in content.chunks(HASH_CHUNK_SIZE):
+		digest.update(chunk)
+	if hasattr(content, 'seek'):
+		content.seek(0)
+	return digest.hexdigest()
+
+
+def content_name(name: str, digest: str) -> str:
+	"""Storage name of a blob: the upload directory, a two-character fan-out and the digest"""
+	directory = os.path.dirname(name)
+	extension = os.path.splitext(name)[1].lower()
+	return '/'.join(part for part in (directory, digest[:2], digest + extension) if part)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+	def _save(self, name, content):
+		name = content_name(name, content_hash(content))
+		if self.exists(name):
+			# Same bytes are already stored
+			return name
+		return super()._save(name, content)
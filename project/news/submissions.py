@@ -0,0 +1,90 @@
+"""Survey submission pipeline.
+
+A submission writes all answers with one ``bulk_create`` and all selected
+choices with one insert into the M2M through table, inside a single
+transaction, so its cost does not grow with the number of questions. The
+survey result aggregates are updated in the same transaction.
+"""
+from typing import Iterable, List, Mapping
+
+from django.db import IntegrityError, transaction
+
+from .models import Question, Response, ResponseAnswer
+from .aggregates import apply_response
+from .schema import QuestionSchema, SurveySchema, get_schema
+from .scoring import AnswerRecord, load_answers
+from .slots import SlotExpired, reserve_slot
+
+
+def _selected_choice_ids(value) -> frozenset:
+	"""Normalize a radio (single id) or checkbox (list of ids) value to a set of ints"""
+	if value in (None, ''):
+		return frozenset()
+	if not isinstance(value, (list, tuple)):
+		value = [value]
+	return frozenset(int(choice_id) for choice_id in value)
+
+
+def build_answer_records(questions: Iterable[QuestionSchema], cleaned_data: Mapping) -> List[AnswerRecord]:
+	"""Turn cleaned form data into one answer record per question"""
+	records = []
+	for question in questions:
+		value = cleaned_data.get(question.field_name)
+		if question.question_type == Question.TEXT:
+			records.append(AnswerRecord(question.id, value or '', frozenset()))
+		else:
+			records.append(AnswerRecord(question.id, '', _selected_choice_ids(value)))
+	return records
+
+
+def submit_response(survey, user, cleaned_data: Mapping, schema: SurveySchema = None) -> Response:
+	"""Store (or replace) a user's answers to a survey and score them
+
+	Raises ``SlotUnavailable`` when a new respondent finds no free slot and
+	``SlotExpired`` when an existing respondent's slot has run out.
+	"""
+	if schema is None:
+		schema = get_schema(survey.pk)
+	records = build_answer_records(schema.questions, cleaned_data)
+	through = ResponseAnswer.selected_choices.through
+
+	with transaction.atomic():
+		response = Response.objects.filter(survey=survey, user=user).first()
+		created = response is None
+		if created:
+			try:
+				response = reserve_slot(survey, user)
+			except IntegrityError:
+				# A concurrent submit by the same user (a double click) created the response first;
+				# replace its answers like any resubmission. A locking read sees that committed row.
+				response = Response.objects.select_for_update().get(survey=survey, user=user)
+				created = False
+		if not created:
+			if not response.slot_is_open:
+				raise SlotExpired(f'Your slot for "{survey.title}" has expired.')
+			# Take the previous answers out of the result aggregates before replacing them
+			apply_response(survey.pk, response.score, load_answers([response.pk]).get(response.pk, []), sign=-1)
+			through.objects.filter(responseanswer__response=response).delete()
+			ResponseAnswer.objects.filter(response=response).delete()
+
+		answers = ResponseAnswer.objects.bulk_create([
+			ResponseAnswer(response=response, question_id=record.question_id, answer_text=record.answer_text)
+			for record in records
+		])
+
+		if any(record.selected_choices for record in records):
+			if any(answer.pk is None for answer in answers):
+				# Backends such as MySQL do not return primary keys from bulk inserts
+				answer_ids = dict(ResponseAnswer.objects.filter(response=response).values_list('question_id', 'id'))
+			else:
+				answer_ids = {answer.question_id: answer.pk for answer in answers}
+			through.objects.bulk_create([
+				through(responseanswer_id=answer_ids[record.question_id], questionchoice_id=choice_id)
+				for record in records
+				for choice_id in record.selected_choices
+			])
+
+		response.score, response.max_possible_score = schema.answer_key().score(records)
+		response.save(update_fields=['score', 'max_possible_score'])
+		apply_response(survey.pk, response.score, records)
+	return response
@@ -0,0 +1,136 @@
+"""Normalized article tags and categories.
+
+``Article.tags`` and ``Article.category`` stay the editable source; on save
+they are mirrored into the ``Tag``/``Category`` tables so tag and category
+pages run on indexed joins. ``article_count`` on both is recomputed for the
+rows an article save or delete touched.
+
+Slugs keep non-Latin letters. A name that slugifying would lose characters of
+("C++", "#!") gets a short hash of the name appended, so it neither merges
+with another tag ("C") nor disappears.
+"""
+import hashlib
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+from .models import Article, Category, Tag
+
+SLUG_LENGTH = 100
+HASH_LENGTH = 8
+
+
+def name_slug(name: str) -> str:
+	"""The slug of a tag or category name; ``''`` only for a blank name"""
+	# What slugify() keeps of a name that loses nothing: case and runs of spaces and dashes aside
+	folded = re.sub(r'[-\s]+', '-', unicodedata.normalize('NFKC', name or '').lower()).strip('-_')
+	if not folded:
+		return ''
+	slug = slugify(name, allow_unicode=True)
+	if slug == folded and len(slug) <= SLUG_LENGTH:
+		return slug
+	digest = hashlib.md5(folded.encode(), usedforsecurity=False).hexdigest()[:HASH_LENGTH]
+	return '-'.join(filter(None, [slug[:SLUG_LENGTH - HASH_LENGTH - 1].strip('-_'), digest]))
+
+
+def parse_tags(raw: str) -> List[str]:
+	"""Split a free-form tag string ("#ai; python, Tech") into unique tag names"""
+	names = []
+	seen = set()
+	for name in (raw or '').replace('#', '').replace(';', ',').split(','):
+		name = name.strip()
+		slug = name_slug(name)
+		if slug and slug not in seen:
+			seen.add(slug)
+			names.append(name)
+	return names
+
+
+def _get_or_create_by_slug(model, names: Iterable[str]) -> Dict[str, object]:
+	"""Fetch rows by slug, creating the missing ones; returns ``{slug: row}``"""
+	wanted = {name_slug(name): name[:100] for name in names}
+	wanted.pop('', None)
+	if not wanted:
+		return {}
+	existing = {row.slug: row for row in model.objects.filter(slug__in=wanted)}
+	missing = [model(name=name, slug=slug) for slug, name in wanted.items() if slug not in existing]
+	if missing:
+		# Names may collide with a differently-slugged row, or a concurrent save may win the race
+		model.objects.bulk_create(missing, ignore_conflicts=True)
+		existing = {row.slug: row for row in model.objects.filter(slug__in=wanted)}
+	return existing
+
+
+def resolve_category(name: str) -> Optional[Category]:
+	return _get_or_create_by_slug(Category, [name]).get(name_slug(name))
+
+
+def sync_article_tags(article: Article) -> None:
+	"""Point ``article.tag_refs`` at the tags parsed from ``article.tags``"""
+	through = Article.tag_refs.through
+	tags = _get_or_create_by_slug(Tag, parse_tags(article.tags))
+	new_ids = {tag.pk for tag in tags.values()}
+	old_ids = set(through.objects.filter(article_id=article.pk).values_list('tag_id', flat=True))
+
+	removed = old_ids - new_ids
+	added = new_ids - old_ids
+	if removed:
+		through.objects.filter(article_id=article.pk, tag_id__in=removed).delete()
+	if added:
+		through.objects.bulk_create(
+			[through(article_id=article.pk, tag_id=tag_id) for tag_id in added], ignore_conflicts=True
+		)
+	refresh_tag_counts(removed | added)
+
+
+def resolve_categories(articles: Sequence[Article]) -> None:
+	"""Point ``category_ref`` of many unsaved articles at their categories with one lookup"""
+	categories = _get_or_create_by_slug(Category, dict.fromkeys(article.category for article in articles))
+	for article in articles:
+		article.category_ref = categories.get(name_slug(article.category))
+
+
+def link_tags(articles: Sequence[Article]) -> None:
+	"""Create the ``tag_refs`` of newly inserted articles in one insert and refresh the counts"""
+	names = {article.pk: parse_tags(article.tags) for article in articles}
+	tags = _get_or_create_by_slug(Tag, dict.fromkeys(name for article_names in names.values() for name in article_names))
+	through = Article.tag_refs.through
+	rows = [
+		through(article_id=pk, tag_id=tags[name_slug(name)].pk)
+		for pk, article_names in names.items()
+		for name in article_names
+		if name_slug(name) in tags
+	]
+	through.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+	refresh_tag_counts({row.tag_id for row in rows})
+	refresh_category_counts({article.category_ref_id for article in articles})
+
+
+def refresh_tag_counts(tag_ids: Iterable[int]) -> None:
+	tag_ids = [pk for pk in tag_ids if pk is not None]
+	if not tag_ids:
+		return
+	counts = (
+		Article.tag_refs.through.objects.filter(tag_id=OuterRef('pk'))
+		.order_by().values('tag_id').annotate(total=Count('*')).values('total')
+	)
+	Tag.objects.filter(pk__in=tag_ids).update(
+		article_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+	)
+
+
+def refresh_category_counts(category_ids: Iterable[int]) -> None:
+	category_ids = [pk for pk in category_ids if pk is not None]
+	if not category_ids:
+		return
+	counts = (
+		Article.objects.filter(category_ref=OuterRef('pk'))
+		.order_by().values('category_ref').annotate(total=Count('*')).values('total')
+	)
+	Category.objects.filter(pk__in=category_ids).update(
+		article_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+	)
@@ -0,0 +1,38 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from news.images import pick
+
+register = template.Library()
+
+
+def _srcset(variants) -> str:
+	return ', '.join(f"{default_storage.url(variant['name'])} {variant['width']}w" for variant in variants)
+
+
+@register.simple_tag
+def article_picture(article, sizes='100vw', css_class='', alt=None):
+	"""``<picture>`` with WebP and JPEG ``srcset`` for an article image, or a plain ``<img>`` until variants exist"""
+	if not article.image:
+		return ''
+	alt = article.title if alt is None else alt
+	variants = article.image_variants or {}
+	webp, jpeg = pick(variants, 'webp'), pick(variants, 'jpeg')
+	if not jpeg:
+		return format_html('<img src="{}" class="{}" alt="{}" loading="lazy" decoding="async">', article.image.url, css_class, alt)
+	return format_html(
+		'<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" loading="lazy" decoding="async"></picture>',
+		format_html_join('', '<source type="image/webp" srcset="{}" sizes="{}">', [(_srcset(webp), sizes)] if webp else []),
+		default_storage.url(jpeg[0]['name']), _srcset(jpeg), sizes,
+		variants['width'], variants['height'], css_class, alt,
+	)
+
+
+@register.simple_tag
+def article_image_url(article, width=1280):
+	"""URL of the largest JPEG variant no wider than ``width`` (the original until variants exist)"""
+	if not article.image:
+		return ''
+	variants = pick(article.image_variants, 'jpeg', width)
+	return default_storage.url(variants[-1]['name']) if variants else article.image.url
@@ -0,0 +1,833 @@
+import csv
+import io
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+
+from . import async_views, blobs, urls as news_urls
+from .aggregates import rebuild_survey_stats
+from .blobs import DedupeReport, deduplicate_media, recount
+from .budgets import (
+	ANONYMOUS, QUERY_BUDGETS, SAMPLE_ARGUMENTS, SUPERUSER, VIP, Budget, QueryBudgetExceeded, assert_max_queries,
+	audience_users, check_budget,
+)
+from .cards import attach_card_versions
+from .exports import CSV_HEADER, csv_lines, iter_responses, ndjson_lines
+from .imports import import_articles, read_checkpoint
+from .models import (
+	Article, ArticleDailyCount, Category, ChoiceStats, MediaBlob, Profile, Question, QuestionStats, RelatedArticle,
+	Response, ResponseAnswer, ScoreCount, Survey, SurveyStats, Tag,
+)
+from .pagination import InvalidCursor, KeysetPaginator
+from .principal import load_principal
+from .related import is_available as related_available, rebuild_related, refresh_related
+from .replicas import PIN_KEY, PRIMARY, ReplicaPinningMiddleware, ReplicaRouter
+from .schema import get_schema
+from .scoring import score_responses
+from .search import rebuild_search_index, search_articles
+from .seeding import seed
+from .slots import SlotExpired, SlotUnavailable, recount_slots, reserve_slot
+from .slugs import FALLBACK_SLUG, allocate_slug, allocate_slugs
+from .storage import content_hash, content_name
+from .submissions import submit_response
+from .view_counts import flush_views, pending_views, record_view
+
+
+class SeededTestCase(TestCase):
+	"""A small benchmark dataset: a superuser, VIPs, articles and answered surveys"""
+
+	@classmethod
+	def setUpTestData(cls):
+		seed(articles=40, surveys=3, questions=4, choices=3, vips=6, responses=4)
+		cls.users = audience_users()
+
+	def client_for(self, audience: str) -> Client:
+		client = Client()
+		if self.users[audience] is not None:
+			client.force_login(self.users[audience])
+		return client
+
+
+class QueryBudgetTests(SeededTestCase):
+	def test_pages_are_within_their_budgets(self):
+		for budget in QUERY_BUDGETS:
+			with self.subTest(page=budget.url_name, audience=budget.audience):
+				sample = SAMPLE_ARGUMENTS.get(budget.url_name)
+				kwargs = sample() if sample else None
+				if sample:
+					self.assertIsNotNone(kwargs, 'the seeded data has nothing to request')
+				queries = check_budget(self.client_for(budget.audience), budget, kwargs)
+				self.assertLessEqual(queries, budget.max_queries)
+
+	def test_over_budget_fails_with_the_queries(self):
+		with self.assertRaisesMessage(QueryBudgetExceeded, 'news:home (anonymous) ran'):
+			check_budget(self.client_for(ANONYMOUS), Budget('news:home', ANONYMOUS, 1))
+
+	def test_assert_max_queries(self):
+		with assert_max_queries(1):
+			User.objects.count()
+		with self.assertRaises(QueryBudgetExceeded):
+			with assert_max_queries(1):
+				User.objects.count()
+				User.objects.count()
+
+
+@skipUnless(settings.NEWS_READ_REPLICAS, 'no read replica is configured')
+class ReplicaQueryBudgetTests(TestCase):
+	databases = {'default', *settings.NEWS_READ_REPLICAS}
+
+	def test_replica_reads_count(self):
+		replica = settings.NEWS_READ_REPLICAS[0]
+		with self.assertRaisesMessage(QueryBudgetExceeded, f'ran 2 queries, budget is 1:\n  [{PRIMARY}]'):
+			with assert_max_queries(1):
+				User.objects.using(PRIMARY).count()
+				User.objects.using(replica).count()
+
+
+class ServerTimingTests(SeededTestCase):
+	def test_hidden_from_visitors(self):
+		self.assertNotIn('Server-Timing', self.client_for(ANONYMOUS).get('/').headers)
+
+	def test_shown_to_staff(self):
+		self.assertIn('queries', self.client_for(SUPERUSER).get('/').headers['Server-Timing'])
+
+	@override_settings(DEBUG=True)
+	def test_shown_in_debug(self):
+		self.assertIn('Server-Timing', self.client_for(ANONYMOUS).get('/').headers)
+
+
+def legacy_score(response):
+	"""``Response.calculate_score`` as it was before set-based scoring (``news.scoring``), without the save"""
+	total_score = 0
+	max_score = 0
+	for answer in response.answers.all():
+		question = answer.question
+		max_score += question.points
+		if question.question_type == 'text':
+			if answer.answer_text.strip().lower() == question.correct_answer.strip().lower():
+				total_score += question.points
+		else:
+			correct_choices = question.choices.filter(is_correct=True)
+			selected_choices = answer.selected_choices.all()
+			if correct_choices.count() == selected_choices.count():
+				if all(choice in correct_choices for choice in selected_choices):
+					total_score += question.points
+	return total_score, max_score
+
+
+class ScoringTests(SeededTestCase):
+	def test_seeded_responses_score_as_before(self):
+		for survey in Survey.objects.all():
+			responses = list(Response.objects.filter(survey=survey))
+			self.assertTrue(responses)
+			for response in score_responses(responses):
+				self.assertEqual((response.score, response.max_possible_score), legacy_score(response))
+
+	def test_submission_scores_as_before(self):
+		survey = Survey.objects.order_by('pk').first()
+		cleaned_data = {}
+		for question in get_schema(survey.pk).questions:
+			correct = sorted(question.correct_choices)
+			if question.question_type == Question.TEXT:
+				# Case and surrounding spaces do not matter
+				cleaned_data[question.field_name] = f'  {question.correct_answer.upper()} '
+			elif question.question_type == Question.RADIO:
+				cleaned_data[question.field_name] = str(correct[0])
+			else:
+				# One choice too many is wrong
+				wrong = [choice.id for choice in question.choices if not choice.is_correct]
+				cleaned_data[question.field_name] = [str(pk) for pk in correct + wrong[:1]]
+		response = submit_response(survey, self.users[VIP], cleaned_data)
+		self.assertGreater(response.score, 0)
+		self.assertEqual((response.score, response.max_possible_score), legacy_score(response))
+		self.assertEqual(response.calculate_score(), legacy_score(response)[0])
+
+
+class KeysetPaginationTests(SeededTestCase):
+	def walk(self, per_page):
+		paginator = KeysetPaginator(Article.objects.all(), per_page)
+		pages, cursor = [], None
+		while True:
+			page = paginator.page(cursor)
+			pages.append([article.pk for article in page])
+			if not page.has_next():
+				return pages
+			cursor = page.next_cursor
+
+	def test_pages_cover_every_article_once(self):
+		# Ties on published_at are broken by id, across page boundaries too
+		tied = list(Article.objects.order_by('pk').values_list('pk', flat=True)[:10])
+		Article.objects.filter(pk__in=tied).update(published_at=datetime(2025, 6, 1, tzinfo=dt_timezone.utc))
+		expected = list(Article.objects.order_by('-published_at', '-id').values_list('pk', flat=True))
+		for per_page in (1, 3, 7, len(expected) - 1, len(expected), len(expected) + 1):
+			with self.subTest(per_page=per_page):
+				pages = self.walk(per_page)
+				self.assertEqual([pk for page in pages for pk in page], expected)
+				self.assertTrue(all(len(page) == per_page for page in pages[:-1]))
+				# An exact multiple ends on a full page, not on an empty one
+				self.assertEqual(len(pages[-1]), len(expected) - per_page * (len(pages) - 1))
+				self.assertTrue(pages[-1])
+
+	def test_invalid_cursor(self):
+		with self.assertRaises(InvalidCursor):
+			KeysetPaginator(Article.objects.all(), 5).page('not-a-cursor')
+		self.assertEqual(self.client.get('/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+class ConditionalGetTests(SeededTestCase):
+	def setUp(self):
+		self.article = Article.objects.order_by('pk').first()
+		self.url = f'/article/{self.article.slug}/'
+
+	def test_home_answers_matching_etag_with_304(self):
+		client = self.client_for(ANONYMOUS)
+		etag = client.get('/').headers['ETag']
+		self.assertEqual(client.get('/', headers={'if-none-match': etag}).status_code, 304)
+		Article.objects.order_by('-published_at').first().save()
+		self.assertEqual(client.get('/', headers={'if-none-match': etag}).status_code, 200)
+
+	def test_home_validators_depend_on_the_viewer(self):
+		etag = self.client_for(ANONYMOUS).get('/').headers['ETag']
+		response = self.client_for(SUPERUSER).get('/', headers={'if-none-match': etag})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('private', response.headers['Cache-Control'])
+
+	def test_article_answers_304_and_counts_the_view(self):
+		client = self.client_for(ANONYMOUS)
+		first = client.get(self.url)
+		views = pending_views(self.article.pk)
+		self.assertEqual(client.get(self.url, headers={'if-none-match': first.headers['ETag']}).status_code, 304)
+		modified = client.get(self.url, headers={'if-modified-since': first.headers['Last-Modified']})
+		self.assertEqual(modified.status_code, 304)
+		self.assertEqual(pending_views(self.article.pk), views + 2)
+
+	def test_article_change_is_sent_again(self):
+		client = self.client_for(ANONYMOUS)
+		etag = client.get(self.url).headers['ETag']
+		self.article.title = 'A new headline'
+		self.article.save()
+		response = client.get(self.url, headers={'if-none-match': etag})
+		self.assertEqual(response.status_code, 200)
+		self.assertContains(response, 'A new headline')
+
+	def test_unknown_article(self):
+		self.assertEqual(self.client.get('/article/no-such-article/').status_code, 404)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncConditionalGetTests(SeededTestCase):
+	async def test_home(self):
+		self.assertIs(resolve('/').func, async_views.home)
+		client = AsyncClient()
+		etag = (await client.get('/')).headers['ETag']
+		self.assertEqual((await client.get('/', headers={'if-none-match': etag})).status_code, 304)
+
+	async def test_article(self):
+		article = await Article.objects.order_by('pk').afirst()
+		client = AsyncClient()
+		first = await client.get(f'/article/{article.slug}/')
+		self.assertEqual(first.status_code, 200)
+		response = await client.get(f'/article/{article.slug}/', headers={'if-none-match': first.headers['ETag']})
+		self.assertEqual(response.status_code, 304)
+		self.assertEqual((await client.get('/article/no-such-article/')).status_code, 404)
+
+
+@override_settings(NEWS_READ_REPLICAS=['replica'])
+@mock.patch('news.replicas._usable', return_value=True)
+class ReplicaPinningTests(SimpleTestCase):
+	def setUp(self):
+		self.session = SessionStore()
+
+	def request(self, method, writes=False):
+		"""Run a request through the middleware and return where its view read from"""
+		def view(request):
+			if writes:
+				ReplicaRouter().db_for_write(Article)
+			view.read_from = ReplicaRouter().db_for_read(Article)
+			return HttpResponse()
+
+		request = getattr(RequestFactory(), method)('/')
+		request.session = self.session
+		ReplicaPinningMiddleware(view)(request)
+		return view.read_from
+
+	async def arequest(self, method, writes=False):
+		async def view(request):
+			if writes:
+				ReplicaRouter().db_for_write(Article)
+			view.read_from = ReplicaRouter().db_for_read(Article)
+			return HttpResponse()
+
+		request = getattr(RequestFactory(), method)('/')
+		request.session = self.session
+		await ReplicaPinningMiddleware(view)(request)
+		return view.read_from
+
+	def test_reads_go_to_the_replica(self, usable):
+		self.assertEqual(self.request('get'), 'replica')
+
+	def test_writing_post_pins_the_session(self, usable):
+		self.request('post', writes=True)
+		self.assertGreater(self.session[PIN_KEY], time.time())
+		self.assertEqual(self.request('get'), PRIMARY)
+		self.session[PIN_KEY] = time.time() - 1
+		self.assertEqual(self.request('get'), 'replica')
+
+	def test_reads_after_a_write_use_the_primary(self, usable):
+		self.assertEqual(self.request('get', writes=True), PRIMARY)
+
+	def test_safe_or_read_only_requests_do_not_pin(self, usable):
+		self.request('get', writes=True)
+		self.request('post')
+		self.assertNotIn(PIN_KEY, self.session)
+
+	async def test_async_post_pins_the_session(self, usable):
+		await self.arequest('post', writes=True)
+		self.assertEqual(await self.arequest('get'), PRIMARY)
+
+
+class ImportTests(TestCase):
+	JSONL = (
+		'{"title": "Zeppelin routes return", "content": "Airships are back over the lakes.", "author": "Ada Park",'
+		' "category": "Science", "tags": "Transport, Travel", "published_at": "2025-03-04T10:00:00Z", "slug": "zeppelins"}\n'
+		'{"title": "No author", "content": "This row is invalid."}\n'
+		'not json\n'
+		'{"title": "Quiet harbour", "content": "Nothing happened today.", "author": "Ben Ode", "published_at": "2025-03-04"}\n'
+	)
+	CSV = 'title,content,author,tags\r\nCSV import works,Spreadsheets are sources too.,Cy Row,Data\r\n'
+
+	def test_round_trip(self):
+		before = ArticleDailyCount.objects.filter(day='2025-03-04').values_list('count', flat=True).first() or 0
+		progress = import_articles(io.StringIO(self.JSONL), batch_size=1, checkpoint='feed.jsonl')
+		self.assertEqual((progress.rows, progress.imported, progress.last_row), (4, 2, 4))
+		self.assertEqual([error.row for error in progress.errors], [2, 3])
+		self.assertEqual(read_checkpoint('feed.jsonl'), 4)
+
+		article = Article.objects.get(slug='zeppelins')
+		self.assertEqual((article.author, article.category_ref.name), ('Ada Park', 'Science'))
+		self.assertEqual(sorted(article.tag_refs.values_list('name', flat=True)), ['Transport', 'Travel'])
+		self.assertEqual(Article.objects.get(title='Quiet harbour').category, 'General')
+		self.assertEqual(ArticleDailyCount.objects.get(day='2025-03-04').count, before + 2)
+		self.assertContains(self.client.get('/article/zeppelins/'), 'Airships are back over the lakes.')
+
+		# Resuming from the checkpoint imports nothing twice
+		resumed = import_articles(io.StringIO(self.JSONL), start_after=read_checkpoint('feed.jsonl'), checkpoint='feed.jsonl')
+		self.assertEqual(resumed.imported, 0)
+		self.assertEqual(Article.objects.filter(title='Zeppelin routes return').count(), 1)
+
+	def test_checkpoint_is_committed_with_its_batch(self):
+		from .search import index_articles
+
+		# The second batch fails after its insert: neither it nor its checkpoint may be kept
+		failing = mock.patch('news.search.index_articles', side_effect=[index_articles, RuntimeError('disk full')])
+		with failing, self.assertRaises(RuntimeError):
+			import_articles(io.StringIO(self.JSONL), batch_size=1, checkpoint='feed.jsonl')
+		self.assertEqual(list(Article.objects.values_list('slug', flat=True)), ['zeppelins'])
+		self.assertEqual(read_checkpoint('feed.jsonl'), 1)
+
+		import_articles(io.StringIO(self.JSONL), start_after=read_checkpoint('feed.jsonl'), checkpoint='feed.jsonl')
+		self.assertEqual(sorted(Article.objects.values_list('title', flat=True)), ['Quiet harbour', 'Zeppelin routes return'])
+
+	def test_csv(self):
+		progress = import_articles(io.StringIO(self.CSV), fmt='csv')
+		self.assertEqual(progress.imported, 1)
+		self.assertEqual(Article.objects.get().slug, 'csv-import-works')
+
+
+class PrincipalTests(SeededTestCase):
+	def setUp(self):
+		self.vip = self.users[VIP]
+		self.session = SessionStore()
+
+	def principal(self):
+		request = RequestFactory().get('/')
+		request.user, request.session = self.vip, self.session
+		return load_principal(request)
+
+	def test_claim_is_cached_in_the_session(self):
+		self.assertTrue(self.principal().is_vip)
+		with self.assertNumQueries(0):
+			self.assertTrue(self.principal().is_vip)
+
+	def test_profile_change_invalidates_the_claim(self):
+		self.assertTrue(self.principal().is_vip)
+		with self.captureOnCommitCallbacks(execute=True):
+			profile = Profile.objects.get(user=self.vip)
+			profile.is_vip = False
+			profile.save()
+		self.assertFalse(self.principal().is_vip)
+
+	def test_claim_expires_where_the_invalidation_is_not_seen(self):
+		self.assertTrue(self.principal().is_vip)
+		# Revoked by another process: no signal reaches this process's cache
+		Profile.objects.filter(user=self.vip).update(is_vip=False)
+		self.assertTrue(self.principal().is_vip)
+		later = time.time() + settings.NEWS_PRINCIPAL_CLAIM_SECONDS + 1
+		with mock.patch('news.principal.time.time', return_value=later):
+			self.assertFalse(self.principal().is_vip)
+
+
+class TaxonomyTests(TestCase):
+	def article(self, tags, category='General', title='Tagged story'):
+		return Article.objects.create(title=title, content='Body', author='Desk', tags=tags, category=category)
+
+	def tags_of(self, article):
+		return sorted(article.tag_refs.values_list('name', flat=True))
+
+	def test_no_tag_is_dropped_or_merged(self):
+		article = self.article('C, C++, #c++; 新闻, Новости, #!')
+		# '#' starts a hashtag, so '#!' is the tag '!'
+		self.assertEqual(self.tags_of(article), ['!', 'C', 'C++', 'Новости', '新闻'])
+		self.assertEqual(Tag.objects.get(name='C').slug, 'c')
+		self.assertNotEqual(Tag.objects.get(name='C++').slug, 'c')
+		self.assertEqual(Tag.objects.get(name='新闻').slug, '新闻')
+
+	def test_unicode_tags_and_categories_are_shown_and_linked(self):
+		article = self.article('新闻', category='Новости')
+		self.assertEqual(article.category_ref.slug, 'новости')
+		page = self.client.get(f'/article/{article.slug}/')
+		self.assertContains(page, '#新闻')
+		self.assertContains(page, reverse('news:category_articles', args=['новости']))
+		self.assertContains(self.client.get(reverse('news:tag_articles', args=['新闻'])), 'Tagged story')
+
+	def test_counts_follow_edits_and_deletes(self):
+		article = self.article('AI, Space', category='Science')
+		self.article('ai', category='Science', title='Another')
+		self.assertEqual(Tag.objects.get(slug='ai').article_count, 2)
+		self.assertEqual(Category.objects.get(slug='science').article_count, 2)
+		article.tags = 'Space'
+		article.category = 'Culture'
+		article.save()
+		self.assertEqual(Tag.objects.get(slug='ai').article_count, 1)
+		self.assertEqual(Category.objects.get(slug='science').article_count, 1)
+		article.delete()
+		self.assertEqual(Tag.objects.get(slug='space').article_count, 0)
+		self.assertEqual(Category.objects.get(slug='culture').article_count, 0)
+
+
+def cleaned_answers(schema, correct=True):
+	"""Form data answering every question of a survey, all right or all wrong"""
+	cleaned_data = {}
+	for question in schema.questions:
+		right = sorted(question.correct_choices)
+		wrong = [choice.id for choice in question.choices if not choice.is_correct]
+		if question.question_type == Question.TEXT:
+			cleaned_data[question.field_name] = question.correct_answer if correct else 'no idea'
+		elif question.question_type == Question.RADIO:
+			cleaned_data[question.field_name] = str((right if correct else wrong or right)[0])
+		else:
+			cleaned_data[question.field_name] = [str(pk) for pk in (right if correct else wrong)]
+	return cleaned_data
+
+
+def make_vip(username):
+	user = User.objects.create(username=username)
+	user.profile.is_vip = True
+	user.profile.save()
+	return user
+
+
+class SlotTests(SeededTestCase):
+	def setUp(self):
+		# The seeded slots expired long ago
+		recount_slots()
+		self.survey = Survey.objects.order_by('pk').first()
+		self.answers = cleaned_answers(get_schema(self.survey.pk))
+
+	def test_double_submit_takes_one_slot(self):
+		vip = self.users[VIP]
+
+		def reserved_by_the_other_submit(survey, user):
+			# The other request of a double click reserves the slot first, then this insert collides
+			reserve_slot(survey, user)
+			raise IntegrityError('UNIQUE constraint failed: news_response.survey_id, news_response.user_id')
+
+		with mock.patch('news.submissions.reserve_slot', side_effect=reserved_by_the_other_submit):
+			response = submit_response(self.survey, vip, self.answers)
+		submit_response(self.survey, vip, cleaned_answers(get_schema(self.survey.pk), correct=False))
+		self.assertEqual(list(Response.objects.filter(survey=self.survey, user=vip)), [response])
+		self.survey.refresh_from_db()
+		self.assertEqual(self.survey.used_slots, 1)
+		self.assertEqual(recount_slots(), [])
+
+	def test_expired_slots_are_reused(self):
+		survey = Survey.objects.create(title='One seat', description='', max_slots=1, slot_duration_hours=1)
+		first, second = make_vip('first-vip'), make_vip('second-vip')
+		self.assertEqual(reserve_slot(survey, first).slot_number, 1)
+		with self.assertRaises(SlotUnavailable):
+			reserve_slot(survey, second)
+
+		Response.objects.filter(survey=survey, user=first).update(slot_expires_at=timezone.now() - timedelta(seconds=1))
+		self.assertEqual(reserve_slot(survey, second).slot_number, 1)
+		self.assertEqual(survey.used_slots, 1)
+		self.assertEqual(recount_slots(), [])
+		with self.assertRaises(SlotExpired):
+			submit_response(survey, first, {})
+
+	def test_deleted_responses_give_their_slots_back(self):
+		for number in range(3):
+			submit_response(self.survey, make_vip(f'vip-{number}'), self.answers)
+		with self.captureOnCommitCallbacks(execute=True):
+			Response.objects.filter(survey=self.survey, user__username='vip-0').delete()
+		self.survey.refresh_from_db()
+		self.assertEqual(self.survey.used_slots, 2)
+		self.assertEqual(recount_slots(), [])
+
+
+class SurveyStatsTests(SeededTestCase):
+	def stats(self, survey):
+		"""The aggregates of a survey, leaving out rows that were counted down to zero"""
+		return (
+			list(SurveyStats.objects.filter(survey=survey).values_list('response_count', 'score_total')),
+			list(ScoreCount.objects.filter(survey=survey, count__gt=0).order_by('score').values_list('score', 'count')),
+			list(
+				QuestionStats.objects.filter(question__survey=survey).exclude(answer_count=0, text_answer_count=0)
+				.order_by('question_id').values_list('question_id', 'answer_count', 'text_answer_count')
+			),
+			list(
+				ChoiceStats.objects.filter(choice__question__survey=survey, selected_count__gt=0)
+				.order_by('choice_id').values_list('choice_id', 'selected_count')
+			),
+		)
+
+	def test_incremental_aggregates_match_a_rebuild(self):
+		survey = Survey.objects.order_by('pk').first()
+		schema = get_schema(survey.pk)
+		rebuild_survey_stats([survey.pk])
+		responses = SurveyStats.objects.get(survey=survey).response_count
+
+		submit_response(survey, self.users[VIP], cleaned_answers(schema))
+		late = make_vip('late-vip')
+		submit_response(survey, late, cleaned_answers(schema))
+		# A resubmission takes the previous answers out again
+		submit_response(survey, late, cleaned_answers(schema, correct=False))
+		with self.captureOnCommitCallbacks(execute=True):
+			Response.objects.filter(survey=survey).exclude(user__in=[late, self.users[VIP]]).first().delete()
+
+		incremental = self.stats(survey)
+		self.assertEqual(incremental[0][0][0], responses + 1)
+		rebuild_survey_stats([survey.pk])
+		self.assertEqual(self.stats(survey), incremental)
+
+
+class ExportTests(SeededTestCase):
+	def setUp(self):
+		self.survey = Survey.objects.order_by('pk').first()
+
+	def test_csv_has_one_row_per_answer(self):
+		rows = list(csv.reader(io.StringIO(''.join(csv_lines(self.survey)))))
+		self.assertEqual(tuple(rows[0]), CSV_HEADER)
+		self.assertEqual(len(rows) - 1, ResponseAnswer.objects.filter(response__survey=self.survey).count())
+		answered = {(int(row[0]), int(row[5])) for row in rows[1:]}
+		self.assertEqual(answered, set(
+			ResponseAnswer.objects.filter(response__survey=self.survey).values_list('response_id', 'question_id')
+		))
+
+	def test_ndjson_has_one_object_per_response(self):
+		lines = list(ndjson_lines(self.survey))
+		responses = [json.loads(line) for line in lines]
+		self.assertTrue(all(line.endswith('\n') for line in lines))
+		self.assertEqual(
+			[(response['response_id'], response['score']) for response in responses],
+			list(Response.objects.filter(survey=self.survey).order_by('pk').values_list('pk', 'score')),
+		)
+		for response in responses:
+			self.assertEqual(len(response['answers']), ResponseAnswer.objects.filter(response_id=response['response_id']).count())
+
+	def test_batches_are_read_with_a_fixed_number_of_queries(self):
+		everything = list(iter_responses(self.survey))
+		# Questions and choices, three queries per batch and one finding no more responses
+		with self.assertNumQueries(2 + 3 * len(everything) + 1):
+			self.assertEqual(list(iter_responses(self.survey, batch_size=1)), everything)
+
+
+class ViewCountTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.read = Article.objects.create(title='Read twice', content='Body', author='Desk', views=5)
+		self.once = Article.objects.create(title='Read once', content='Body', author='Desk')
+
+	def test_views_are_buffered_until_flushed(self):
+		record_view(self.read.pk)
+		record_view(self.read.pk)
+		record_view(self.once.pk)
+		self.assertEqual((pending_views(self.read.pk), pending_views(self.once.pk)), (2, 1))
+		self.assertEqual(Article.objects.get(pk=self.read.pk).views, 5)
+
+		before = attach_card_versions([self.read], 'article')[0].card_version
+		with self.captureOnCommitCallbacks(execute=True):
+			self.assertEqual(flush_views(), 3)
+		self.assertNotEqual(attach_card_versions([self.read], 'article')[0].card_version, before)
+		self.assertEqual(Article.objects.get(pk=self.read.pk).views, 7)
+		self.assertEqual(Article.objects.get(pk=self.once.pk).views, 1)
+		self.assertEqual(pending_views(self.read.pk), 0)
+		self.assertEqual(flush_views(), 0)
+
+		record_view(self.once.pk)
+		self.assertEqual(flush_views(), 1)
+		self.assertEqual(Article.objects.get(pk=self.once.pk).views, 2)
+
+	def test_failed_flush_keeps_the_views(self):
+		record_view(self.read.pk)
+		with mock.patch('news.view_counts.Article.objects.filter', side_effect=RuntimeError('database is locked')):
+			with self.assertRaises(RuntimeError):
+				flush_views()
+		self.assertEqual(flush_views(), 1)
+		self.assertEqual(Article.objects.get(pk=self.read.pk).views, 6)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'the FTS5 index is SQLite only; MySQL indexes committed rows only')
+class SearchTests(TestCase):
+	def setUp(self):
+		self.in_content = Article.objects.create(
+			title='Lake transport', content='A zeppelin was seen over the lake.', author='Desk'
+		)
+		self.in_title = Article.objects.create(title='Zeppelin routes return', content='Airships are back.', author='Desk')
+		Article.objects.create(title='Quiet harbour', content='Nothing happened today.', author='Desk')
+
+	def test_title_matches_rank_first(self):
+		results = search_articles('Zeppelin')
+		self.assertEqual(results.count(), 2)
+		self.assertEqual(results.ids(), [self.in_title.pk, self.in_content.pk])
+		self.assertEqual([article.pk for article in results[1:]], [self.in_content.pk])
+		self.assertGreater(results[0].search_rank, results[1].search_rank)
+		self.assertEqual(search_articles('zeppelin harbour').count(), 0)
+
+	def test_edits_and_rebuilds_are_searchable(self):
+		self.in_title.title = 'Blimp routes return'
+		self.in_title.save()
+		self.assertEqual(search_articles('blimp').ids(), [self.in_title.pk])
+		self.assertEqual(search_articles('zeppelin').ids(), [self.in_content.pk])
+
+		# update() skips the signals, so only a rebuild sees it
+		balloon = 'A balloon was seen over the lake.'
+		Article.objects.filter(pk=self.in_content.pk).update(content=balloon, excerpt=balloon)
+		self.assertEqual(search_articles('balloon').count(), 0)
+		rebuild_search_index()
+		self.assertEqual(search_articles('balloon').ids(), [self.in_content.pk])
+		self.assertEqual(search_articles('zeppelin').count(), 0)
+		self.in_title.delete()
+		self.assertEqual(search_articles('blimp').count(), 0)
+
+	def test_saves_of_unindexed_fields_skip_the_index(self):
+		with mock.patch('news.signals.index_articles') as index:
+			self.in_title.save(update_fields=['views'])
+			index.assert_not_called()
+			self.in_title.save(update_fields=['views', 'excerpt'])
+			index.assert_called_once_with([self.in_title])
+
+
+@skipUnless(related_available(), 'NumPy and SciPy are not installed')
+class RelatedArticleTests(TestCase):
+	def setUp(self):
+		topics = [
+			('Solar battery storage', 'Solar panels charge battery storage through the night.', 'Energy'),
+			('Battery storage for solar farms', 'Farms store solar power in battery banks.', 'Energy'),
+			('Football final tonight', 'The league final kicks off tonight.', 'Football'),
+			('Museum opens new wing', 'Paintings return to the gallery.', 'Culture'),
+			('Court ruling on elections', 'Judges decide about the vote.', 'Elections'),
+			('Rail strike ends', 'Trains run again after talks.', 'Transport'),
+		]
+		self.articles = [
+			Article.objects.create(title=title, content=content, tags=tags, author='Desk') for title, content, tags in topics
+		]
+
+	def neighbors(self):
+		return list(RelatedArticle.objects.order_by('article_id', 'rank').values_list('article_id', 'related_id', 'rank'))
+
+	def test_refresh_matches_a_rebuild(self):
+		solar, farms, football = self.articles[:3]
+		refresh_related([article.pk for article in self.articles])
+		self.assertEqual(list(solar.neighbors.values_list('related_id', flat=True)), [farms.pk])
+		self.assertFalse(football.neighbors.exists())
+
+		# The edited article enters the stored lists of the articles it is now similar to
+		Article.objects.filter(pk=football.pk).update(title='Solar storage at the stadium', tags='Energy')
+		refresh_related([football.pk])
+		self.assertIn(football.pk, solar.neighbors.values_list('related_id', flat=True))
+		refreshed = self.neighbors()
+		rebuild_related()
+		self.assertEqual(self.neighbors(), refreshed)
+
+
+@mock.patch('news.signals.schedule_refresh')
+class CardVersionTests(TestCase):
+	def setUp(self):
+		self.article = Article.objects.create(title='First headline', content='Body', author='Desk')
+
+	def version(self):
+		return attach_card_versions([Article.objects.get(pk=self.article.pk)], 'article')[0].card_version
+
+	def test_version_changes_when_the_save_commits(self, schedule_refresh):
+		before = self.version()
+		self.assertEqual(self.version(), before)
+		with self.captureOnCommitCallbacks() as callbacks:
+			self.article.save()
+		self.assertEqual(self.version(), before)
+		for callback in callbacks:
+			callback()
+		self.assertNotEqual(self.version(), before)
+
+	def test_view_count_is_not_cached_with_the_card(self, schedule_refresh):
+		self.client.get('/')
+		Article.objects.filter(pk=self.article.pk).update(views=1234)
+		self.assertContains(self.client.get('/'), '1234')
+
+	def test_fixed_slugs_invalidate_the_cards(self, schedule_refresh):
+		self.assertNotContains(self.client.get('/'), 'first-headline-1')
+		Article.objects.filter(pk=self.article.pk).update(slug='')
+		Article.objects.create(
+			title='First headline', slug='first-headline', content='Body', author='Desk',
+			published_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc),
+		)
+		with self.captureOnCommitCallbacks(execute=True):
+			call_command('fix_article_slugs', stdout=io.StringIO())
+		self.assertContains(self.client.get('/'), '/article/first-headline-1/')
+
+	def test_edited_card_is_rendered_again(self, schedule_refresh):
+		self.assertContains(self.client.get('/'), 'First headline')
+		with self.captureOnCommitCallbacks(execute=True):
+			self.article.title = 'Second headline'
+			self.article.save()
+		page = self.client.get('/')
+		self.assertContains(page, 'Second headline')
+		self.assertNotContains(page, 'First headline')
+
+
+class SlugTests(TestCase):
+	def article(self, title, slug=''):
+		return Article.objects.create(title=title, slug=slug, content='Body', author='Desk')
+
+	def test_lowest_free_suffix(self):
+		self.assertEqual(self.article('Hello World').slug, 'hello-world')
+		self.article('Hello World', slug='hello-world-2')
+		self.article('Hello World Again', slug='hello-world-again')
+		self.assertEqual(self.article('Hello, world!').slug, 'hello-world-1')
+		self.assertEqual(self.article('Hello World').slug, 'hello-world-3')
+		self.assertEqual(self.article('!!!').slug, FALLBACK_SLUG)
+		self.assertEqual(allocate_slugs({1: 'Hello World', 2: 'Hello World', 3: 'New'}), {
+			1: 'hello-world-4', 2: 'hello-world-5', 3: 'new',
+		})
+
+	def test_slug_taken_between_read_and_insert_is_retried(self):
+		allocate = allocate_slug
+
+		def raced(title, exclude_pk=None):
+			slug = allocate(title, exclude_pk)
+			if not Article.objects.filter(title='Concurrent').exists():
+				# Another request saves the same slug first
+				self.article('Concurrent', slug=slug)
+			return slug
+
+		with mock.patch('news.slugs.allocate_slug', side_effect=raced) as allocations:
+			article = self.article('Breaking news')
+		self.assertEqual(allocations.call_count, 2)
+		self.assertEqual(Article.objects.get(title='Concurrent').slug, 'breaking-news')
+		self.assertEqual(Article.objects.get(pk=article.pk).slug, 'breaking-news-1')
+
+
+@mock.patch('news.signals.schedule_refresh')
+@mock.patch('news.signals.schedule_variants')
+class MediaBlobTests(TestCase):
+	def setUp(self):
+		media = tempfile.TemporaryDirectory()
+		self.addCleanup(media.cleanup)
+		settings_override = override_settings(MEDIA_ROOT=media.name)
+		settings_override.enable()
+		self.addCleanup(settings_override.disable)
+		self.storage = blobs._storage()
+
+	def upload(self, name, content):
+		article = Article(title=name, content='Body', author='Desk')
+		article.image.save(name, ContentFile(content), save=False)
+		article.save()
+		return article
+
+	def test_identical_uploads_share_one_counted_file(self, schedule_variants, schedule_refresh):
+		first, second = self.upload('a.jpg', b'same bytes'), self.upload('b.jpg', b'same bytes')
+		name = first.image.name
+		self.assertEqual(second.image.name, name)
+		self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 2)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			first.delete()
+		self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+		self.assertTrue(self.storage.exists(name))
+		with self.captureOnCommitCallbacks(execute=True):
+			second.delete()
+		self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+		self.assertFalse(self.storage.exists(name))
+
+	def test_dedupe_keeps_one_copy(self, schedule_variants, schedule_refresh):
+		plain = FileSystemStorage()
+		for name, content in [('a.jpg', b'same'), ('b.jpg', b'same'), ('c.jpg', b'same'), ('d.jpg', b'other')]:
+			plain.save(f'articles/{name}', ContentFile(content))
+		for name in ('a.jpg', 'b.jpg'):
+			Article.objects.create(title=name, content='Body', author='Desk', image=f'articles/{name}')
+
+		expected = DedupeReport(files_scanned=4, files_removed=3, articles_updated=2, bytes_reclaimed=2 * len(b'same'))
+		self.assertEqual(deduplicate_media(dry_run=True), expected)
+		self.assertTrue(plain.exists('articles/a.jpg'))
+		before = {article.pk: article.card_version for article in attach_card_versions(Article.objects.all(), 'article')}
+		with self.captureOnCommitCallbacks(execute=True):
+			self.assertEqual(deduplicate_media(), expected)
+		for article in attach_card_versions(Article.objects.all(), 'article'):
+			self.assertNotEqual(article.card_version, before[article.pk])
+
+		kept = content_name('articles/a.jpg', content_hash(ContentFile(b'same')))
+		self.assertEqual(set(Article.objects.values_list('image', flat=True)), {kept})
+		self.assertEqual(list(MediaBlob.objects.values_list('name', 'ref_count')), [(kept, 2)])
+		self.assertEqual(sorted(plain.listdir('articles')[1]), ['d.jpg'])
+		self.assertEqual(recount(), 1)
+
+
+class UserManagementTests(SeededTestCase):
+	def totals(self):
+		return self.client_for(SUPERUSER).get(reverse('news:user_management')).context['totals']
+
+	def expected(self):
+		return {
+			'users': User.objects.count(),
+			'vip': Profile.objects.filter(is_vip=True).count(),
+			'superusers': User.objects.filter(is_superuser=True).count(),
+		}
+
+	def test_totals_follow_the_dashboard_counters(self):
+		cache.clear()
+		self.assertEqual(self.totals(), self.expected())
+		with self.captureOnCommitCallbacks(execute=True):
+			make_vip('new-vip')
+			User.objects.create(username='new-admin', is_superuser=True)
+			self.users[VIP].profile.is_vip = False
+			self.users[VIP].profile.save()
+		self.assertEqual(self.totals(), self.expected())
+		with self.captureOnCommitCallbacks(execute=True):
+			self.users[VIP].is_superuser = True
+			self.users[VIP].save()
+		self.assertEqual(self.totals(), self.expected())
+
+
+# URLconf of AsyncConditionalGetTests: the async home and article views in front of the sync ones
+urlpatterns = [
+	path('', include(([
+		path('', async_views.home, name='home'),
+		path('article/<slug:slug>/', async_views.article_detail, name='article_detail'),
+		*news_urls.urlpatterns,
+	], 'news'))),
+	path('', include('django.contrib.auth.urls')),
+]
@@ -1,19 +1,37 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 app_name = 'news'
 
+if settings.NEWS_ASYNC_VIEWS:
+	home_view, article_detail_view, survey_list_view = (
+		async_views.home, async_views.article_detail, async_views.survey_list
+	)
+else:
+	home_view, article_detail_view, survey_list_view = (
+		views.HomeView.as_view(), views.ArticleDetailView.as_view(), views.SurveyListView.as_view()
+	)
+
 urlpatterns = [
-	path('', views.HomeView.as_view(), name='home'),
+	path('', home_view, name='home'),
+	path('articles/feed/', views.ArticleFeedView.as_view(), name='article_feed'),
+	path('search/', views.search, name='search'),
+	# Tag and category slugs may hold non-Latin letters, which <slug:> does not match
+	path('tag/<str:slug>/', views.TagArticleListView.as_view(), name='tag_articles'),
+	path('category/<str:slug>/', views.CategoryArticleListView.as_view(), name='category_articles'),
 	path('dashboard/', views.SuperuserDashboardView.as_view(), name='superuser_dashboard'),
 	path('profile/', views.profile, name='profile'),
 	path('user-management/', views.user_management, name='user_management'),
+	path('user-management/<int:pk>/responses/', views.user_responses, name='user_responses'),
 	path('survey-results/', views.survey_results, name='survey_results'),
+	path('survey-results/<int:pk>/responses/', views.survey_responses, name='survey_responses'),
+	path('survey-results/<int:pk>/export.<str:fmt>', views.survey_export, name='survey_export'),
 	path('article/create/', views.ArticleCreateView.as_view(), name='article_create'),
-	path('article/<slug:slug>/', views.ArticleDetailView.as_view(), name='article_detail'),
+	path('article/<slug:slug>/', article_detail_view, name='article_detail'),
 	path('article/<slug:slug>/delete/', views.ArticleDeleteView.as_view(), name='article_delete'),
-	path('surveys/', views.SurveyListView.as_view(), name='survey_list'),
+	path('surveys/', survey_list_view, name='survey_list'),
 	path('survey/create/', views.SurveyCreateView.as_view(), name='survey_create'),
 	path('survey/<int:pk>/edit/', views.survey_edit, name='survey_edit'),
 	path('survey/<int:pk>/delete/', views.SurveyDeleteView.as_view(), name='survey_delete'),
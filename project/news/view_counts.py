@@ -0,0 +1,158 @@
+"""Write-behind article view counting.
+
+Page views are added to counters in the Django cache instead of updating
+``Article.views`` on every read. ``flush_views`` moves the buffered
+increments into the database with one ``UPDATE`` per distinct increment,
+either from the ``flush_article_views`` command or from the optional
+background thread started by ``start_flusher``. Only server processes run
+the thread: ``project.wsgi`` and ``project.asgi`` call
+``start_configured_flusher``, while management commands, the shell, tests
+and the autoreloader's parent process never load them.
+
+The command can only see increments buffered by other processes when the
+cache is shared (Redis, Memcached, database cache); with the default
+per-process ``LocMemCache`` rely on the background thread instead.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .cards import bump_card_version
+from .models import Article
+
+logger = logging.getLogger(__name__)
+
+COUNT_KEY = 'news:views:count:{}'
+DIRTY_KEY = 'news:views:dirty:{}'
+INDEX_KEY = 'news:views:index'
+LOCK_KEY = 'news:views:lock'
+
+_flusher = None
+
+
+@contextmanager
+def _index_lock(timeout=5, wait=1.0):
+	"""Best-effort cross-process lock guarding the index of dirty articles"""
+	deadline = time.monotonic() + wait
+	acquired = cache.add(LOCK_KEY, 1, timeout=timeout)
+	while not acquired and time.monotonic() < deadline:
+		time.sleep(0.01)
+		acquired = cache.add(LOCK_KEY, 1, timeout=timeout)
+	try:
+		yield
+	finally:
+		if acquired:
+			cache.delete(LOCK_KEY)
+
+
+def _mark_dirty(article_ids):
+	with _index_lock():
+		index = cache.get(INDEX_KEY) or set()
+		index.update(article_ids)
+		cache.set(INDEX_KEY, index, timeout=None)
+
+
+def record_view(article_id: int) -> None:
+	"""Buffer one view of an article"""
+	key = COUNT_KEY.format(article_id)
+	cache.add(key, 0, timeout=None)
+	try:
+		cache.incr(key)
+	except ValueError:
+		# Evicted between add() and incr()
+		cache.set(key, 1, timeout=None)
+	# Only the first view since the last flush touches the shared index
+	if cache.add(DIRTY_KEY.format(article_id), 1, timeout=None):
+		_mark_dirty([article_id])
+
+
+def pending_views(article_id: int) -> int:
+	"""Views of an article that are buffered but not flushed yet"""
+	return cache.get(COUNT_KEY.format(article_id)) or 0
+
+
+def flush_views() -> int:
+	"""Write buffered views to the database and return how many were flushed"""
+	with _index_lock():
+		article_ids = cache.get(INDEX_KEY) or set()
+		if not article_ids:
+			return 0
+		cache.delete(INDEX_KEY)
+		# Clearing the markers first lets views arriving during the flush re-register
+		cache.delete_many([DIRTY_KEY.format(pk) for pk in article_ids])
+
+	counts = cache.get_many([COUNT_KEY.format(pk) for pk in article_ids])
+	by_increment = defaultdict(list)
+	for pk in article_ids:
+		increment = counts.get(COUNT_KEY.format(pk)) or 0
+		if increment:
+			by_increment[increment].append(pk)
+	if not by_increment:
+		return 0
+
+	try:
+		with transaction.atomic():
+			for increment, pks in by_increment.items():
+				Article.objects.filter(pk__in=pks).update(views=F('views') + increment)
+				for pk in pks:
+					bump_card_version('article', pk)
+	except Exception:
+		_mark_dirty(article_ids)
+		raise
+
+	flushed = 0
+	for increment, pks in by_increment.items():
+		for pk in pks:
+			try:
+				cache.decr(COUNT_KEY.format(pk), increment)
+			except ValueError:
+				pass
+			flushed += increment
+	return flushed
+
+
+def _flush_quietly():
+	try:
+		flush_views()
+	except Exception:
+		logger.exception('Flushing buffered article views failed')
+
+
+def _flush_loop(interval):
+	while True:
+		time.sleep(interval)
+		_flush_quietly()
+
+
+def start_flusher(interval: float) -> None:
+	"""Flush buffered views from a daemon thread every ``interval`` seconds"""
+	global _flusher
+	if _flusher is not None:
+		return
+	_flusher = threading.Thread(target=_flush_loop, args=(interval,), name='article-view-flusher', daemon=True)
+	_flusher.start()
+	atexit.register(_flush_quietly)
+	# Servers that load the application before forking workers leave the thread in the parent
+	os.register_at_fork(after_in_child=lambda: _restart_after_fork(interval))
+
+
+def _restart_after_fork(interval: float) -> None:
+	global _flusher
+	_flusher = None
+	start_flusher(interval)
+
+
+def start_configured_flusher() -> None:
+	"""Start the flusher when ``NEWS_VIEW_FLUSH_INTERVAL`` is set; for server entry points only"""
+	interval = getattr(settings, 'NEWS_VIEW_FLUSH_INTERVAL', None)
+	if interval:
+		start_flusher(interval)
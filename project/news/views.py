@@ -1,5 +1,5 @@
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.urls import reverse
 from django.utils.decorators import method_decorator
@@ -7,11 +7,26 @@ from django.views.generic import ListView, DetailView, FormView, CreateView, Del
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.models import User
-from django.db.models import F
+from django.core.paginator import Paginator
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
 import math
 
+from . import dashboard, instrumentation
+from .aggregates import survey_summaries
+from .cards import attach_card_versions
+from .conditional import (
+	MOST_VISITED_SHOWN, RELATED_SHOWN, SURVEYS_SHOWN, add_validators, article_state, home_validators, not_modified,
+)
+from .exports import FORMATS as EXPORT_FORMATS
 from .forms import SurveyResponseForm, ArticleForm, SurveyForm, QuestionFormSet, ProfileUpdateForm
-from .models import Article, Survey, Response, ResponseAnswer, Question, QuestionChoice
+from .models import Article, Category, Survey, SurveyStats, Response, ResponseAnswer, Question, QuestionChoice, Tag
+from .pagination import KeysetPaginationMixin
+from .principal import get_principal
+from .search import search_articles
+from .slots import SlotExpired, SlotUnavailable
+from .submissions import submit_response
+from .view_counts import pending_views, record_view
 
 
 def is_superuser(user):
@@ -62,65 +77,179 @@ def user_management(request):
 		except User.DoesNotExist:
 			messages.error(request, 'User not found!')
 		
-		return redirect('news:user_management')
+		# Keep the search, filter and page the action was taken from
+		return redirect(request.get_full_path())
 	
-	# Get all users with their profiles and survey responses
-	users = User.objects.select_related('profile').prefetch_related(
-		'survey_responses__survey',
-		'survey_responses__answers__question'
-	).all().order_by('username')
+	query = request.GET.get('q', '').strip()
+	status = request.GET.get('status', '')
+	users = User.objects.select_related('profile')
+	if query:
+		# Prefix matches can use the username and email indexes; icontains could not
+		users = users.filter(Q(username__istartswith=query) | Q(email__istartswith=query))
+	if status == 'vip':
+		users = users.filter(profile__is_vip=True)
+	elif status == 'superuser':
+		users = users.filter(is_superuser=True)
+	
+	# Survey activity is computed by the database, one correlated subquery per column
+	user_responses = Response.objects.filter(user=OuterRef('pk')).order_by()
+	users = users.annotate(
+		response_count=Coalesce(
+			Subquery(user_responses.values('user').annotate(total=Count('*')).values('total'), output_field=IntegerField()),
+			Value(0),
+		),
+		latest_submission=Subquery(user_responses.order_by('-submitted_at').values('submitted_at')[:1]),
+	).order_by('username')
+	
+	paginator = Paginator(users, 25)
+	page = paginator.get_page(request.GET.get('page'))
+	# The counts are the dashboard's cached counters, not an aggregate over every user per load
+	snapshot = dashboard.get_snapshot()
 	
 	context = {
-		'users': users,
+		'users': page.object_list,
+		'page_obj': page,
+		'query': query,
+		'status': status,
+		'totals': {
+			'users': snapshot['total_users'],
+			'vip': snapshot['vip_users'],
+			'superusers': snapshot['superusers'],
+		},
+		'total_responses': SurveyStats.objects.aggregate(total=Sum('response_count'))['total'] or 0,
 	}
 	return render(request, 'user_management.html', context)
 
 
+@user_passes_test(is_superuser)
+def user_responses(request, pk):
+	"""Survey answers of one user, loaded on demand into the user management page"""
+	member = get_object_or_404(User, pk=pk)
+	responses = Response.objects.filter(user=member).select_related('survey').prefetch_related(
+		'answers__question', 'answers__selected_choices'
+	)
+	
+	context = {
+		'member': member,
+		'responses': responses,
+	}
+	return render(request, 'user_responses.html', context)
+
+
 @user_passes_test(is_superuser)
 def survey_results(request):
-	# Get all surveys with their responses
-	surveys = Survey.objects.prefetch_related(
-		'responses__user__profile',
-		'responses__answers__question',
-		'responses__answers__selected_choices'
-	).all()
+	# Summaries come from the aggregate tables; individual responses are paged in survey_responses
+	paginator = Paginator(Survey.objects.order_by('-created_at', '-id'), 10)
+	page = paginator.get_page(request.GET.get('page'))
 	
 	# Calculate statistics
-	total_responses = sum(survey.responses.count() for survey in surveys)
+	total_responses = SurveyStats.objects.aggregate(total=Sum('response_count'))['total'] or 0
 	total_users = User.objects.filter(profile__is_vip=True).count()
 	
 	context = {
-		'surveys': surveys,
+		'page_obj': page,
+		'summaries': survey_summaries(page.object_list),
+		'total_surveys': paginator.count,
 		'total_responses': total_responses,
 		'total_users': total_users,
 	}
 	return render(request, 'survey_results.html', context)
 
 
-class HomeView(ListView):
-	model = Article
+@user_passes_test(is_superuser)
+def survey_responses(request, pk):
+	"""Individual responses of one survey, a page at a time"""
+	survey = get_object_or_404(Survey, pk=pk)
+	responses = survey.responses.select_related('user__profile').order_by('-submitted_at', '-id')
+	page = Paginator(responses, 25).get_page(request.GET.get('page'))
+	# Answers are only loaded for the responses on this page
+	responses = list(page.object_list)
+	prefetch_related_objects(responses, 'answers__question', 'answers__selected_choices')
+	
+	context = {
+		'survey': survey,
+		'page_obj': page,
+		'responses': responses,
+	}
+	return render(request, 'survey_responses.html', context)
+
+
+@user_passes_test(is_superuser)
+def survey_export(request, pk, fmt):
+	"""Stream every response of a survey as CSV or NDJSON"""
+	if fmt not in EXPORT_FORMATS:
+		raise Http404('Unknown export format.')
+	survey = get_object_or_404(Survey, pk=pk)
+	content_type, lines = EXPORT_FORMATS[fmt]
+	response = StreamingHttpResponse(lines(survey), content_type=content_type)
+	response['Content-Disposition'] = f'attachment; filename="survey-{survey.pk}-responses.{fmt}"'
+	return response
+
+
+class HomeView(KeysetPaginationMixin, ListView):
+	queryset = Article.objects.defer('content')
 	template_name = 'home.html'
 	context_object_name = 'articles'
 
+	def get(self, request, *args, **kwargs):
+		validators = home_validators(request, self.paginate_by, self.cursor_ordering)
+		response = not_modified(request, validators)
+		if response is None:
+			response = add_validators(request, super().get(request, *args, **kwargs), validators)
+		return response
+
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
-		context['surveys'] = Survey.objects.all()[:5]  # Show latest 5 surveys
+		# Cards are fragment-cached; version stamps make edits show up immediately
+		attach_card_versions(context['articles'], 'article')
+		user = self.request.user
+		if user.is_authenticated and (user.is_superuser or user_is_vip(self.request)):
+			surveys = Survey.objects.annotate(question_count=Count('questions')).order_by('-created_at', '-id')[:SURVEYS_SHOWN]
+			context['surveys'] = attach_card_versions(surveys, 'survey')  # Show latest 5 surveys
+		else:
+			context['surveys'] = []
 		# For guest users, show most visited news
-		if not self.request.user.is_authenticated:
-			context['most_visited'] = Article.objects.filter(views__gt=0).order_by('-views', '-published_at')[:6]
+		if not user.is_authenticated:
+			most_visited = Article.objects.filter(views__gt=0).order_by('-views', '-published_at').defer('content')[:MOST_VISITED_SHOWN]
+			context['most_visited'] = attach_card_versions(most_visited, 'article')
 		else:
 			context['most_visited'] = Article.objects.none()
 		return context
 
 
-def user_is_vip(user) -> bool:
-	return user.is_authenticated and hasattr(user, 'profile') and user.profile.is_vip
+class ArticleFeedView(KeysetPaginationMixin, ListView):
+	"""Next page of home page cards, fetched by "load more" / infinite scroll"""
+	queryset = Article.objects.defer('content')
+	template_name = 'article_feed.html'
+	context_object_name = 'articles'
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		attach_card_versions(context['articles'], 'article')
+		return context
+
+
+def search(request):
+	query = request.GET.get('q', '').strip()
+	paginator = Paginator(search_articles(query), 10)
+	page = paginator.get_page(request.GET.get('page'))
+	context = {
+		'query': query,
+		'page_obj': page,
+		'articles': page.object_list,
+	}
+	return render(request, 'search.html', context)
+
+
+def user_is_vip(request: HttpRequest) -> bool:
+	# The VIP claim is cached in the session instead of reading user.profile on every request
+	return get_principal(request).is_vip
 
 
 class VipRequiredMixin:
 	@method_decorator(login_required(login_url='/login/'))
 	def dispatch(self, request: HttpRequest, *args, **kwargs):
-		if not user_is_vip(request.user):
+		if not user_is_vip(request):
 			return HttpResponseForbidden('VIP access required.')
 		return super().dispatch(request, *args, **kwargs)
 
@@ -151,24 +280,33 @@ class ArticleCreateView(CreateView):
 
 class ArticleDetailView(DetailView):
 	model = Article
+	queryset = Article.objects.select_related('category_ref')
 	template_name = 'article_detail.html'
 	slug_url_kwarg = 'slug'
 	context_object_name = 'article'
 
+	def get(self, request, *args, **kwargs):
+		state = article_state(request, kwargs[self.slug_url_kwarg])
+		if state is None:
+			return super().get(request, *args, **kwargs)
+		# Count the visit whether the page is rendered or answered with a 304. Buffered instead
+		# of written; flushed in bulk by news.view_counts
+		record_view(state.pk)
+		response = not_modified(request, state.validators)
+		if response is None:
+			response = add_validators(request, super().get(request, *args, **kwargs), state.validators)
+		return response
+
 	def get_object(self, queryset=None):
 		obj = super().get_object(queryset)
-		# Increment views safely to track popularity
-		Article.objects.filter(pk=obj.pk).update(views=F('views') + 1)
-		obj.refresh_from_db(fields=['views'])
+		obj.views += pending_views(obj.pk)
 		return obj
 
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
 		
-		# Parse tags string into a list of chips
-		raw_tags = (self.object.tags or "")
-		tags_list = [t.strip() for t in raw_tags.replace('#', '').replace(';', ',').split(',') if t.strip()]
-		context['tags_list'] = tags_list
+		# Normalized tags are maintained on save, no need to re-parse the string
+		context['tags_list'] = list(self.object.tag_refs.all())
 
 		# Reading time estimation (~220 wpm)
 		words = len((self.object.content or "").split())
@@ -176,10 +314,45 @@ class ArticleDetailView(DetailView):
 		context['reading_time'] = reading_time
 		context['word_count'] = words
 		
-		# Get related articles (same author or similar topics)
-		context['related_articles'] = Article.objects.filter(
-			author=self.object.author
-		).exclude(id=self.object.id)[:3]
+		# Related articles are precomputed by news.related; fall back to the author's other articles
+		related = list(
+			Article.objects.filter(neighbor_of__article=self.object).order_by('neighbor_of__rank').defer('content')[:RELATED_SHOWN]
+		)
+		if not related:
+			related = list(Article.objects.filter(author=self.object.author).exclude(id=self.object.id).defer('content')[:RELATED_SHOWN])
+		context['related_articles'] = related
+		return context
+
+
+class TagArticleListView(ListView):
+	template_name = 'article_list.html'
+	context_object_name = 'articles'
+	paginate_by = 12
+
+	def get_queryset(self):
+		self.tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
+		return Article.objects.filter(tag_refs=self.tag).defer('content')
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		context['heading'] = f"#{self.tag.name}"
+		context['total'] = self.tag.article_count
+		return context
+
+
+class CategoryArticleListView(ListView):
+	template_name = 'article_list.html'
+	context_object_name = 'articles'
+	paginate_by = 12
+
+	def get_queryset(self):
+		self.category = get_object_or_404(Category, slug=self.kwargs['slug'])
+		return Article.objects.filter(category_ref=self.category).defer('content')
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		context['heading'] = self.category.name
+		context['total'] = self.category.article_count
 		return context
 
 
@@ -212,24 +385,23 @@ class SuperuserDashboardView(SuperuserRequiredMixin, TemplateView):
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
 
-		# Statistics
-		from django.contrib.auth.models import User
-		from .models import Article, Survey, Response
-
-		context['total_users'] = User.objects.count()
-		context['vip_users'] = User.objects.filter(profile__is_vip=True).count()
-		context['total_articles'] = Article.objects.count()
-		context['total_surveys'] = Survey.objects.count()
-		context['total_responses'] = Response.objects.count()
+		# Statistics (total_users, vip_users, ..., active_surveys, inactive_surveys) from the cached snapshot
+		context.update(dashboard.get_snapshot())
 
 		# Recent activity
-		context['recent_articles'] = Article.objects.order_by('-published_at')[:5]
-		context['recent_surveys'] = Survey.objects.order_by('-created_at')[:5]
-		context['recent_responses'] = Response.objects.select_related('user', 'survey').order_by('-submitted_at')[:10]
+		context['recent_articles'] = Article.objects.defer('content').order_by('-published_at', '-id')[:5]
+		context['recent_surveys'] = Survey.objects.annotate(
+			response_count=Coalesce('stats__response_count', Value(0))
+		).order_by('-created_at', '-id')[:5]
+		context['recent_responses'] = Response.objects.select_related('user__profile', 'survey').order_by('-submitted_at')[:10]
+
+		# Charts from the rollup tables
+		context['articles_chart'] = dashboard.chart(dashboard.articles_per_day())
+		context['responses_chart'] = dashboard.chart(dashboard.responses_per_hour())
 
-		# System health
-		context['active_surveys'] = Survey.objects.filter(active=True).count()
-		context['inactive_surveys'] = Survey.objects.filter(active=False).count()
+		# Rolling request timings of this process, from news.instrumentation
+		context['route_timings'] = instrumentation.summary()
+		context['route_timings_window'] = instrumentation.ROLLING_WINDOW
 
 		return context
 
@@ -306,15 +478,21 @@ def survey_edit(request, pk):
 	
 	context = {
 		'survey': survey,
-		'questions': survey.questions.all(),
+		'questions': list(survey.questions.prefetch_related('choices')),
 	}
 	return render(request, 'survey_edit.html', context)
 
 
-class SurveyListView(VipRequiredMixin, ListView):
-	model = Survey
+class SurveyListView(VipRequiredMixin, KeysetPaginationMixin, ListView):
+	queryset = Survey.objects.annotate(question_count=Count('questions'))
 	template_name = 'survey_list.html'
 	context_object_name = 'surveys'
+	cursor_ordering = ('-created_at', '-id')
+
+	def get_context_data(self, **kwargs):
+		context = super().get_context_data(**kwargs)
+		context['total_surveys'] = Survey.objects.count()
+		return context
 
 
 class SurveyDetailView(VipRequiredMixin, FormView, DetailView):
@@ -322,6 +500,13 @@ class SurveyDetailView(VipRequiredMixin, FormView, DetailView):
 	template_name = 'survey_detail.html'
 	form_class = SurveyResponseForm
 
+	def get_object(self, queryset=None):
+		# The form, the context and form_valid all need the survey: fetch it once per request
+		if queryset is None and getattr(self, 'object', None) is not None:
+			return self.object
+		self.object = super().get_object(queryset)
+		return self.object
+
 	def get_form_kwargs(self):
 		kwargs = super().get_form_kwargs()
 		kwargs['survey'] = self.get_object()
@@ -330,18 +515,17 @@ class SurveyDetailView(VipRequiredMixin, FormView, DetailView):
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
 		context['survey'] = self.get_object()
+		context['schema'] = context['form'].schema
 		return context
 
 	def form_valid(self, form):
 		survey = self.get_object()
-		user = self.request.user
-		response, created = Response.objects.get_or_create(survey=survey, user=user)
-		response.answers.all().delete()
-		for question in survey.questions.all():
-			answer_text = form.cleaned_data.get(f'question_{question.id}', '')
-			ResponseAnswer.objects.create(response=response, question=question, answer_text=answer_text)
-		# Calculate and save score
-		response.calculate_score()
+		# Store all answers and selected choices in one transaction, then score them
+		try:
+			submit_response(survey, self.request.user, form.cleaned_data, schema=form.schema)
+		except (SlotUnavailable, SlotExpired) as exc:
+			messages.error(self.request, str(exc))
+			return redirect('news:home')
 		return redirect(reverse('news:survey_submitted', kwargs={'pk': survey.pk}))
 
 
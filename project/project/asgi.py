@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
 application = get_asgi_application()
+
+# Only server processes flush buffered article views in the background
+from news.view_counts import start_configured_flusher  # noqa: E402
+
+start_configured_flusher()
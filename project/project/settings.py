@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'news.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'news.replicas.ReplicaPinningMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'news.principal.PrincipalMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'news.context_processors.principal',
             ],
         },
     },
@@ -85,6 +90,39 @@ DATABASES = {
     }
 }
 
+# NEWS_SQLITE_PATH=bench.sqlite3 runs against a local SQLite file instead, with no database
+# server (used by `manage.py seed_benchmark_data` and `manage.py benchmark_routes`)
+if os.environ.get('NEWS_SQLITE_PATH'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ['NEWS_SQLITE_PATH'],
+        # Background threads (view counts, image variants) write too; take the write lock up front
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    }
+
+# Aliases in DATABASES that serve reads through news.replicas; writes always go to 'default'.
+# Give each replica 'TEST': {'MIRROR': 'default'} so tests do not create a database for it.
+NEWS_READ_REPLICAS = []
+
+# NEWS_SQLITE_REPLICA_PATH=replica.sqlite3 adds a read-only SQLite replica next to NEWS_SQLITE_PATH.
+# Nothing replicates between the files: copy the primary over the replica to bring it up to date.
+if os.environ.get('NEWS_SQLITE_PATH') and os.environ.get('NEWS_SQLITE_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ['NEWS_SQLITE_REPLICA_PATH'],
+        'OPTIONS': {'init_command': 'PRAGMA query_only = 1'},
+        'TEST': {'MIRROR': 'default'},
+    }
+    NEWS_READ_REPLICAS = ['replica']
+
+DATABASE_ROUTERS = ['news.replicas.ReplicaRouter']
+
+# Seconds a replica may lag before reads skip it, between replica health checks, and that a
+# session keeps reading from the primary after it wrote
+NEWS_REPLICA_MAX_LAG = 5
+NEWS_REPLICA_CHECK_INTERVAL = 5
+NEWS_REPLICA_PIN_SECONDS = 10
+
 
 
 # Password validation
@@ -132,5 +170,25 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Seconds between background flushes of buffered article views, in server processes only
+# (project.wsgi / project.asgi); None disables the thread: run `manage.py flush_article_views`
+# instead when using a shared cache
+NEWS_VIEW_FLUSH_INTERVAL = 30
+
+# Seconds a session's cached VIP claim is trusted (news.principal). Other processes only see a
+# revoked VIP after this unless CACHES points every worker at one shared cache
+NEWS_PRINCIPAL_CLAIM_SECONDS = 60
+
+# Worker threads that render resized/WebP article image variants (news.images)
+NEWS_IMAGE_WORKERS = 2
+
+# Serve the home, article and survey list pages from the async views in news.async_views.
+# Off by default: in manage.py benchmark_handlers they were slower under ASGI than the sync
+# views under WSGI. Turn it on only where that benchmark shows a gain.
+NEWS_ASYNC_VIEWS = os.environ.get('NEWS_ASYNC_VIEWS') == '1'
+
+# Requests per view kept by news.instrumentation for the dashboard's rolling percentiles
+NEWS_INSTRUMENTATION_WINDOW = 500
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'